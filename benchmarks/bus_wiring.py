@@ -0,0 +1,43 @@
+"""
+Measures the time to wire whole buses.
+
+    python benchmarks/bus_wiring.py [N] [count]
+
+wires the N bit output of an instance to the input of another one `count`
+times, with the elements of the ports already created (wired bit by bit in
+one pass) and without (recorded as a single connection).
+"""
+import sys
+import timeit
+import magma as m
+from magma.config import set_debug_level
+
+
+def main(N=512, count=100):
+    set_debug_level('frame')
+    T = m.Bits(N)
+    Buf = m.DeclareCircuit('Buf', 'I', m.In(T), 'O', m.Out(T))
+    m.DefineCircuit('Top', 'I', m.In(T), 'O', m.Out(T))
+
+    for materialized in [True, False]:
+        pairs = []
+        for _ in range(count):
+            a, b = Buf(), Buf()
+            if materialized:
+                a.O.ts
+                b.I.ts
+            pairs.append((a, b))
+        pairs = iter(pairs)
+
+        def wire():
+            a, b = next(pairs)
+            m.wire(a.O, b.I)
+
+        time = timeit.timeit(wire, number=count) / count
+        print('{:<14} {:10.1f} us per {}-bit bus'.format(
+            'elements:' if materialized else 'no elements:', time * 1e6, N))
+    m.EndCircuit()
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,57 @@
+"""
+Measures the memory used per bit by elaborating wide ports.
+
+    python benchmarks/bytes_per_bit.py [N] [M]
+
+creates Bits(N) values, then a definition with an Array(N, Array(M, Bit))
+input and output, an instance of a declared circuit with the same ports,
+wires them and finally accesses every bit, reporting the bytes allocated per
+bit for each step. It only uses the public magma API, so the numbers of two
+revisions can be compared directly.
+"""
+import sys
+import tracemalloc
+import magma as m
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    result = fn()
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return result, size
+
+
+def main(N=1024, M=32):
+    T = m.Array(N, m.Array(M, m.Bit))
+    bits = N * M
+
+    _, size = measure(lambda: [m.Bits(N)() for _ in range(M)])
+    print('bits:         {:8.1f} bytes/bit'.format(size / bits))
+
+    _, size = measure(lambda: m.In(T)())
+    print('array:        {:8.1f} bytes/bit'.format(size / bits))
+
+    Mem = m.DeclareCircuit('Mem', 'I', m.In(T), 'O', m.Out(T))
+    Top, size = measure(lambda: m.DefineCircuit('Top', 'I', m.In(T), 'O', m.Out(T)))
+    print('definition:   {:8.1f} bytes/bit'.format(size / bits))
+
+    mem, size = measure(Mem)
+    print('instance:     {:8.1f} bytes/bit'.format(size / bits))
+
+    def wire():
+        m.wire(Top.I, mem.I)
+        m.wire(mem.O, Top.O)
+    _, size = measure(wire)
+    print('wiring:       {:8.1f} bytes/bit'.format(size / bits))
+
+    # Creates the elements of all the ports and wires them bit by bit
+    _, size = measure(lambda: [port.flatten()
+                               for port in [Top.I, Top.O, mem.I, mem.O]])
+    print('elements:     {:8.1f} bytes/bit'.format(size / bits))
+    m.EndCircuit()
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
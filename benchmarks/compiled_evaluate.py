@@ -0,0 +1,93 @@
+"""
+Measures the evaluation rate of the PythonSimulator modes.
+
+    python benchmarks/compiled_evaluate.py [N] [cycles]
+
+simulates a chain of N stages of an AND, an inverter and a flip-flop for
+`cycles` clock cycles, interpreted, compiled with every primitive inlined
+through its `simulate_source` method, and compiled with one call per
+primitive.
+"""
+import sys
+import timeit
+import magma as m
+from magma.config import set_debug_level
+from magma.simulator import PythonSimulator
+
+
+def simulate_and(self, value_store, state_store):
+    value_store.set_value(self.O, value_store.get_value(self.I0) and
+                                  value_store.get_value(self.I1))
+
+def simulate_not(self, value_store, state_store):
+    value_store.set_value(self.O, not value_store.get_value(self.I))
+
+def simulate_ff(self, value_store, state_store):
+    clock = value_store.get_value(self.CLK)
+    if not state_store:
+        state_store.update(prev_clock=clock, cur_val=False)
+    if state_store['prev_clock'] and not clock:
+        state_store['cur_val'] = value_store.get_value(self.D)
+    state_store['prev_clock'] = clock
+    value_store.set_value(self.Q, state_store['cur_val'])
+
+def source_and(self, ports, state):
+    return ['{O} = {I0} and {I1}'.format(**ports)]
+
+def source_not(self, ports, state):
+    return ['{O} = not {I}'.format(**ports)]
+
+def source_ff(self, ports, state):
+    return [
+        'if not {}:'.format(state),
+        '    {}.update(prev_clock={CLK}, cur_val=False)'.format(state, **ports),
+        'if {}["prev_clock"] and not {CLK}:'.format(state, **ports),
+        '    {}["cur_val"] = {D}'.format(state, **ports),
+        '{}["prev_clock"] = {CLK}'.format(state, **ports),
+        '{Q} = {}["cur_val"]'.format(state, **ports),
+    ]
+
+
+def main(N=1000, cycles=200):
+    set_debug_level('off')
+    for inline in [False, True]:
+        extra = dict(simulate_source=source_and) if inline else {}
+        And = m.DeclareCircuit('And', 'I0', m.In(m.Bit), 'I1', m.In(m.Bit),
+                               'O', m.Out(m.Bit), simulate=simulate_and,
+                               **extra)
+        extra = dict(simulate_source=source_not) if inline else {}
+        Not = m.DeclareCircuit('Not', 'I', m.In(m.Bit), 'O', m.Out(m.Bit),
+                               simulate=simulate_not, **extra)
+        extra = dict(simulate_source=source_ff) if inline else {}
+        FF = m.DeclareCircuit('FF', 'CLK', m.In(m.Clock), 'D', m.In(m.Bit),
+                              'Q', m.Out(m.Bit), stateful=True,
+                              simulate=simulate_ff, **extra)
+
+        args = ['I', m.In(m.Bit), 'O', m.Out(m.Bit)] + \
+               m.ClockInterface(False, False, False)
+        Top = m.DefineCircuit('Chain{}'.format(N), *args)
+        prev = Top.I
+        for _ in range(N):
+            gate, inv, ff = And(), Not(), FF()
+            m.wire(prev, gate.I0)
+            m.wire(Top.I, gate.I1)
+            m.wire(gate.O, inv.I)
+            m.wire(inv.O, ff.D)
+            prev = ff.Q
+        m.wire(prev, Top.O)
+        m.EndCircuit()
+
+        modes = [('compiled, inlined:' if inline else 'compiled, calls:',
+                  dict(compiled=True))]
+        if not inline:
+            modes.insert(0, ('interpreted:', {}))
+        for name, mode in modes:
+            sim = PythonSimulator(Top, Top.CLK, checkpoint_interval=None,
+                                  **mode)
+            sim.set_value(Top.I, True)
+            time = timeit.timeit(lambda: sim.advance(2), number=cycles)
+            print('{:<20} {:10.1f} cycles/s'.format(name, cycles / time))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -1,9 +1,10 @@
 from collections import Sequence
 from .logging import error
+from .port import wirebus
 from .ref import AnonRef, ArrayRef
 from .t import Type, Kind
 from .compatibility import IntegerTypes
-from .bit import Bit, BitOut, VCC, GND, BitType, BitKind
+from .bit import Bit, BitOut, VCC, GND, BitType, BitKind, _BitType
 from .bitutils import int2seq, seq2int
 from .debug import debug_wire, get_callee_frame_info
 
@@ -13,26 +14,59 @@ __all__  = ['ArrayType', 'ArrayKind', 'Array']
 # Create an Array
 #
 class ArrayType(Type):
+    # The elements are created on first access, until then a whole array
+    # wired to another one records the connection in `source` (the output
+    # array and the debug info) and `sinks` (the input arrays, in a dict used
+    # as an ordered set). Once the elements exist `source` still records the
+    # whole array driving them, for the backends.
+    __slots__ = ['elements', 'source', 'sinks']
+
     def __init__(self, *largs, **kwargs):
 
         Type.__init__(self, **kwargs)
+        self.source = None
+        self.sinks = None
 
         if isinstance(largs, Sequence) and len(largs) > 0:
             assert len(largs) == self.N
-            self.ts = []
+            self.elements = []
             for t in largs:
                 if isinstance(t, IntegerTypes):
                     t = VCC if t else GND
                 assert type(t) == self.T
-                self.ts.append(t)
+                self.elements.append(t)
         else:
-            self.ts = []
-            for i in range(self.N):
-                T = self.T
-                t = T(name=ArrayRef(self,i))
-                self.ts.append(t)
+            self.elements = None
+
+    @property
+    def ts(self):
+        if self.elements is None:
+            self.materialize()
+        return self.elements
+
+    def materialize(self):
+        """
+        Creates the elements of the array and wires them as recorded by the
+        whole array connections
+        """
+        T = self.T
+        self.elements = [T(name=ArrayRef(self, i)) for i in range(self.N)]
+
+        if self.source is not None:
+            o, debug_info = self.source
+            self.source = None
+            del o.sinks[self]
+            self.connect(o, debug_info)
+
+        if self.sinks:
+            sinks, self.sinks = self.sinks, None
+            for i in sinks:
+                _, debug_info = i.source
+                i.source = None
+                i.connect(self, debug_info)
 
     def __eq__(self, rhs):
+        if self is rhs: return True
         if not isinstance(rhs, ArrayType): return False
         return self.ts == rhs.ts
 
@@ -90,23 +124,65 @@ class ArrayType(Type):
             error('Wiring Error: Arrays must have the same length {} != {}'.format(i.N, o.N), include_wire_traceback=True)
             return
 
-        for k in range(len(i)):
-            i[k].wire(o[k], debug_info)
+        if not isbus(i, o):
+            for k in range(len(i)):
+                i[k].wire(o[k], debug_info)
+            return
+
+        i.connect(o, debug_info)
+
+    def connect(i, o, debug_info):
+        """
+        Wires the whole array `o` to the array `i`, `isbus(i, o)` must hold
+        """
+        if i.elements is None and o.elements is None and i.source is None:
+            # Record the connection, the elements are wired if they are ever
+            # created
+            i.source = (o, debug_info)
+            if o.sinks is None:
+                o.sinks = {}
+            o.sinks[i] = None
+            return
+
+        if issubclass(i.T, ArrayType):
+            for ie, oe in zip(i.ts, o.ts):
+                ie.connect(oe, debug_info)
+        else:
+            # The types and directions are already checked, wire the ports of
+            # the bits in one pass
+            wirebus([b.port for b in i.ts], [b.port for b in o.ts])
+            for b in i.ts:
+                b.debug_info = debug_info
+            for b in o.ts:
+                b.debug_info = debug_info
+        if i.source is None:
+            i.source = (o, debug_info)
 
     def driven(self):
+        if self.source is not None:
+            return True
+        if self.elements is None:
+            return False
         for t in self.ts:
             if not t.driven():
                 return False
         return True
 
     def wired(self):
+        if self.source is not None:
+            return True
         for t in self.ts:
             if not t.wired():
                 return False
         return True
 
-    # test whether the values refer a whole array
-    def iswhole(self, ts):
+    # test whether the values refer a whole array, by default the elements of
+    # this array
+    def iswhole(self, ts=None):
+        if ts is None:
+            if self.elements is None:
+                return True
+            ts = self.elements
 
         n = len(ts)
 
@@ -139,6 +215,9 @@ class ArrayType(Type):
 
 
     def trace(self):
+        if self.source is not None:
+            return self.source[0]
+
         ts = [t.trace() for t in self.ts]
 
         for t in ts:
@@ -151,6 +230,11 @@ class ArrayType(Type):
         return array(ts)
 
     def value(self):
+        if self.source is not None:
+            return self.source[0]
+        if self.elements is None:
+            return None
+
         ts = [t.value() for t in self.ts]
 
         for t in ts:
@@ -163,6 +247,9 @@ class ArrayType(Type):
         return array(ts)
 
     def const(self):
+        if self.elements is None:
+            # Created elements are never constants
+            return False
         for t in self.ts:
             if not t.const():
                 return False
@@ -170,7 +257,7 @@ class ArrayType(Type):
         return True
 
     def flatten(self):
-        return sum([t.flatten() for t in self.ts], [])
+        return [b for t in self.ts for b in t.flatten()]
 
 
 class ArrayKind(Kind):
@@ -216,6 +303,26 @@ class ArrayKind(Kind):
         return Array(cls.N, cls.T.flip())
 
 
+def buscompatible(I, O):
+    """
+    Returns whether every element of an array of type `O` can be wired to
+    the corresponding element of an array of type `I`
+    """
+    if issubclass(I, ArrayType):
+        return issubclass(O, ArrayType) and I.N == O.N and \
+               buscompatible(I.T, O.T)
+    return issubclass(I, _BitType) and issubclass(O, _BitType)
+
+
+def isbus(i, o):
+    """
+    Returns whether wiring `o` to `i` connects a named output array to a
+    named input array with compatible elements
+    """
+    return not i.anon() and not o.anon() and i.isinput() and o.isoutput() \
+           and buscompatible(type(i), type(o))
+
+
 def Array(N,T):
     assert isinstance(N, IntegerTypes)
     assert isinstance(T, Kind)
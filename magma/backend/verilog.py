@@ -54,7 +54,7 @@ def vname(t):
 
     if isinstance(t, ArrayType):
         #print(str(t), t.iswhole(t.ts))
-        if not t.iswhole(t.ts):
+        if not t.iswhole():
             # the sequence of values is concantenated
             t = [vname(i) for i in t.ts]
             t.reverse()
@@ -15,6 +15,8 @@ __all__ += ['VCC', 'GND', 'HIGH', 'LOW']
 # how bits are wired together.
 #
 class _BitType(Type):
+    __slots__ = ['port', 'debug_info']
+
     def __init__(self, *largs, **kwargs):
         super(_BitType, self).__init__(*largs, **kwargs)
 
@@ -132,6 +134,7 @@ class _BitKind(Kind):
         return cls
 
 class BitType(_BitType):
+    __slots__ = ()
     __ne__ = Type.__ne__
     __hash__ = Type.__hash__
 
@@ -9,6 +9,8 @@ __all__ += ['UInt', 'UIntType', 'UIntKind']
 __all__ += ['SInt', 'SIntType', 'SIntKind']
 
 class BitsType(ArrayType):
+    __slots__ = ()
+
     def __repr__(self):
         if not isinstance(self.name, AnonRef):
             return repr(self.name)
@@ -55,6 +57,8 @@ def Bits(N, T=None):
 
 
 class UIntType(BitsType):
+    __slots__ = ()
+
     def __repr__(self):
         if not isinstance(self.name, AnonRef):
             return repr(self.name)
@@ -86,6 +90,8 @@ def UInt(N, T=None):
 
 
 class SIntType(BitsType):
+    __slots__ = ()
+
     def __repr__(self):
         if not isinstance(self.name, AnonRef):
             return repr(self.name)
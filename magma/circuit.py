@@ -1,6 +1,5 @@
 import sys
 import six
-import inspect
 from functools import wraps
 if sys.version_info > (3, 0):
     from functools import reduce
@@ -16,7 +15,7 @@ from .t import Flip
 from .array import ArrayType
 from .tuple import TupleType
 from .bit import VCC, GND
-from .debug import get_callee_frame_info
+from .debug import get_callee_frame_info, get_callee_stack
 from .logging import warning
 
 __all__  = ['AnonymousCircuitType']
@@ -321,6 +320,8 @@ def DeclareCircuit(name, *decl, **args):
         primitive=args.get('primitive', True),
         stateful=args.get('stateful', False),
         simulate=args.get('simulate'),
+        simulate_batch=args.get('simulate_batch'),
+        simulate_source=args.get('simulate_source'),
         firrtl_op=args.get('firrtl_op'),
         circuit_type_methods=args.get('circuit_type_methods', []),
         coreir_lib=args.get('coreir_lib', "global"),
@@ -429,7 +430,7 @@ class DefineCircuitKind(CircuitKind):
             #print('naming circuit instance', inst.name)
         #print('placing', inst, 'in', cls)
         inst.defn = cls
-        inst.stack = inspect.stack()
+        inst.stack = get_callee_stack()
         cls.instances.append(inst)
 
 
@@ -463,6 +464,8 @@ def DefineCircuit(name, *decl, **args):
                primitive      = args.get('primitive', False),
                stateful       = args.get('stateful', False),
                simulate       = args.get('simulate'),
+               simulate_batch = args.get('simulate_batch'),
+               simulate_source = args.get('simulate_source'),
                filename       = debug_info[0],
                lineno         = debug_info[1],
                verilog_name   = args.get('verilog_name', name),
@@ -36,7 +36,7 @@ class ClockKind(_BitKind):
         return cls
 
 class ClockType(_BitType):
-    pass
+    __slots__ = ()
 
 Clock = ClockKind('Clock', (ClockType,), {})
 ClockIn = ClockKind('Clock', (ClockType,), dict(direction=INPUT))
@@ -61,7 +61,7 @@ class ResetKind(_BitKind):
         return cls
 
 class ResetType(_BitType):
-    pass
+    __slots__ = ()
 
 Reset = ResetKind('Reset', (ResetType,), {})
 ResetIn = ResetKind('Reset', (ResetType,), dict(direction=INPUT))
@@ -88,7 +88,7 @@ class EnableKind(_BitKind):
         return cls
 
 class EnableType(_BitType):
-    pass
+    __slots__ = ()
 
 Enable = EnableKind('Enable', (EnableType,), {})
 EnableIn = EnableKind('Enable', (EnableType,), dict(direction=INPUT))
@@ -7,3 +7,18 @@ def set_compile_dir(target):
 
 def get_compile_dir():
     return __COMPILE_DIR
+
+# How much debug information is recorded while elaborating circuits:
+#   'off'   - none
+#   'frame' - the file and line of every wire and instantiation
+#   'full'  - also the call stack of every instance (used by DebugNamePass to
+#             find the variable names of instances)
+__DEBUG_LEVEL = 'full'
+
+def set_debug_level(level):
+    global __DEBUG_LEVEL
+    assert level in ['off', 'frame', 'full']
+    __DEBUG_LEVEL = level
+
+def get_debug_level():
+    return __DEBUG_LEVEL
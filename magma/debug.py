@@ -1,14 +1,36 @@
-import inspect
 import sys
+from .config import get_debug_level
+
+
+NO_DEBUG_INFO = (None, None)
 
 
 def get_callee_frame_info():
-    callee_frame = inspect.stack()[2]
-    if sys.version_info < (3, 5):
-        debug_info = callee_frame[1], callee_frame[2]
-    else:
-        debug_info = callee_frame.filename, callee_frame.lineno
-    return debug_info
+    """
+    Returns the (filename, lineno) of the caller of the function calling
+    get_callee_frame_info, or NO_DEBUG_INFO if the debug level is 'off'
+    """
+    if get_debug_level() == 'off':
+        return NO_DEBUG_INFO
+    callee_frame = sys._getframe(2)
+    return callee_frame.f_code.co_filename, callee_frame.f_lineno
+
+
+def get_callee_stack():
+    """
+    Returns the call stack of the function calling get_callee_stack as a list
+    of (frame, filename, lineno, function), starting with that function, if
+    the debug level is 'full', otherwise None
+    """
+    if get_debug_level() != 'full':
+        return None
+    stack = []
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        stack.append((frame, code.co_filename, frame.f_lineno, code.co_name))
+        frame = frame.f_back
+    return stack
 
 
 def debug_wire(fn):
@@ -23,4 +45,3 @@ def debug_wire(fn):
             debug_info = get_callee_frame_info()
         return fn(i, o, debug_info)
     return wire
-
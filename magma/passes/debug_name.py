@@ -32,6 +32,11 @@ class DebugNamePass(DefinitionPass):
                 continue
             stack = inst.stack
             inst.decl = None
+            if stack is None:
+                # Only recorded with the 'full' debug level
+                continue
+            # Release the frames, and their local variables
+            inst.stack = None
             for frame_info in stack[1:]: # Skip the first element in the stack, where the inst is placed
                 local_vars = frame_info[0].f_locals.items()
                 for name, var in local_vars:
@@ -15,30 +15,71 @@ def flip(direction):
     elif direction == INOUT:  return INOUT
 
 def mergewires(new, old):
-    oldinputs = set(old.inputs)
-    newinputs = set(new.inputs)
-    oldoutputs = set(old.outputs)
-    newoutputs = set(new.outputs)
-
-    for i in oldinputs - newinputs:
-        new.inputs.append(i)
-        i.wires = new
-
-    for o in oldoutputs - newoutputs:
-        if len(new.outputs) > 0:
-            error("Error: connecting more than one output to an input {}".format(o), include_wire_traceback=True)
-        new.outputs.append(o)
-        o.wires = new
+    """
+    Merges the net `old` into the net `new`, both must be the roots of their
+    nets
+    """
+    for o in old.outputs:
+        if o not in new.outputs:
+            if len(new.outputs) > 0:
+                error("Error: connecting more than one output to an input {}".format(o), include_wire_traceback=True)
+            new.outputs.append(o)
+
+    new._inputs.update(old._inputs)
+    old.parent = new
+    old._inputs = None
+    old.outputs = None
 
 
 #
-# A Wire has a list of input and output Ports.
+# A Wire has the input and output Ports of a net. The inputs are kept in a
+# dict used as an ordered set, so nets with a large fanout are cheap to build
+# and to search, and are returned as a list by `inputs`.
+#
+# Wires are merged with a union-find: a merged Wire points to the Wire it was
+# merged into, and find() returns the Wire holding the net.
 #
 class Wire:
+    __slots__ = ['parent', '_inputs', 'outputs']
+
     def __init__(self):
-        self.inputs = []
+        self.parent = None
+        self._inputs = {}
         self.outputs = []
 
+    @property
+    def inputs(self):
+        return list(self._inputs)
+
+    def has_input(self, i):
+        return i in self._inputs
+
+    def find(self):
+        root = self
+        while root.parent is not None:
+            root = root.parent
+        # Path compression
+        w = self
+        while w.parent is not None and w.parent is not root:
+            w.parent, w = root, w.parent
+        return root
+
+    def add_input(self, i):
+        self._inputs[i] = None
+
+    def union(self, other):
+        """
+        Merges the nets of the roots `self` and `other`, the smaller one is
+        merged into the larger one. Returns the root of the merged net.
+        """
+        if self is other:
+            return self
+        if len(self._inputs) + len(self.outputs) < \
+           len(other._inputs) + len(other.outputs):
+            self, other = other, self
+        mergewires(self, other)
+        return self
+
     def connect( self, o, i ):
 
         # anon Ports are added to the input or output list of this wire
@@ -47,9 +88,6 @@ class Wire:
         # add the non-anonymous port to the wire associated with the
         # anonymous port
 
-        #print(str(o), o.anon(), o.bit.isinput(), o.bit.isoutput())
-        #print(str(i), i.anon(), i.bit.isinput(), i.bit.isoutput())
-
         if not o.anon():
             #assert o.bit.direction is not None
             if o.bit.isinput():
@@ -59,7 +97,6 @@ class Wire:
             if o not in self.outputs:
                 if len(self.outputs) != 0:
                     warning("Warning: adding an output {} to a wire with an output {}".format(str(o), str(self.outputs[0])))
-                #print('adding output', o)
                 self.outputs.append(o)
 
         if not i.anon():
@@ -68,18 +105,14 @@ class Wire:
                 error("Error: using an output as an input {}".format(repr(i)), include_wire_traceback=True)
                 return
 
-            if i not in self.inputs:
-                #print('adding input', i)
-                self.inputs.append(i)
-
-        # print(o.wires,i.wires,self,self.outputs,self.inputs)
+            self.add_input(i)
 
         # always update wires 
-        o.wires = self
-        i.wires = self
+        o.net = self
+        i.net = self
 
     def check(self):
-        for o in self.inputs:
+        for o in self._inputs:
             if o.isoutput():
                 error("Error: output in the wire inputs: {}".format(o))
 
@@ -101,11 +134,22 @@ class Wire:
 # Each port is represented by a Bit()
 #
 class Port:
+    __slots__ = ['bit', 'net']
+
     def __init__(self, bit):
 
         self.bit = bit
 
-        self.wires = Wire()
+        # The Wire of the net, created when the port is first wired
+        self.net = None
+
+    # the Wire holding the net of this port, an unwired port gets an empty one
+    @property
+    def wires(self):
+        if self.net is None:
+            self.net = Wire()
+            return self.net
+        return self.net.find()
 
     def __repr__(self):
         return repr(self.bit)
@@ -118,65 +162,48 @@ class Port:
 
     # wire a port to a port
     def wire(i, o):
-        #if o.bit.direction is None:
-        #    o.bit.direction = OUTPUT
-        #if i.bit.direction is None:
-        #    i.bit.direction = INPUT
-
-        #print("Wiring", o.bit.direction, str(o), "->", i.bit.direction, str(i))
-        
-        if i.wires and o.wires and i.wires is not o.wires:
-            # print('merging', i.wires.inputs, i.wires.outputs)
-            # print('merging', o.wires.inputs, o.wires.outputs)
-            w = Wire()
-            mergewires(w, i.wires)
-            mergewires(w, o.wires)
-            # print('after merge', w.inputs, w.outputs)
-        elif o.wires:
-            w = o.wires
-        elif i.wires:
-            w = i.wires
+        if i.net is not None and o.net is not None:
+            w = i.net.find().union(o.net.find())
+        elif o.net is not None:
+            w = o.net.find()
+        elif i.net is not None:
+            w = i.net.find()
         else:
             w = Wire()
 
         w.connect(o, i)
 
-        #print("after",o,"->",i, w)
-
-
     # if the port is an input or inout, return the output
     # if the port is an output, return the first input
     def trace(self):
-        if not self.wires:
+        if self.net is None:
             return None
+        wires = self.net.find()
 
-        if self in self.wires.inputs:
-            if len(self.wires.outputs) < 1:
-                # print('Warning:', str(self), 'is not connected to an output')
+        if wires.has_input(self):
+            if len(wires.outputs) < 1:
                 return None
-            assert len(self.wires.outputs) == 1
-            return self.wires.outputs[0]
+            assert len(wires.outputs) == 1
+            return wires.outputs[0]
 
-        if self in self.wires.outputs:
-            if len(self.wires.inputs) < 1:
-                # print('Warning:', str(self), 'is not connected to an input')
+        if self in wires.outputs:
+            if len(wires._inputs) < 1:
                 return None
-            assert len(self.wires.inputs) == 1
-            return self.wires.inputs[0]
+            assert len(wires._inputs) == 1
+            return next(iter(wires._inputs))
 
         return None
 
     # if the port is in the inputs, return the output
     def value(self):
-        if not self.wires:
+        if self.net is None:
             return None
+        wires = self.net.find()
 
-        if self in self.wires.inputs:
-            if len(self.wires.outputs) < 1:
-                # print('Warning:', str(self), 'is not connected to an output')
+        if wires.has_input(self):
+            if len(wires.outputs) < 1:
                 return None
-            #assert len(self.wires.outputs) == 1
-            return self.wires.outputs[0]
+            return wires.outputs[0]
 
         return None
 
@@ -187,3 +214,27 @@ class Port:
     def wired(self):
         return self.trace() is not None
 
+
+# wire the output Ports `outputs` to the input Ports `inputs`, the ports must
+# be named and have the right directions
+def wirebus(inputs, outputs):
+    for i, o in zip(inputs, outputs):
+        if i.net is None:
+            if o.net is None:
+                w = Wire()
+                w.outputs.append(o)
+                w.add_input(i)
+                o.net = w
+                i.net = w
+                continue
+            # a named output with a net is one of its outputs
+            w = o.net.find()
+            w.add_input(i)
+            i.net = w
+            continue
+
+        if o.net is None:
+            w = i.net.find()
+        else:
+            w = i.net.find().union(o.net.find())
+        w.connect(o, i)
@@ -3,6 +3,8 @@ from .compatibility import IntegerTypes
 __all__ = ['AnonRef', 'InstRef', 'DefnRef', 'ArrayRef', 'TupleRef']
 
 class Ref:
+    __slots__ = ()
+
     def __str__(self):
         return str(self.name)
 
@@ -10,6 +12,8 @@ class Ref:
         return self.qualifiedname()
 
 class AnonRef(Ref):
+    __slots__ = ['name']
+
     def __init__(self, name=""):
         self.name = name
 
@@ -20,6 +24,8 @@ class AnonRef(Ref):
         return False if self.name else True
 
 class InstRef(Ref):
+    __slots__ = ['inst', 'name']
+
     def __init__(self, inst, name):
         assert inst
         self.inst = inst # Inst
@@ -37,6 +43,8 @@ class InstRef(Ref):
         return False
 
 class DefnRef(Ref):
+    __slots__ = ['defn', 'name']
+
     def __init__(self, defn, name):
         assert defn
         self.defn = defn # Definition
@@ -52,6 +60,8 @@ class DefnRef(Ref):
         return False
 
 class ArrayRef(Ref):
+   __slots__ = ['array', 'index']
+
    def __init__(self, array, index):
        self.array = array # Array
        self.index = index
@@ -66,6 +76,8 @@ class ArrayRef(Ref):
        return self.array.name.anon()
 
 class TupleRef(Ref):
+   __slots__ = ['tuple', 'index']
+
    def __init__(self, tuple, index):
        self.tuple = tuple # Tuple
        self.index = index
@@ -79,3 +91,6 @@ class TupleRef(Ref):
    def anon(self):
        return self.tuple.name.anon()
 
+# Shared by all the types created without a name
+ANON_REF = AnonRef()
+
@@ -1,32 +1,70 @@
 from collections import namedtuple
+from weakref import WeakValueDictionary
 
 class Scope:
-    def __init__(self, **kwargs):
-        self.inst = None
-        self.parent = None
-        if 'parent' in kwargs:
-            self.parent = kwargs['parent']
-            self.val = self.parent.val 
-            if self.val is not "/":
-                self.val += '/'
+    """
+    The position of an instance in the hierarchy, `Scope()` is the top level
+    and `Scope(parent=scope, instance=inst)` the scope of `inst` inside the
+    instance at `scope`.
+
+    Scopes are interned: every (parent, instance) pair maps to a single
+    object, so scopes are compared and hashed by identity.
+    """
+    __slots__ = ['parent', 'inst', 'children', 'val', '__weakref__']
+
+    root = None
+
+    def __new__(cls, **kwargs):
+        if cls.root is None:
+            root = object.__new__(cls)
+            root.parent = None
+            root.inst = None
+            root.children = None
+            root.val = '/'
+            cls.root = root
+
+        parent = kwargs.get('parent')
+        if parent is None:
+            parent = cls.root
+        inst = kwargs.get('instance')
+        if inst is None:
+            return parent
+
+        if parent.children is None:
+            parent.children = WeakValueDictionary()
         else:
-            self.val = '/'
+            scope = parent.children.get(inst)
+            if scope is not None:
+                return scope
+        scope = object.__new__(cls)
+        scope.parent = parent
+        scope.inst = inst
+        scope.children = None
+        scope.val = None
+        parent.children[inst] = scope
+        return scope
 
-        if 'instance' in kwargs:
-            self.inst = kwargs['instance']
-            self.val += type(self.inst).__name__ + '.' + self.inst.name
+    def __reduce__(self):
+        if self.inst is None:
+            return (Scope, ())
+        return (_intern_scope, (self.parent, self.inst))
 
-    def inst_scope():
+    def inst_scope(self):
         return self.inst is not None
 
     def value(self):
+        if self.val is None:
+            val = self.parent.value()
+            if val != '/':
+                val += '/'
+            self.val = val + type(self.inst).__name__ + '.' + self.inst.name
         return self.val
 
-    def __eq__(self, rhs):
-        return self.val == rhs.val
+    def __repr__(self):
+        return 'Scope({})'.format(self.value())
 
-    def __hash__(self):
-        return hash(self.val)
+def _intern_scope(parent, inst):
+    return Scope(parent=parent, instance=inst)
 
 QualifiedBit = namedtuple('QualifiedBit', ['bit', 'scope'])
 QualifiedInstance = namedtuple('QualifiedInstance', ['instance', 'scope'])
@@ -113,6 +113,8 @@ class CoreIRSimulator(CircuitSimulator):
 
     def __init__(self, circuit, clock, coreir_filename=None, context=None, namespaces=["global"]):
         self.watchpoints = []
+        self.waveforms = []
+        self.halfcycles = 0
 
         need_cleanup = False
         if not coreir_filename:
@@ -211,17 +213,20 @@ class CoreIRSimulator(CircuitSimulator):
         self.simulator_state.execute()
         if clkvalue is not None:
             self.simulator_state.set_clock_value(old_style_path(insts, ports), not clkvalue, clkvalue)
+        self.sample_waveforms()
 
         return ExecutionState(triggered_points=self.__get_triggered_points(), clock=clkvalue, cycles=0)
 
-    def advance(self, halfcycles=1):
+    def advance(self, halfcycles=1, stop_at_watchpoints=True):
         cycles = self.__get_cur_cycles()
         # TODO add a function to interpreter to avoid doing this for loop in python
         watchpoints = []
         for i in range(0, halfcycles):
             self.simulator_state.run_half_cycle()
+            self.halfcycles += 1
+            self.sample_waveforms()
             watchpoints = self.__get_triggered_points()
-            if len(watchpoints) > 0:
+            if len(watchpoints) > 0 and stop_at_watchpoints:
                 break
 
         post_cycles = self.__get_cur_cycles()
@@ -229,12 +234,25 @@ class CoreIRSimulator(CircuitSimulator):
 
     def rewind(self, halfcycles):
         self.simulator_state.rewind(halfcycles)
+        self.halfcycles -= halfcycles
         return ExecutionState(triggered_points=self.__get_triggered_points(), clock=self.__get_clock_value(), cycles=0)
 
     def cont(self):
         pre_cycles = self.__get_cur_cycles()
+        if self.waveforms:
+            # The interpreter runs to the watchpoint in one call, step it one
+            # half cycle at a time instead so that every half cycle is sampled
+            while True:
+                state = self.advance(1)
+                if state.triggered_points:
+                    break
+            post_cycles = self.__get_cur_cycles()
+            return ExecutionState(triggered_points=state.triggered_points, clock=self.__get_clock_value(), cycles=(post_cycles - pre_cycles))
+
         self.simulator_state.run()
         post_cycles = self.__get_cur_cycles()
+        self.halfcycles += 2 * (post_cycles - pre_cycles)
+        self.sample_waveforms()
         return ExecutionState(triggered_points=self.__get_triggered_points(), clock=self.__get_clock_value(), cycles=(post_cycles - pre_cycles))
 
     def add_watchpoint(self, bit, scope, value=None):
@@ -9,6 +9,7 @@ from ..bitutils import seq2int, int2seq
 from ..ref import InstRef, DefnRef
 from ..compatibility import builtins
 from magma.waveform import waveform
+from .vcd import VCDWriter
 from code import compile_command
 import re
 import sys
@@ -121,6 +122,7 @@ class SimulationConsole(cmd.Cmd):
         cmd.Cmd.__init__(self, completekey=None)
 
         self.scope = Scope()
+        self.vcd = None
         self.top_circuit = circuit
         self.simulator = simulator
         self.vars = {}
@@ -367,6 +369,8 @@ class SimulationConsole(cmd.Cmd):
 
     def do_quit(self, arg):
         'quit: Exit the simulator'
+        if self.vcd is not None:
+            self.vcd.close()
         return True
 
     def do_next(self, arg):
@@ -623,18 +627,41 @@ class SimulationConsole(cmd.Cmd):
 
         labels = [arg]
         signals = []
+        start = self.simulator.get_time()
 
         for i in range(self.cycles - 1):
             val = self.simulator.get_value(waveme, scope)
             signals.insert(0, [seq2int(val)])
             self.simulator.rewind(2)
 
-        for i in range(self.cycles - 1):
-            self.simulator.step()
-            self.simulator.step()
+        # Back to where we started, the watchpoints were already hit
+        self.simulator.advance(2 * (self.cycles - 1), stop_at_watchpoints=False)
+        assert self.simulator.get_time() == start
 
         waveform(signals, labels)
 
+    def do_dump(self, arg):
+        'dump FILE [PATTERN...]: streams the signals matching PATTERN (default: top level ports) to the VCD file FILE. dump with no argument stops dumping.'
+        args = arg.split()
+        if not args:
+            if self.vcd is None:
+                print_err("Not dumping any waveform")
+            else:
+                self.vcd.close()
+                self.vcd = None
+            return
+
+        if self.vcd is not None:
+            self.vcd.close()
+
+        patterns = args[1:] if len(args) > 1 else None
+        try:
+            self.vcd = VCDWriter(args[0], self.top_circuit, patterns)
+            self.simulator.add_waveform(self.vcd)
+        except Exception as e:
+            print_err("Cannot dump waveform: {}".format(e))
+            self.vcd = None
+
     def run(self):
         self.simulator.evaluate()
 
@@ -0,0 +1,109 @@
+import json
+from time import perf_counter
+
+__all__ = ['Profiler']
+
+
+class PrimitiveProfile:
+    def __init__(self, name, type_name, scope):
+        self.name = name
+        self.type_name = type_name
+        self.scope = scope
+        self.calls = 0
+        self.time = 0.0
+
+
+class Profiler:
+    """
+    Counts the calls and the time spent in the simulation function of every
+    primitive of a `PythonSimulator(..., profile=True)`, and the number of
+    evaluations of the circuit.
+
+    `table(key)` and `to_json(key)` report the totals per primitive type
+    (`key='type'`), per instance (`key='instance'`) or per hierarchical scope
+    (`key='scope'`, the totals of a scope include the scopes nested in it),
+    sorted by decreasing time.
+    """
+    def __init__(self):
+        self.primitives = []
+        self.evaluations = 0
+        self.evaluate_time = 0.0
+
+    def instrument(self, primitive, name, type_name, scope):
+        """
+        Replaces the simulation functions of the `SimPrimitive` `primitive` by
+        timed wrappers
+        """
+        entry = PrimitiveProfile(name, type_name, scope)
+        self.primitives.append(entry)
+
+        def timed(fn):
+            def simulate(value_store, state_store):
+                start = perf_counter()
+                fn(value_store, state_store)
+                entry.time += perf_counter() - start
+                entry.calls += 1
+            return simulate
+
+        if primitive.simulate_fn is not None:
+            primitive.simulate_fn = timed(primitive.simulate_fn)
+        if getattr(primitive, 'simulate_batch', None) is not None:
+            primitive.simulate_batch = timed(primitive.simulate_batch)
+
+    def reset(self):
+        for entry in self.primitives:
+            entry.calls = 0
+            entry.time = 0.0
+        self.evaluations = 0
+        self.evaluate_time = 0.0
+
+    def evaluations_per_second(self):
+        if self.evaluate_time == 0:
+            return 0.0
+        return self.evaluations / self.evaluate_time
+
+    def totals(self, key='type'):
+        """
+        Returns a list of (name, calls, time) sorted by decreasing time
+        """
+        totals = {}
+        for entry in self.primitives:
+            if key == 'type':
+                names = [entry.type_name]
+            elif key == 'instance':
+                names = [entry.name]
+            elif key == 'scope':
+                parts = entry.scope.strip('/').split('/')
+                names = ['/'] + ['/' + '/'.join(parts[:i + 1])
+                                 for i in range(len(parts)) if parts[i]]
+            else:
+                raise ValueError("Unknown profile key {}".format(key))
+            for name in names:
+                calls, time = totals.get(name, (0, 0.0))
+                totals[name] = (calls + entry.calls, time + entry.time)
+
+        return sorted(((name, calls, time)
+                       for name, (calls, time) in totals.items()),
+                      key=lambda total: (-total[2], total[0]))
+
+    def table(self, key='type', limit=None):
+        totals = self.totals(key)[:limit]
+        width = max([len(key)] + [len(name) for name, _, _ in totals])
+        lines = ['{:<{}}  {:>10}  {:>10}  {:>10}'.format(
+            key, width, 'calls', 'time (s)', 'us/call')]
+        for name, calls, time in totals:
+            per_call = 1e6 * time / calls if calls else 0.0
+            lines.append('{:<{}}  {:>10}  {:>10.6f}  {:>10.3f}'.format(
+                name, width, calls, time, per_call))
+        lines.append('{} evaluations, {:.1f} evaluations/s'.format(
+            self.evaluations, self.evaluations_per_second()))
+        return '\n'.join(lines)
+
+    def to_json(self, key='type'):
+        return json.dumps({
+            'evaluations': self.evaluations,
+            'evaluate_time': self.evaluate_time,
+            'evaluations_per_second': self.evaluations_per_second(),
+            key: [{'name': name, 'calls': calls, 'time': time}
+                  for name, calls, time in self.totals(key)],
+        }, indent=2)
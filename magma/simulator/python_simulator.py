@@ -5,22 +5,39 @@ if sys.version_info < (3, 4):
     ABC = abc.ABCMeta('ABC', (object,), {})
 else:
     from abc import ABC
-from collections import namedtuple
-from itertools import product
+from collections import namedtuple, deque
+from copy import deepcopy
+import hashlib
+import io
+import importlib
+import os
+import random
+import json
+import zlib
+from itertools import product, islice, repeat
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+import numpy as np
 from .simulator import CircuitSimulator, ExecutionState
+from .profiler import Profiler
 from ..transforms import flatten, setup_clocks
 from ..circuit import *
 from ..scope import *
 from ..bit import VCC, GND, BitType, _BitType
-from ..array import ArrayType
+from ..array import ArrayType, ArrayKind
+from ..ref import ArrayRef, InstRef, TupleRef
 from ..bits import SIntType, BitsType
 from ..bit_vector import BitVector
-from ..bitutils import seq2int
+from ..bitutils import seq2int, int2seq
 from ..clock import ClockType
+from ..testing.utils import testvector_values, iter_testvector_inputs, \
+    count_testvector_inputs, testvector_shards
 
 __all__ = ['PythonSimulator', 'testvectors']
 
 ExecutionOrder = namedtuple('ExecutionOrder', ['stateful', 'combinational'])
+Checkpoint = namedtuple('Checkpoint', ['halfcycles', 'values', 'states',
+                                       'schedule'])
 
 
 class PythonSimulatorException(Exception):
@@ -29,9 +46,9 @@ class PythonSimulatorException(Exception):
 
 class SimPrimitive:
     def __init__(self, primitive, value_store):
-        if primitive.simulate is None:
-            raise ValueError("Cannot simulate {} of type {} because it does not have a Python simulate method".format(primitive, type(primitive)))
+        self.check_simulate(primitive)
         self.primitive = primitive
+        self.simulate_fn = primitive.simulate
         self.inputs = []
         self.outputs = []
         self.value_store = value_store
@@ -46,6 +63,14 @@ class SimPrimitive:
                 else:
                     self.outputs.append(b)
 
+        self.input_bits = sum((b.flatten() for b in self.inputs), [])
+        self.output_bits = sum((b.flatten() for b in self.outputs), [])
+
+    @staticmethod
+    def check_simulate(primitive):
+        if primitive.simulate is None:
+            raise ValueError("Cannot simulate {} of type {} because it does not have a Python simulate method".format(primitive, type(primitive)))
+
     def stateful(self):
         return self.primitive.stateful
 
@@ -63,7 +88,66 @@ class SimPrimitive:
             self.value_store.set_value(o, False)
 
     def simulate(self):
-        self.primitive.simulate(self.value_store, self.state_store)
+        self.simulate_fn(self.value_store, self.state_store)
+
+    def get_state(self):
+        return deepcopy(self.state_store)
+
+    def set_state(self, state):
+        # Updated in place, compiled evaluation functions hold a reference
+        self.state_store.clear()
+        self.state_store.update(deepcopy(state))
+
+    def simulate_changes(self):
+        """
+        Simulates the primitive and returns the output bits whose value was
+        changed by the simulation
+        """
+        get_value = self.value_store.get_value
+        old = [get_value(b) for b in self.output_bits]
+        self.simulate()
+        return [b for b, v in zip(self.output_bits, old) if get_value(b) != v]
+
+class LaneSimPrimitive(SimPrimitive):
+    """
+    SimPrimitive used in bit-parallel mode. Primitives providing a
+    `simulate_batch` method are simulated once for all the lanes, other
+    primitives are simulated once per lane through a `LaneView`, with an
+    independent state store per lane.
+    """
+    def __init__(self, primitive, value_store):
+        super(LaneSimPrimitive, self).__init__(primitive, value_store)
+        self.simulate_batch = getattr(primitive, 'simulate_batch', None)
+        if self.simulate_batch is None:
+            self.views = [LaneView(value_store, lane)
+                          for lane in range(value_store.lanes)]
+            self.lane_states = [{} for _ in range(value_store.lanes)]
+
+    @staticmethod
+    def check_simulate(primitive):
+        if getattr(primitive, 'simulate_batch', None) is None:
+            SimPrimitive.check_simulate(primitive)
+
+    def get_state(self):
+        if self.simulate_batch is not None:
+            return super(LaneSimPrimitive, self).get_state()
+        return deepcopy(self.lane_states)
+
+    def set_state(self, state):
+        if self.simulate_batch is not None:
+            super(LaneSimPrimitive, self).set_state(state)
+            return
+        for lane_state, saved in zip(self.lane_states, state):
+            lane_state.clear()
+            lane_state.update(deepcopy(saved))
+
+    def simulate(self):
+        if self.simulate_batch is not None:
+            self.simulate_batch(self.value_store, self.state_store)
+        else:
+            simulate = self.simulate_fn
+            for view, state_store in zip(self.views, self.lane_states):
+                simulate(view, state_store)
 
 class WatchPoint:
     idx = 0
@@ -72,13 +156,15 @@ class WatchPoint:
         self.scope = scope
         self.simulator = simulator
         self.value = value
-        self.old_val = self.simulator.get_value(self.bit, self.scope)
+        self.handle = simulator.resolve(bit, scope)
+        self.nets = get_nets(self.handle.newbit)
+        self.old_val = self.handle.get()
 
         WatchPoint.idx += 1
         self.idx = WatchPoint.idx
 
     def was_triggered(self):
-        new_val = self.simulator.get_value(self.bit, self.scope)
+        new_val = self.handle.get()
         triggered = new_val != self.old_val 
         if self.value:
             if self.value != new_val:
@@ -87,6 +173,90 @@ class WatchPoint:
 
         return triggered
 
+class SignalHandle:
+    """
+    Accessor for a bit of the simulated circuit returned by
+    `PythonSimulator.resolve`
+    """
+    def __init__(self, bit, newbit, read, write):
+        self.bit = bit
+        self.newbit = newbit
+        self.read = read
+        self.write = write
+
+    def get(self):
+        try:
+            return self.read()
+        except KeyError:
+            return None
+
+    def set(self, newval):
+        self.write(newval)
+
+def get_nets(bit):
+    """
+    Returns the nets read by `bit` (or a list of bits) in the flattened
+    circuit, i.e. the driving output bit of each of its elements. Constants
+    are left out since they never change.
+    """
+    if bit is None:
+        return []
+    if isinstance(bit, list):
+        bits = bit
+    else:
+        bits = bit.flatten() if isinstance(bit, ArrayType) else [bit]
+    nets = []
+    for b in bits:
+        if b.isinput():
+            b = b.value()
+        if b is not None and not b.const():
+            nets.append(b)
+    return nets
+
+def flatten_values(value):
+    if isinstance(value, list):
+        return sum((flatten_values(v) for v in value), [])
+    return [value]
+
+def value_layout(bit):
+    """
+    Returns None for a bit, and for an array the position of each of its
+    bits in `bit.flatten()`, in lists nested like the array
+    """
+    if not isinstance(bit, ArrayType):
+        return None
+    positions = iter(range(len(bit.flatten())))
+    def layout(b):
+        if isinstance(b, ArrayType):
+            return [layout(e) for e in b]
+        return next(positions)
+    return layout(bit)
+
+def fill_layout(layout, value):
+    """
+    Returns the bits of the integer `value` nested like `layout`
+    """
+    return [fill_layout(l, value) if isinstance(l, list)
+            else bool((value >> l) & 1) for l in layout]
+
+def to_bool(newval):
+    if isinstance(newval, BitVector):
+        assert len(newval) == 1
+        newval = newval.as_bool_list()[0]
+    if isinstance(newval, int) and newval in {0, 1}:
+        newval = bool(newval)
+    assert isinstance(newval, bool), "Can only set boolean values"
+    return newval
+
+def to_bool_list(newval):
+    if isinstance(newval, BitVector):
+        newval = newval.as_bool_list()
+    elif isinstance(newval, BitsType):
+        if not newval.const():
+            raise ValueError("Calling set_value with a BitsType only works with a constant")
+        newval = newval.bits()
+    return newval
+
 class ValueStore:
     def __init__(self):
         self.value_map = {}
@@ -121,31 +291,526 @@ class ValueStore:
 
     def set_value(self, bit, newval):
         if isinstance(bit, ArrayType):
-            if isinstance(newval, BitVector):
-                newval = newval.as_bool_list()
-            elif isinstance(newval, BitsType):
-                if not newval.const():
-                    raise ValueError("Calling set_value with a BitsType only works with a constant")
-                newval = newval.bits()
-            for b,v in zip(bit, newval):
+            for b,v in zip(bit, to_bool_list(newval)):
                 self.set_value(b, v)
             return
 
-        if isinstance(newval, BitVector):
-            assert len(newval) == 1
-            newval = newval.as_bool_list()[0]
-        if isinstance(newval, int) and newval in {0, 1}:
-            newval = bool(newval)
-        assert isinstance(newval, bool), "Can only set boolean values"
+        newval = to_bool(newval)
         assert bit.isoutput()
 
         self.value_map[bit] = newval
 
+    def reader(self, bit):
+        """
+        Returns a function reading the current value of `bit`, the driver of
+        each of its bits is looked up once
+        """
+        if isinstance(bit, ArrayType):
+            readers = [self.reader(b) for b in bit]
+            return lambda: [read() for read in readers]
+
+        if bit.isinput():
+            bit = bit.value()
+        if bit is None:
+            def read():
+                raise KeyError(bit)
+            return read
+        if bit.const():
+            value = bit == VCC
+            return lambda: value
+
+        value_map = self.value_map
+        return lambda: value_map[bit]
+
+    def snapshot(self):
+        return dict(self.value_map)
+
+    def restore(self, snapshot):
+        self.value_map.clear()
+        self.value_map.update(snapshot)
+
+    def get_word(self, bit):
+        """
+        Returns the value of `bit` as an integer, element 0 of an array is the
+        least significant bit
+        """
+        if isinstance(bit, ArrayType):
+            return seq2int([self.get_value(b) for b in bit.flatten()])
+        return int(self.get_value(bit))
+
+    def set_word(self, bit, newval):
+        if isinstance(bit, ArrayType):
+            bits = bit.flatten()
+            for b, v in zip(bits, int2seq(newval, len(bits))):
+                self.set_value(b, bool(v))
+            return
+        self.set_value(bit, bool(newval & 1))
+
+class IndexedValueStore(ValueStore):
+    """
+    ValueStore used by the compiled mode of the simulator. Every net is kept
+    in one slot of a flat list. A bit is resolved to the slot of its driver
+    the first time it is used, so later reads and writes cost a dict lookup
+    and a list index instead of the `isinput()`/`value()` walk done by
+    `ValueStore`.
+    """
+    def __init__(self):
+        # Slot 0 and 1 hold the constants
+        self.values = [False, True]
+        self.slots = {GND: 0, VCC: 1}
+        self.array_slots = {}
+
+    def slot(self, bit):
+        try:
+            return self.slots[bit]
+        except KeyError:
+            pass
+
+        driver = bit.value() if bit.isinput() else bit
+        if driver is None:
+            raise KeyError(bit)
+        slot = self.slots.get(driver)
+        if slot is None:
+            slot = len(self.values)
+            self.values.append(None)
+            self.slots[driver] = slot
+        self.slots[bit] = slot
+        return slot
+
+    def get_slots(self, bit):
+        """
+        Returns the slots of the elements of the array `bit`, caching them if
+        they are all bits
+        """
+        try:
+            return self.array_slots[bit]
+        except KeyError:
+            pass
+
+        if any(isinstance(b, ArrayType) for b in bit):
+            return None
+        slots = tuple(self.slot(b) for b in bit)
+        if not bit.anon():
+            self.array_slots[bit] = slots
+        return slots
+
+    def value_initialized(self, bit):
+        if isinstance(bit, ArrayType):
+            return all(self.value_initialized(b) for b in bit)
+
+        try:
+            return self.values[self.slot(bit)] is not None
+        except KeyError:
+            return False
+
+    def get_value(self, bit):
+        if isinstance(bit, ArrayType):
+            slots = self.get_slots(bit)
+            if slots is None:
+                return [self.get_value(b) for b in bit]
+            values = [self.values[s] for s in slots]
+            if None in values:
+                raise KeyError(bit)
+            return values
+
+        value = self.values[self.slot(bit)]
+        if value is None:
+            raise KeyError(bit)
+        return value
+
+    def set_value(self, bit, newval):
+        if isinstance(bit, ArrayType):
+            for b,v in zip(bit, to_bool_list(newval)):
+                self.set_value(b, v)
+            return
+
+        newval = to_bool(newval)
+        assert bit.isoutput()
+
+        self.values[self.slot(bit)] = newval
+
+    def reader(self, bit):
+        values = self.values
+        try:
+            if isinstance(bit, ArrayType):
+                slots = self.get_slots(bit)
+            else:
+                slot = self.slot(bit)
+        except KeyError:
+            # Undriven, reading it raises a KeyError like get_value
+            return lambda: self.get_value(bit)
+
+        if isinstance(bit, ArrayType):
+            if slots is None:
+                readers = [self.reader(b) for b in bit]
+                return lambda: [read() for read in readers]
+            def read():
+                result = [values[s] for s in slots]
+                if None in result:
+                    raise KeyError(bit)
+                return result
+            return read
+
+        def read():
+            value = values[slot]
+            if value is None:
+                raise KeyError(bit)
+            return value
+        return read
+
+    def snapshot(self):
+        return list(self.values)
+
+    def restore(self, snapshot):
+        self.values[:len(snapshot)] = snapshot
+
+class PackedValueStore(ValueStore):
+    """
+    ValueStore that keeps each net as one Python int. A whole array driven by
+    a primitive or by the circuit (the root array of its bits) is stored as
+    a single word, so `get_word`/`set_word` on a whole array cost one shift
+    and mask instead of one dict lookup per bit. Single bits and partial
+    arrays are read and written by bitmask.
+    """
+    def __init__(self):
+        # Word 0 holds the constants, GND is bit 0 and VCC is bit 1
+        self.words = [2]
+        self.known = [3]
+        self.locs = {GND: (0, 0), VCC: (0, 1)}
+        self.plans = {}
+
+    def loc(self, bit):
+        """
+        Returns the (word, offset) holding the value of `bit`
+        """
+        try:
+            return self.locs[bit]
+        except KeyError:
+            pass
+
+        if bit.isinput():
+            driver = bit.value()
+            if driver is None:
+                raise KeyError(bit)
+            loc = self.loc(driver)
+            self.locs[bit] = loc
+            return loc
+
+        root = bit
+        while isinstance(root.name, ArrayRef):
+            root = root.name.array
+        word = len(self.words)
+        self.words.append(0)
+        self.known.append(0)
+        for offset, b in enumerate(root.flatten()):
+            self.locs[b] = (word, offset)
+        return self.locs[bit]
+
+    def plan(self, bit):
+        """
+        Returns (word, offset, mask) if the bits of the array `bit` are
+        contiguous in one word, otherwise (None, locs, None)
+        """
+        try:
+            return self.plans[bit]
+        except KeyError:
+            pass
+
+        locs = [self.loc(b) for b in bit.flatten()]
+        word, offset = locs[0]
+        if all(l == (word, offset + i) for i, l in enumerate(locs)):
+            plan = (word, offset, (1 << len(locs)) - 1)
+        else:
+            plan = (None, locs, None)
+        if not bit.anon():
+            self.plans[bit] = plan
+        return plan
+
+    def value_initialized(self, bit):
+        if isinstance(bit, ArrayType):
+            return all(self.value_initialized(b) for b in bit.flatten())
+
+        try:
+            word, offset = self.loc(bit)
+        except KeyError:
+            return False
+        return bool((self.known[word] >> offset) & 1)
+
+    def get_word(self, bit):
+        if not isinstance(bit, ArrayType):
+            word, offset = self.loc(bit)
+            if not (self.known[word] >> offset) & 1:
+                raise KeyError(bit)
+            return (self.words[word] >> offset) & 1
+
+        word, offset, mask = plan = self.plan(bit)
+        if word is not None:
+            if (self.known[word] >> offset) & mask != mask:
+                raise KeyError(bit)
+            return (self.words[word] >> offset) & mask
+
+        value = 0
+        for i, (word, offset) in enumerate(plan[1]):
+            if not (self.known[word] >> offset) & 1:
+                raise KeyError(bit)
+            value |= ((self.words[word] >> offset) & 1) << i
+        return value
+
+    def set_word(self, bit, newval):
+        assert bit.isoutput()
+        if not isinstance(bit, ArrayType):
+            word, offset = self.loc(bit)
+            word_mask = 1 << offset
+            if newval & 1:
+                self.words[word] |= word_mask
+            else:
+                self.words[word] &= ~word_mask
+            self.known[word] |= word_mask
+            return
+
+        word, offset, mask = plan = self.plan(bit)
+        if word is not None:
+            self.words[word] = (self.words[word] & ~(mask << offset)) | \
+                               ((newval & mask) << offset)
+            self.known[word] |= mask << offset
+            return
+
+        for i, (word, offset) in enumerate(plan[1]):
+            word_mask = 1 << offset
+            if (newval >> i) & 1:
+                self.words[word] |= word_mask
+            else:
+                self.words[word] &= ~word_mask
+            self.known[word] |= word_mask
+
+    def get_value(self, bit):
+        if isinstance(bit, ArrayType):
+            if isinstance(bit.T, ArrayKind):
+                return [self.get_value(b) for b in bit]
+            value = self.get_word(bit)
+            return [bool((value >> i) & 1) for i in range(len(bit))]
+
+        return bool(self.get_word(bit))
+
+    def set_value(self, bit, newval):
+        if isinstance(bit, ArrayType):
+            newval = to_bool_list(newval)
+            if isinstance(bit.T, ArrayKind) or len(newval) < len(bit):
+                for b, v in zip(bit, newval):
+                    self.set_value(b, v)
+                return
+            self.set_word(bit, seq2int([to_bool(v) for v in newval[:len(bit)]]))
+            return
+
+        self.set_word(bit, int(to_bool(newval)))
+
+    def reader(self, bit):
+        return lambda: self.get_value(bit)
+
+    def snapshot(self):
+        return list(self.words), list(self.known)
+
+    def restore(self, snapshot):
+        words, known = snapshot
+        self.words[:len(words)] = words
+        self.known[:len(known)] = known
+
+class LaneValueStore(ValueStore):
+    """
+    ValueStore used in bit-parallel mode. Each net holds an int with one bit
+    per lane, lane `i` being bit `i`, so one evaluation of the circuit
+    simulates `lanes` independent stimuli.
+
+    `get_value` returns the lanes of a bit as an int (a list of ints for an
+    array). `set_value` takes an int, or a bool which is broadcast to every
+    lane.
+    """
+    def __init__(self, lanes):
+        super(LaneValueStore, self).__init__()
+        self.lanes = lanes
+        self.mask = (1 << lanes) - 1
+
+    def get_value(self, bit):
+        if isinstance(bit, ArrayType):
+            return [self.get_value(b) for b in bit]
+
+        if bit.isinput():
+            bit = bit.value()
+
+        if bit.const():
+            return self.mask if bit == VCC else 0
+
+        return self.value_map[bit]
+
+    def set_value(self, bit, newval):
+        if isinstance(bit, ArrayType):
+            if isinstance(newval, bool):
+                newval = len(bit) * [newval]
+            for b, v in zip(bit, newval):
+                self.set_value(b, v)
+            return
+
+        if isinstance(newval, bool):
+            newval = self.mask if newval else 0
+        assert isinstance(newval, int), "Can only set lanes from an int or a bool"
+        assert bit.isoutput()
+
+        self.value_map[bit] = newval & self.mask
+
+    def get_word(self, bit):
+        raise PythonSimulatorException("get_word is not supported by a LaneValueStore, use get_lane_words")
+
+    def set_word(self, bit, newval):
+        raise PythonSimulatorException("set_word is not supported by a LaneValueStore, use set_lane_words")
+
+    def get_lane_words(self, bit):
+        """
+        Returns the value of `bit` in every lane as a list of ints
+        """
+        bits = bit.flatten()
+        lanes = [self.get_value(b) for b in bits]
+        return [sum(((l >> lane) & 1) << i for i, l in enumerate(lanes))
+                for lane in range(self.lanes)]
+
+    def set_lane_words(self, bit, words):
+        """
+        Sets `bit` from a list with one int per lane
+        """
+        words = list(words)
+        assert len(words) == self.lanes
+        for i, b in enumerate(bit.flatten()):
+            self.set_value(b, sum(((w >> i) & 1) << lane
+                                  for lane, w in enumerate(words)))
+
+    def get_lane_values(self, bit):
+        """
+        Returns the value of `bit` in every lane, in the format used by
+        `ValueStore.get_value`
+        """
+        return [LaneView(self, lane).get_value(bit)
+                for lane in range(self.lanes)]
+
+    def set_lane_values(self, bit, values):
+        """
+        Sets `bit` from a list with one value per lane, in any format accepted
+        by `ValueStore.set_value`
+        """
+        values = list(values)
+        assert len(values) == self.lanes
+        if isinstance(bit, ArrayType):
+            values = [to_bool_list(v) for v in values]
+            for i, b in enumerate(bit):
+                self.set_lane_values(b, [v[i] for v in values])
+            return
+
+        lanes = 0
+        for lane, v in enumerate(values):
+            if to_bool(v):
+                lanes |= 1 << lane
+        self.set_value(bit, lanes)
+
+class LaneView(ValueStore):
+    """
+    Presents one lane of a LaneValueStore as a scalar ValueStore, used to
+    simulate primitives that do not provide a `simulate_batch` method
+    """
+    def __init__(self, store, lane):
+        self.store = store
+        self.lane = lane
+        self.lane_mask = 1 << lane
+
+    def value_initialized(self, bit):
+        return self.store.value_initialized(bit)
+
+    def get_value(self, bit):
+        if isinstance(bit, ArrayType):
+            return [self.get_value(b) for b in bit]
+
+        return bool(self.store.get_value(bit) & self.lane_mask)
+
+    def set_value(self, bit, newval):
+        if isinstance(bit, ArrayType):
+            for b,v in zip(bit, to_bool_list(newval)):
+                self.set_value(b, v)
+            return
+
+        newval = to_bool(newval)
+        assert bit.isoutput()
+
+        lanes = self.store.value_map.get(bit, 0)
+        if newval:
+            lanes |= self.lane_mask
+        else:
+            lanes &= ~self.lane_mask
+        self.store.value_map[bit] = lanes
+
+def compile_evaluate(name, execution_order, value_store, inline=True):
+    """
+    Generates a straight-line Python function that runs every primitive of
+    `execution_order` once, in order. The loop over `SimPrimitive` objects and
+    the attribute lookups done per primitive by `PythonSimulator.evaluate` are
+    unrolled into one call per primitive.
+
+    Primitives declared with a `simulate_source` method are inlined instead
+    (unless `inline` is False): it is called with the primitive, a dict
+    mapping each port name to the Python expression holding its value (a list
+    of expressions for arrays) and the name of its state store, and returns
+    the lines of code simulating it. The expressions index the slots of the
+    `IndexedValueStore` `value_store` directly, e.g. a NOT gate returns
+    `['{O} = not {I}'.format(**ports)]`.
+
+    Returns the generated function and its source.
+    """
+    namespace = {'value_store': value_store, 'values': value_store.values}
+    lines = ['def evaluate():']
+    primitives = execution_order.stateful + execution_order.combinational
+    for i, primitive in enumerate(primitives):
+        namespace['state{}'.format(i)] = primitive.state_store
+        lines.append('    # {}'.format(primitive.primitive.name))
+        body = None
+        if inline:
+            body = inline_primitive(primitive, value_store, 'state{}'.format(i))
+        if body is None:
+            namespace['simulate{}'.format(i)] = primitive.simulate_fn
+            body = ['simulate{0}(value_store, state{0})'.format(i)]
+        lines.extend('    ' + line for line in body)
+    if not primitives:
+        lines.append('    pass')
+
+    source = '\n'.join(lines) + '\n'
+    code = compile(source, '<compiled {}>'.format(name), 'exec')
+    exec(code, namespace)
+    return namespace['evaluate'], source
+
+def inline_primitive(primitive, value_store, state):
+    """
+    Returns the lines of code generated by the `simulate_source` method of
+    `primitive`, or None if it does not have one or if one of its inputs is
+    not driven
+    """
+    inst = primitive.primitive
+    simulate_source = getattr(inst, 'simulate_source', None)
+    if simulate_source is None:
+        return None
+
+    def expression(bit):
+        if isinstance(bit, ArrayType):
+            return [expression(b) for b in bit]
+        return 'values[{}]'.format(value_store.slot(bit))
+
+    try:
+        ports = {name: expression(bit)
+                 for name, bit in inst.interface.ports.items()}
+    except KeyError:
+        return None
+    return list(simulate_source(ports, state))
+
 class PythonSimulator(CircuitSimulator):
     def __setup_primitives(self):
         wrapped = []
+        SimType = LaneSimPrimitive if self.lanes is not None else SimPrimitive
         for primitive in self.circuit.instances:
-            wrapped.append(SimPrimitive(primitive, self.value_store))
+            wrapped.append(SimType(primitive, self.value_store))
 
         return wrapped
 
@@ -173,11 +838,86 @@ class PythonSimulator(CircuitSimulator):
     def __outputs_initialized(self):
         for bit in self.circuit_outputs:
             assert bit.isinput()
+            if self.cone_nets is not None and bit.value() not in self.cone_nets:
+                continue
             if not self.value_store.value_initialized(bit):
                 return False
 
         return True
 
+    def __prune_primitives(self, primitives, observe):
+        """
+        Returns the primitives in the transitive fan-in cone of the nets read
+        by the signals in `observe`
+        """
+        driver_index = {}
+        for k, primitive in enumerate(primitives):
+            for bit in primitive.output_bits:
+                driver_index[bit] = k
+
+        nets = []
+        for signal in observe:
+            bit, scope = signal if isinstance(signal, tuple) else \
+                         (signal, self.default_scope)
+            nets += get_nets(self.txfm.get_new_bit(bit, scope))
+
+        cone = set()
+        in_cone = [False] * len(primitives)
+        while nets:
+            net = nets.pop()
+            if net in cone:
+                continue
+            cone.add(net)
+            k = driver_index.get(net)
+            if k is not None and not in_cone[k]:
+                in_cone[k] = True
+                nets += get_nets(primitives[k].input_bits)
+
+        self.cone_nets = cone
+        kept = [p for p, keep in zip(primitives, in_cone) if keep]
+        self.pruned_primitives = len(primitives) - len(kept)
+        return kept
+
+    def __instrument(self, primitive):
+        inst = primitive.primitive
+        qual = self.txfm.primitive_map.get(inst)
+        if qual is not None:
+            inst = qual.instance
+        scope = qual.scope.value() if qual is not None else '/'
+        self.profiler.instrument(primitive, self.__describe(primitive),
+                                 type(inst).__name__, scope)
+
+    def __describe(self, primitive):
+        inst = primitive.primitive
+        qual = self.txfm.primitive_map.get(inst)
+        if qual is None:
+            return "{} ({})".format(inst.name, type(inst).__name__)
+        return "{}/{}.{}".format(qual.scope.value().rstrip('/'),
+                                 type(qual.instance).__name__,
+                                 qual.instance.name)
+
+    def __build_graph(self, primitives):
+        """
+        Returns the successors and predecessors of each primitive in
+        `primitives`, where an edge i -> j means an output of primitives[i]
+        drives an input of primitives[j].
+        """
+        driver_index = {}
+        for k, primitive in enumerate(primitives):
+            for bit in primitive.output_bits:
+                driver_index[bit] = k
+
+        successors = [[] for _ in primitives]
+        predecessors = [[] for _ in primitives]
+        for k, primitive in enumerate(primitives):
+            for bit in primitive.input_bits:
+                j = driver_index.get(bit.value())
+                if j is not None:
+                    successors[j].append(k)
+                    predecessors[k].append(j)
+
+        return successors, predecessors
+
     def __sort_state_primitives(self, state_primitives):
         """
         State primitives should be sorted in reversed topological order.
@@ -188,79 +928,490 @@ class PythonSimulator(CircuitSimulator):
             another state element `y`,
             `y` should perform it's simulation before `x` because it will use
             the value of the signal on the previous clock cycle.
+        Cycles between state elements (e.g. a ring of registers) have no such
+        order, the elements of a cycle are appended in their original order.
         """
-        sorted_state_primitives = []
-        for primitive_1 in state_primitives:
-            inserted = False
-            for index, primitive_2 in enumerate(sorted_state_primitives):
-                for output in primitive_1.inputs:
-                    if output.value() in primitive_2.inputs:
-                        sorted_state_primitives.insert(index, primitive_1)
-                        inserted = True
-                        break
-                if inserted:
-                    break
-            if not inserted:
-                sorted_state_primitives.append(primitive_1)
-        sorted_state_primitives.reverse()
-        return sorted_state_primitives
+        successors, predecessors = self.__build_graph(state_primitives)
+
+        remaining = [len(s) for s in successors]
+        ready = deque(k for k, n in enumerate(remaining) if n == 0)
+        placed = [False] * len(state_primitives)
+        order = []
+        while len(order) < len(state_primitives):
+            if not ready:
+                ready.append(placed.index(False))
+            k = ready.popleft()
+            if placed[k]:
+                continue
+            placed[k] = True
+            order.append(k)
+            for j in predecessors[k]:
+                remaining[j] -= 1
+                if remaining[j] == 0:
+                    ready.append(j)
+
+        return [state_primitives[k] for k in order]
+
+    def __find_loop(self, primitives, predecessors, placed):
+        """
+        Returns the primitives on a combinational loop in the unplaced part of
+        the graph, in the direction signals flow
+        """
+        k = placed.index(False)
+        path = []
+        seen = {}
+        while k not in seen:
+            seen[k] = len(path)
+            path.append(k)
+            k = next(j for j in predecessors[k] if not placed[j])
+        loop = path[seen[k]:]
+        loop.reverse()
+        return [primitives[j] for j in loop + loop[:1]]
+
+    def __sort_combinational_primitives(self, primitives):
+        """
+        Kahn's algorithm over the nets connecting the combinational
+        primitives, O(V+E)
+        """
+        for primitive in primitives:
+            for bit in primitive.input_bits:
+                driver = bit.value()
+                if driver is None:
+                    raise PythonSimulatorException(
+                        "Input {} of {} is not driven".format(
+                            bit, self.__describe(primitive)))
+
+        successors, predecessors = self.__build_graph(primitives)
+
+        indegree = [len(p) for p in predecessors]
+        ready = deque(k for k, n in enumerate(indegree) if n == 0)
+        placed = [False] * len(primitives)
+        order = []
+        while ready:
+            k = ready.popleft()
+            placed[k] = True
+            order.append(primitives[k])
+            for j in successors[k]:
+                indegree[j] -= 1
+                if indegree[j] == 0:
+                    ready.append(j)
+
+        if len(order) < len(primitives):
+            loop = self.__find_loop(primitives, predecessors, placed)
+            raise PythonSimulatorException(
+                "Combinational loop detected: {}".format(
+                    " -> ".join(self.__describe(p) for p in loop)))
+
+        for primitive in order:
+            primitive.initialize_outputs()
+
+        return order
+
+    def __fold_constants(self):
+        """
+        Constant propagation over the combinational primitives, in topological
+        order: a primitive whose inputs are all driven by constants or by
+        folded primitives is simulated once and dropped from the schedule, its
+        outputs keep the computed values.
+        """
+        constant = set()
+        combinational = []
+        for primitive in self.execution_order.combinational:
+            drivers = [bit.value() for bit in primitive.input_bits]
+            if all(d.const() or d in constant for d in drivers):
+                primitive.simulate()
+                constant.update(primitive.output_bits)
+            else:
+                combinational.append(primitive)
 
-    def __get_ordered_primitives(self, unordered_primitives):
-        state_primitives = []
-        after_state = []
+        self.folded_primitives = len(self.execution_order.combinational) - \
+                                 len(combinational)
+        self.execution_order = ExecutionOrder(
+            stateful=self.execution_order.stateful,
+            combinational=combinational)
 
+    def __get_ordered_primitives(self, unordered_primitives):
         state_primitives = []
+        combinational = []
         for primitive in unordered_primitives:
             if primitive.stateful():
                 primitive.initialize_outputs()
                 state_primitives.append(primitive)
+            else:
+                combinational.append(primitive)
 
         sorted_state_primitives = self.__sort_state_primitives(state_primitives)
+        combinational = self.__sort_combinational_primitives(combinational)
 
-        unordered_primitives[:] = [u for u in unordered_primitives if not u.stateful()]
+        return ExecutionOrder(stateful=sorted_state_primitives, combinational=combinational)
 
-        combinational = []
-        while len(unordered_primitives) > 0:
-            found = False
-            for primitive in unordered_primitives:
-                if primitive.inputs_satisfied():
-                    primitive.initialize_outputs()
-                    combinational.append(primitive)
-                    unordered_primitives.remove(primitive)
-                    found = True
+    def __setup_events(self):
+        """
+        Builds the fanout index used by the event driven scheduler: a map from
+        each net to the combinational primitives reading it, and the level of
+        each combinational primitive (its depth in the combinational logic).
+        A primitive only reads nets driven from lower levels, so evaluating
+        the worklist level by level respects the topological order.
+        """
+        combinational = self.execution_order.combinational
+        driver_index = {}
+        for k, primitive in enumerate(combinational):
+            for bit in primitive.output_bits:
+                driver_index[bit] = k
+
+        self.fanout = {}
+        self.levels = []
+        for k, primitive in enumerate(combinational):
+            level = 0
+            for bit in primitive.input_bits:
+                driver = bit.value()
+                if driver is None or driver.const():
+                    continue
+                readers = self.fanout.setdefault(driver, [])
+                if not readers or readers[-1] != k:
+                    readers.append(k)
+                if driver in driver_index:
+                    level = max(level, self.levels[driver_index[driver]] + 1)
+            self.levels.append(level)
+
+        self.nlevels = max(self.levels) + 1 if self.levels else 0
+        # None means every primitive has to be evaluated
+        self.pending = None
+        # Nets changed since the watchpoints were last checked, None when
+        # every net may have changed
+        self.changed_nets = None
+        self.evaluated_primitives = 0
+
+    def __mark_changed(self, bit):
+        if self.event_driven and self.pending is not None:
+            self.pending.update(bit.flatten())
+
+    def __evaluate_events(self):
+        combinational = self.execution_order.combinational
+        levels = self.levels
+        fanout = self.fanout
+        worklist = [[] for _ in range(self.nlevels)]
+        scheduled = set()
+        changed_nets = self.changed_nets if self.watched_nets else None
+
+        def schedule(changed):
+            if changed_nets is not None:
+                changed_nets.update(changed)
+            for bit in changed:
+                for k in fanout.get(bit, ()):
+                    if k not in scheduled:
+                        scheduled.add(k)
+                        worklist[levels[k]].append(k)
+
+        if self.pending is None:
+            for k in range(len(combinational)):
+                scheduled.add(k)
+                worklist[levels[k]].append(k)
+            changed_nets = self.changed_nets = None
+        else:
+            schedule(self.pending)
+        self.pending = set()
+
+        stateful = self.__stateful_primitives()
+        for primitive in stateful:
+            schedule(primitive.simulate_changes())
+
+        for bucket in worklist:
+            for k in bucket:
+                schedule(combinational[k].simulate_changes())
+
+        self.evaluated_primitives = len(stateful) + len(scheduled)
+
+    def __checkpoint(self):
+        """
+        Saves the state at the end of the current half cycle, before the
+        clock is toggled, every `checkpoint_interval` half cycles. The oldest
+        checkpoint is dropped when the ring buffer is full, along with the
+        input history that can no longer be replayed.
+        """
+        if self.checkpoints is None or \
+           self.halfcycles % self.checkpoint_interval != 0:
+            return
+        if self.checkpoints and self.checkpoints[-1].halfcycles == self.halfcycles:
+            self.checkpoints.pop()
+        primitives = self.execution_order.stateful + \
+                     self.execution_order.combinational
+        self.checkpoints.append(Checkpoint(
+            halfcycles=self.halfcycles,
+            values=self.value_store.snapshot(),
+            states=[p.get_state() for p in primitives],
+            schedule=self.__save_schedule()))
+        oldest = self.checkpoints[0].halfcycles
+        while self.input_log and self.input_log[0][0] < oldest:
+            self.input_log.popleft()
+
+    def __save_schedule(self):
+        if self.clock_schedule is None:
+            return None
+        time, next_edges = self.clock_schedule
+        return (time, dict(next_edges))
+
+    def __restore(self, checkpoint):
+        primitives = self.execution_order.stateful + \
+                     self.execution_order.combinational
+        self.value_store.restore(checkpoint.values)
+        for primitive, state in zip(primitives, checkpoint.states):
+            primitive.set_state(state)
+        self.halfcycles = checkpoint.halfcycles
+        if checkpoint.schedule is not None:
+            time, next_edges = checkpoint.schedule
+            self.clock_schedule = [time, dict(next_edges)]
+            self.fired_clocks = None
+        if self.event_driven:
+            self.pending = None
+
+    def __replay_inputs(self, replay):
+        """
+        Applies the inputs recorded for the current half cycle, `replay` is
+        ordered with the next input last
+        """
+        while replay and replay[-1][0] == self.halfcycles:
+            _, newbit, newval = replay.pop()
+            self.__apply_logged(newbit, newval)
+
+    def __apply_logged(self, newbit, newval):
+        """
+        Applies an entry of the input log, the entries without a bit record
+        a call to `evaluate` after the inputs were set
+        """
+        if newbit is None:
+            self.__evaluate_primitives()
+        else:
+            self.__apply_value(newbit, newval)
+
+    def __setup_clock_domains(self, clocks):
+        """
+        Sets up the edge scheduler of the clocks, and the clock domains of
+        the stateful primitives: the clocks driving their clock inputs
+        """
+        periods = {}
+        for clock, period in clocks.items():
+            phase = 0
+            if isinstance(period, tuple):
+                period, phase = period
+            if not isinstance(clock, ClockType):
+                raise ValueError("clocks must be keyed by ClockType inputs")
+            if period < 2 or period % 2 != 0:
+                raise ValueError("The period of {} must be an even number "
+                                 "of time units".format(clock))
+            newbit = self.txfm.get_new_bit(clock, self.default_scope)
+            periods[newbit] = (period // 2, phase)
+
+        # Time of the last edge, and time of the next edge of each clock
+        self.clock_periods = periods
+        self.clock_schedule = [0, {c: phase for c, (_, phase) in periods.items()}]
+        self.fired_clocks = None
+        self.domain_primitives = {}
+
+        self.clock_domains = []
+        for primitive in self.execution_order.stateful:
+            domain = set()
+            for bit in primitive.input_bits:
+                driver = bit.value()
+                if driver in periods:
+                    domain.add(driver)
+                elif isinstance(bit, ClockType):
+                    # Clocked by something else than a scheduled clock
+                    domain = None
                     break
-            assert found, "Some circuits have unsatisfied inputs"
-        
-        return ExecutionOrder(stateful=sorted_state_primitives, combinational=combinational)
+            self.clock_domains.append(domain)
+
+    def __stateful_primitives(self):
+        """
+        Returns the stateful primitives to simulate: after a clock edge only
+        the ones clocked by the clocks that toggled, and the unclocked ones
+        """
+        fired = self.fired_clocks
+        if fired is None:
+            return self.execution_order.stateful
+        self.fired_clocks = None
+        try:
+            return self.domain_primitives[fired]
+        except KeyError:
+            pass
+        primitives = [p for p, domain in zip(self.execution_order.stateful,
+                                             self.clock_domains)
+                      if not domain or domain & fired]
+        self.domain_primitives[fired] = primitives
+        return primitives
+
+    def __toggle_clock(self):
+        if self.clock_schedule is not None:
+            self.__toggle_scheduled_clocks()
+            return
+        cur_clock_val = self.value_store.get_value(self.clock)
+        self.value_store.set_value(self.clock, not cur_clock_val)
+        self.__mark_changed(self.clock)
+        self.halfcycles += 1
+
+    def __toggle_scheduled_clocks(self):
+        next_edges = self.clock_schedule[1]
+        time = min(next_edges.values())
+        fired = []
+        for clock, edge in next_edges.items():
+            if edge == time:
+                cur_clock_val = self.value_store.get_value(clock)
+                self.value_store.set_value(clock, not cur_clock_val)
+                self.__mark_changed(clock)
+                next_edges[clock] = edge + self.clock_periods[clock][0]
+                fired.append(clock)
+        self.clock_schedule[0] = time
+        self.fired_clocks = frozenset(fired)
+        self.halfcycles += 1
 
     def __step(self):
         if self.clock is None:
             raise PythonSimulatorException("Cannot step a simulated circuit "
                     "without a clock, did you pass a clock during "
                     "initialization?")
-        cur_clock_val = self.value_store.get_value(self.clock)
-        self.value_store.set_value(self.clock, not cur_clock_val)
+        # Inputs undone by rewind were set at the end of their half cycle
+        while self.future_inputs and \
+              self.future_inputs[-1][0] == self.halfcycles:
+            entry = self.future_inputs.pop()
+            self.__apply_logged(entry[1], entry[2])
+            self.input_log.append(entry)
+        self.__checkpoint()
+        self.__toggle_clock()
     
-    def __init__(self, main_circuit, clock=None):
+    def __init__(self, main_circuit, clock=None, compiled=False,
+                 event_driven=False, packed=False, lanes=None,
+                 checkpoint_interval=256, max_checkpoints=32, observe=None,
+                 fold_constants=False, profile=False, clocks=None):
+        """
+        `compiled=True` generates a straight-line evaluation function for the
+        flattened circuit and keeps all nets in an `IndexedValueStore`. The
+        code of primitives declared with a `simulate_source` method is inlined
+        in it, see `compile_evaluate`.
+
+        `packed=True` keeps all nets in a `PackedValueStore`, each array net
+        is stored as one integer.
+
+        `event_driven=True` only evaluates the combinational primitives whose
+        inputs changed since the last call to `evaluate`.
+
+        `lanes=N` simulates N independent stimuli at once in a
+        `LaneValueStore`. `get_value` and `set_value` then take and return a
+        list with one value per lane.
+
+        A checkpoint of the simulation state is saved every
+        `checkpoint_interval` half cycles in a ring buffer holding
+        `max_checkpoints` of them. `rewind` restores the closest checkpoint
+        and replays the recorded inputs up to the requested half cycle.
+        `checkpoint_interval=None` disables checkpoints and `rewind`.
+
+        `observe` is a list of the signals that will be read, watched or
+        probed, either bits of `main_circuit` or `(bit, scope)` pairs. Only
+        the primitives in their fan-in cone are simulated; signals outside
+        of it read as None and cannot be watched.
+
+        `fold_constants=True` simulates the combinational primitives whose
+        inputs are all constant once, when the simulator is built, and removes
+        them from the schedule. Their number is reported in
+        `folded_primitives`.
+
+        `profile=True` records the calls and the time spent in the simulation
+        function of every primitive in `self.profiler`, a `Profiler`.
+
+
+        `clocks` simulates several clock domains. It maps each clock input of
+        `main_circuit` to its period, or to a `(period, phase)` pair, in
+        integer time units; a clock toggles every half period from time
+        `phase` on. Each step of the simulation (e.g. `advance(1)`) moves to
+        the next edge of any clock, toggles the clocks with an edge at that
+        time and only simulates the stateful primitives clocked by them.
+        `clock`, if given, must be one of them and is the clock reported in
+        the `ExecutionState`, by default it is the first one.
+        """
         if isinstance(main_circuit, CircuitType):
             raise ValueError("PythonSimulator must be called with a Circuit definition, not an instance")
         if clock is not None and not isinstance(clock, ClockType):
             raise ValueError("clock must be a ClockType or None")
+        if clocks is not None:
+            if not clocks:
+                raise ValueError("clocks must map at least one clock to its period")
+            if clock is None:
+                clock = next(iter(clocks))
+            elif not any(clock is c for c in clocks):
+                raise ValueError("clock must be one of clocks")
+        if compiled and event_driven:
+            raise ValueError("compiled and event_driven cannot be used together")
+        if lanes is not None and (compiled or packed):
+            raise ValueError("lanes cannot be used with compiled or packed")
         setup_clocks(main_circuit)
         self.main_circuit = main_circuit
         self.txfm = flatten(main_circuit)
         self.circuit = self.txfm.circuit
-        self.value_store = ValueStore()
+        self.lanes = lanes
+        if lanes is not None:
+            self.value_store = LaneValueStore(lanes)
+        elif packed:
+            self.value_store = PackedValueStore()
+        elif compiled:
+            self.value_store = IndexedValueStore()
+        else:
+            self.value_store = ValueStore()
         self.default_scope = Scope()
         self.__setup_circuit(clock)
         self.watchpoints = []
+        self.watched_nets = {}
+        self.watched_values = {}
+        self.waveforms = []
 
         primitives = self.__setup_primitives()
+        self.profiler = None
+        if profile:
+            self.profiler = Profiler()
+            for primitive in primitives:
+                self.__instrument(primitive)
+        self.cone_nets = None
+        self.pruned_primitives = 0
+        if observe is not None:
+            primitives = self.__prune_primitives(primitives, observe)
 
         self.execution_order = self.__get_ordered_primitives(primitives)
+        self.folded_primitives = 0
+        if fold_constants:
+            self.__fold_constants()
+
+        self.clock_schedule = None
+        self.fired_clocks = None
+        self.instance_numbers = {inst: k for k, inst
+                                 in enumerate(self.circuit.instances)}
+        if clocks is not None:
+            self.__setup_clock_domains(clocks)
 
         assert self.__outputs_initialized(), "All circuit outputs not initialized."
 
+        self.compiled_evaluate = None
+        self.compiled_source = None
+        if compiled:
+            # Inlined primitives would bypass the timed simulation functions
+            self.compiled_evaluate, self.compiled_source = compile_evaluate(
+                self.circuit.name, self.execution_order, self.value_store,
+                inline=self.profiler is None)
+
+        self.event_driven = event_driven
+        if event_driven:
+            self.__setup_events()
+
+        self.halfcycles = 0
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoints = None
+        # A circuit without a clock never steps, so no checkpoint is taken
+        if checkpoint_interval is not None and self.clock is not None:
+            self.checkpoints = deque(maxlen=max_checkpoints)
+        # (halfcycles, bit, value) of every set_value since the oldest
+        # checkpoint, and of the ones undone by rewind. Within a half cycle
+        # only the last value of each input before and after the last call
+        # to evaluate is kept, see `__log_input`
+        self.input_log = deque()
+        self.future_inputs = []
+
     def get_capabilities(self):
         return []
 
@@ -272,6 +1423,8 @@ class PythonSimulator(CircuitSimulator):
             return None
 
         try:
+            if self.lanes is not None:
+                return self.value_store.get_lane_values(newbit)
             return self.value_store.get_value(newbit)
         except KeyError:
             return None
@@ -283,8 +1436,84 @@ class PythonSimulator(CircuitSimulator):
         if not self.is_circuit_input(newbit):
             message = "Only setting main's inputs is supported (Trying to set: {})".format(bit)
             raise PythonSimulatorException(message)
+        else:
+            self.__set_input(newbit, newval)
+
+    def __set_input(self, newbit, newval):
+        self.__apply_value(newbit, newval)
+        self.future_inputs = []
+        if self.checkpoints is not None:
+            self.__log_input(newbit, newval)
+
+    def __log_input(self, newbit, newval):
+        """
+        Appends an input, or a call to `evaluate` if `newbit` is None, to the
+        input log. Evaluating twice in a half cycle does not change the state
+        of the flip-flops, so the entries of the current half cycle are
+        compacted to the inputs set before the last evaluation, a marker of
+        that evaluation, and the inputs set after it, keeping the last value
+        of each input.
+        """
+        log = self.input_log
+        current = []
+        while log and log[-1][0] == self.halfcycles:
+            current.append(log.pop())
+        current.reverse()
+        if not current and newbit is None:
+            # Nothing to evaluate again when replaying
+            return
+        markers = [k for k, entry in enumerate(current) if entry[1] is None]
+        if newbit is None:
+            # The new evaluation supersedes the previous one
+            current = [entry for entry in current if entry[1] is not None]
+            split = len(current)
+        else:
+            split = markers[-1] + 1 if markers else 0
+        before = current[:split]
+        after = current[split:]
+        if newbit is None:
+            before = [entry for k, entry in enumerate(before)
+                      if not any(e[1] is entry[1] for e in before[k + 1:])]
+            after = [(self.halfcycles, None, None)]
+        else:
+            after = [entry for entry in after if entry[1] is not newbit]
+            after.append((self.halfcycles, newbit, newval))
+        log.extend(before)
+        log.extend(after)
+
+    def resolve(self, bit, scope=None):
+        """
+        Returns a `SignalHandle` for `bit`. Its `get` and `set` methods behave
+        like `get_value` and `set_value`, but `bit` is looked up in the
+        flattened circuit and in the value store only once.
+        """
+        if scope is None:
+            scope = self.default_scope
+        newbit = self.txfm.get_new_bit(bit, scope)
+
+        if newbit is None:
+            read = lambda: None
+        elif self.lanes is not None:
+            read = lambda: self.value_store.get_lane_values(newbit)
+        else:
+            read = self.value_store.reader(newbit)
+
+        if newbit is not None and self.is_circuit_input(newbit):
+            def write(newval):
+                self.__set_input(newbit, newval)
+        else:
+            def write(newval):
+                message = "Only setting main's inputs is supported (Trying to set: {})".format(bit)
+                raise PythonSimulatorException(message)
+
+        return SignalHandle(bit, newbit, read, write)
+
+    def __apply_value(self, newbit, newval):
+        if self.lanes is not None:
+            self.value_store.set_lane_values(newbit, newval)
         else:
             self.value_store.set_value(newbit, newval)
+        self.__mark_changed(newbit)
 
     def is_circuit_input(self, value):
         """
@@ -298,7 +1527,7 @@ class PythonSimulator(CircuitSimulator):
         else:
             raise NotImplementedError(type(value))
 
-    def advance(self, n=1):
+    def advance(self, n=1, stop_at_watchpoints=True):
         cycles = 0
         for i in range(0, n):
             self.__step()
@@ -306,23 +1535,88 @@ class PythonSimulator(CircuitSimulator):
 
             if not state.clock:
                 cycles += 1
-            if state.triggered_points:
+            if state.triggered_points and stop_at_watchpoints:
                 return ExecutionState(triggered_points=state.triggered_points, clock=state.clock, cycles=cycles)
 
         return ExecutionState(triggered_points=[], clock=self.get_clock_value(), cycles=cycles)
 
     def evaluate(self, no_update=False):
-        for primitive in self.execution_order.stateful:
-            primitive.simulate()
-        for primitive in self.execution_order.combinational:
-            primitive.simulate()
+        log = self.input_log
+        if self.checkpoints is not None and log and \
+           log[-1][0] == self.halfcycles and log[-1][1] is not None:
+            # Replaying the inputs set in this half cycle evaluates them too
+            self.__log_input(None, None)
+        if self.profiler is not None:
+            start = perf_counter()
+            self.__evaluate_primitives()
+            self.profiler.evaluate_time += perf_counter() - start
+            self.profiler.evaluations += 1
+        else:
+            self.__evaluate_primitives()
+        self.sample_waveforms()
+
+        return ExecutionState(triggered_points=self.__triggered_watchpoints(), clock=self.get_clock_value(), cycles=0)
+
+    def __get_net_value(self, net):
+        try:
+            return self.value_store.get_value(net)
+        except KeyError:
+            return None
+
+    def __triggered_watchpoints(self):
+        """
+        Only the watchpoints reading a net that changed since the last call
+        are checked. With `event_driven=True` only the watched nets that the
+        scheduler recorded as changed are read; in the other modes every
+        watched net is read and compared with its last value.
+        """
+        if not self.watchpoints:
+            return []
+
+        watched_nets = self.watched_nets.items()
+        if self.event_driven and self.pending is not None:
+            # The scheduler recorded the nets that changed
+            changed_nets = self.changed_nets
+            self.changed_nets = set()
+            if changed_nets is not None:
+                watched_nets = [(net, self.watched_nets[net])
+                                for net in changed_nets
+                                if net in self.watched_nets]
+
+        changed = set()
+        for net, watches in watched_nets:
+            value = self.__get_net_value(net)
+            if value != self.watched_values[net]:
+                self.watched_values[net] = value
+                changed.update(watches)
 
         triggered = []
-        for watch in self.watchpoints:
+        for watch in sorted(changed, key=lambda w: w.idx):
             if watch.was_triggered():
                 triggered.append(watch)
 
-        return ExecutionState(triggered_points=triggered, clock=self.get_clock_value(), cycles=0)
+        return triggered
+
+    def __evaluate_primitives(self):
+        if self.event_driven:
+            self.__evaluate_events()
+        elif self.compiled_evaluate is not None:
+            self.fired_clocks = None
+            self.compiled_evaluate()
+        else:
+            for primitive in self.__stateful_primitives():
+                primitive.simulate()
+            for primitive in self.execution_order.combinational:
+                primitive.simulate()
+
+    def get_time(self):
+        """
+        Returns the time of the last clock edge with `clocks`, otherwise the
+        number of half cycles simulated
+        """
+        if self.clock_schedule is not None:
+            return self.clock_schedule[0]
+        return self.halfcycles
 
     def get_clock_value(self):
         """
@@ -330,11 +1624,299 @@ class PythonSimulator(CircuitSimulator):
         Returns None if self.clock is None (circuit doesn't have a clock)
         """
         if self.clock is not None:
-            return self.value_store.get_value(self.clock)
+            return bool(self.value_store.get_value(self.clock))
         return None
 
+    def __nets(self):
+        """
+        Returns the nets holding the simulation values: the inputs of the
+        circuit and the outputs of the scheduled primitives
+        """
+        nets = list(self.circuit_inputs)
+        for primitive in self.execution_order.stateful + \
+                         self.execution_order.combinational:
+            nets += primitive.output_bits
+        return nets
+
+    def __net_name(self, bit):
+        """
+        Returns a name of `bit` that does not depend on the names given to
+        the instances of the flattened circuit, they are numbered in order
+        instead
+        """
+        ref = bit.name
+        if isinstance(ref, ArrayRef):
+            return '{}[{}]'.format(self.__net_name(ref.array), ref.index)
+        if isinstance(ref, TupleRef):
+            return '{}.{}'.format(self.__net_name(ref.tuple), ref.index)
+        if isinstance(ref, InstRef):
+            return '{}.{}'.format(self.instance_numbers[ref.inst], ref.name)
+        return str(ref.name)
+
+    def circuit_hash(self):
+        """
+        Returns a hash of the flattened circuit: its ports, its primitives and
+        the nets driving their inputs
+        """
+        h = hashlib.sha256()
+        for name, port in self.circuit.interface.ports.items():
+            h.update('{}:{}\n'.format(name, type(port)).encode())
+        for k, inst in enumerate(self.circuit.instances):
+            h.update('{}:{}\n'.format(k, type(inst).__name__).encode())
+            for bit in sum((b.flatten() if isinstance(b, ArrayType) else [b]
+                            for b in inst.interface.ports.values()), []):
+                if bit.isinput():
+                    driver = bit.value()
+                    driver = 'None' if driver is None else \
+                             'const' if driver.const() else \
+                             self.__net_name(driver)
+                    h.update('{}<{}\n'.format(self.__net_name(bit),
+                                               driver).encode())
+        return h.hexdigest()
+
+    def save_state(self, path):
+        """
+        Saves the values of the nets and the state of the primitives to the
+        file `path`, keyed by the names of the nets and primitives in the
+        flattened circuit. The file holds zlib compressed JSON, so the state
+        stores of the primitives must only contain JSON data.
+        """
+        values = {}
+        for net in self.__nets():
+            try:
+                values[self.__net_name(net)] = self.value_store.get_value(net)
+            except KeyError:
+                pass
+        primitives = self.execution_order.stateful + \
+                     self.execution_order.combinational
+        state = {
+            'circuit_hash': self.circuit_hash(),
+            'lanes': self.lanes,
+            'halfcycles': self.halfcycles,
+            'schedule': None,
+            'values': values,
+            'states': {str(self.instance_numbers[p.primitive]): p.get_state()
+                       for p in primitives},
+        }
+        if self.clock_schedule is not None:
+            time, next_edges = self.clock_schedule
+            state['schedule'] = (time, {self.__net_name(clock): edge
+                                        for clock, edge
+                                        in next_edges.items()})
+        try:
+            data = json.dumps(state, sort_keys=True)
+        except TypeError as e:
+            raise PythonSimulatorException("Cannot save the state of the "
+                    "simulation, it holds data that is not JSON: {}".format(e))
+        with open(path, 'wb') as f:
+            f.write(zlib.compress(data.encode()))
+
+    def load_state(self, path):
+        """
+        Restores a state saved by `save_state` from a simulator of the same
+        circuit with the same number of lanes. Checkpoints and the recorded
+        inputs are discarded.
+        """
+        try:
+            with open(path, 'rb') as f:
+                state = json.loads(zlib.decompress(f.read()).decode())
+        except (zlib.error, ValueError) as e:
+            raise PythonSimulatorException("Cannot load the state in {}, it "
+                    "is not a saved simulation state: {}".format(path, e))
+        # Checked before anything is restored
+        if not isinstance(state, dict) or \
+           state.get('circuit_hash') != self.circuit_hash():
+            raise PythonSimulatorException("Cannot load the state in {}, it "
+                    "was saved from a different circuit".format(path))
+        if state['lanes'] != self.lanes:
+            raise PythonSimulatorException("Cannot load the state in {}, it "
+                    "was saved with lanes={} and the simulator has "
+                    "lanes={}".format(path, state['lanes'], self.lanes))
+
+        values = state['values']
+        for net in self.__nets():
+            value = values.get(self.__net_name(net))
+            if value is not None:
+                self.value_store.set_value(net, value)
+        for primitive in self.execution_order.stateful + \
+                         self.execution_order.combinational:
+            saved = state['states'].get(
+                str(self.instance_numbers[primitive.primitive]))
+            if saved is not None:
+                primitive.set_state(saved)
+
+        self.halfcycles = state['halfcycles']
+        if state['schedule'] is not None and self.clock_schedule is not None:
+            time, next_edges = state['schedule']
+            self.clock_schedule = [time, {clock: next_edges[self.__net_name(clock)]
+                                          for clock in self.clock_periods}]
+        self.fired_clocks = None
+        if self.checkpoints is not None:
+            self.checkpoints.clear()
+        self.input_log = deque()
+        self.future_inputs = []
+        if self.event_driven:
+            self.pending = None
+
     def rewind(self, halfcycles):
-        raise PythonSimulatorException("Reversing not currently supported")
+        if self.checkpoints is None:
+            raise PythonSimulatorException("Reversing requires checkpoints, "
+                    "the simulator was built without a clock or with "
+                    "checkpoint_interval=None")
+        target = self.halfcycles - halfcycles
+        if target < 0:
+            raise PythonSimulatorException("Cannot rewind before the start "
+                    "of the simulation")
+
+        checkpoint = None
+        while self.checkpoints:
+            if self.checkpoints[-1].halfcycles <= target:
+                checkpoint = self.checkpoints[-1]
+                break
+            self.checkpoints.pop()
+        if checkpoint is None:
+            raise PythonSimulatorException("Cannot rewind {} half cycles, "
+                    "history before the oldest checkpoint is not kept".format(
+                        halfcycles))
+
+        # Inputs set after the target are replayed when the simulation
+        # advances again, until a new value is set
+        inputs = [entry for entry in self.input_log if entry[0] <= target]
+        future = [entry for entry in self.input_log if entry[0] > target]
+        self.input_log = deque(inputs)
+        self.future_inputs += reversed(future)
+
+        self.__restore(checkpoint)
+        # Inputs set up to the checkpoint are already part of its state
+        replay = [entry for entry in inputs if entry[0] > checkpoint.halfcycles]
+        replay.reverse()
+        while self.halfcycles < target:
+            self.__toggle_clock()
+            self.__evaluate_primitives()
+            self.__replay_inputs(replay)
+
+        return ExecutionState(triggered_points=self.__triggered_watchpoints(), clock=self.get_clock_value(), cycles=0)
+
+    def run(self, stimulus=None, inputs=None, probes=None, cycles=None,
+            callback=None):
+        """
+        Drives the circuit for one clock cycle per row of `stimulus` and
+        samples `probes` at the end of each cycle.
+
+        `stimulus` is an iterable of rows (e.g. a generator or a 2D NumPy
+        array) with one integer per signal of `inputs`, or the name of a text
+        file with one row of whitespace separated integers per line. `inputs`
+        defaults to the inputs of the circuit other than clocks, and `probes`
+        to its outputs. Both are lists of bits of the circuit or
+        `(bit, scope)` pairs.
+
+        The run stops after `cycles` cycles or when `stimulus` is exhausted,
+        at least one of them must be given. The bits of an array input are
+        taken from its integer in the order of `flatten()`. A row without
+        exactly one value per input raises a PythonSimulatorException.
+        The samples are returned as a NumPy array with one row per cycle and
+        one column per probe, or passed to `callback(cycle, values)` as they
+        are taken, in which case the number of cycles run is returned.
+        Watchpoints do not stop the run.
+        """
+        if self.lanes is not None:
+            raise PythonSimulatorException("run is not supported in lane mode")
+        if stimulus is None and cycles is None:
+            raise ValueError("run needs a stimulus or a number of cycles")
+        if isinstance(stimulus, str):
+            with open(stimulus) as f:
+                return self.run(f, inputs, probes, cycles, callback)
+
+        ports = self.main_circuit.interface.ports.values()
+        if inputs is None:
+            inputs = [port for port in ports
+                      if port.isoutput() and not isinstance(port, ClockType)]
+        if probes is None:
+            probes = [port for port in ports if port.isinput()]
+
+        def resolve(signal):
+            if isinstance(signal, tuple):
+                return self.resolve(*signal)
+            return self.resolve(signal)
+        inputs = [resolve(signal) for signal in inputs]
+        probes = [resolve(signal) for signal in probes]
+        # Index of each bit of an input array in the integer driving it,
+        # nested like the array
+        layouts = [value_layout(handle.newbit) for handle in inputs]
+
+        if stimulus is None:
+            # Free running, the inputs keep their values
+            stimulus = repeat(())
+            inputs = []
+        if cycles is None and hasattr(stimulus, '__len__'):
+            cycles = len(stimulus)
+
+        width = max([len(probe.newbit.flatten())
+                     if isinstance(probe.newbit, ArrayType) else 1
+                     for probe in probes] + [0])
+        dtype = np.int64 if width < 64 else object
+        samples = None
+        if callback is None:
+            if cycles is None:
+                samples = []
+            else:
+                samples = np.zeros((cycles, len(probes)), dtype=dtype)
+
+        cycle = 0
+        for number, row in enumerate(stimulus):
+            if cycles is not None and cycle >= cycles:
+                break
+            if isinstance(row, str):
+                row = row.split('#')[0].split()
+                if not row:
+                    continue
+                row = [int(v, 0) for v in row]
+            elif np.ndim(row) == 0:
+                row = [row]
+            if len(row) != len(inputs):
+                # Rows are numbered from 0, the lines of a file from 1
+                where = 'Line {}'.format(number + 1) if isinstance(
+                    stimulus, io.IOBase) else 'Row {}'.format(number)
+                raise PythonSimulatorException("{} of the stimulus has {} "
+                        "values, expected one per input ({})".format(
+                            where, len(row), len(inputs)))
+
+            for handle, layout, value in zip(inputs, layouts, row):
+                value = int(value)
+                if layout is not None:
+                    value = fill_layout(layout, value)
+                handle.set(value)
+
+            if self.clock is None:
+                self.evaluate()
+            else:
+                for i in range(2):
+                    self.__step()
+                    self.evaluate()
+
+            values = []
+            for probe in probes:
+                value = probe.get()
+                if value is None:
+                    raise PythonSimulatorException(
+                        "Probe {} is not initialized".format(probe.bit))
+                if isinstance(value, list):
+                    value = seq2int(flatten_values(value))
+                values.append(int(value))
+
+            if callback is not None:
+                callback(cycle, values)
+            elif isinstance(samples, list):
+                samples.append(values)
+            else:
+                samples[cycle] = values
+            cycle += 1
+
+        if callback is not None:
+            return cycle
+        if isinstance(samples, list):
+            return np.array(samples, dtype=dtype).reshape(cycle, len(probes))
+        return samples[:cycle]
 
     def cont(self):
         cycles = 0
@@ -347,14 +1929,43 @@ class PythonSimulator(CircuitSimulator):
             if state.triggered_points:
                 return ExecutionState(triggered_points=state.triggered_points, clock=state.clock, cycles=cycles)
 
+    def add_waveform(self, writer):
+        if self.lanes is not None:
+            raise PythonSimulatorException("Waveforms cannot be dumped in "
+                    "lane mode")
+        return super(PythonSimulator, self).add_waveform(writer)
+
     def add_watchpoint(self, bit, scope, value=None):
-        self.watchpoints.append(WatchPoint(bit, scope, self, value))
-        return self.watchpoints[-1].idx
+        """
+        Watches `bit`, returns the number of the watchpoint. Watchpoints are
+        indexed by the nets they read and only checked when one of them
+        changes. Finding the changed nets costs one read per watched net
+        after each evaluation, except with `event_driven=True` where the
+        scheduler reports them.
+        """
+        watch = WatchPoint(bit, scope, self, value)
+        if self.cone_nets is not None and \
+           any(net not in self.cone_nets for net in watch.nets):
+            raise PythonSimulatorException("Cannot watch {}, it is not in "
+                    "the cone of the observed signals".format(bit))
+        self.watchpoints.append(watch)
+        for net in watch.nets:
+            if net not in self.watched_nets:
+                self.watched_nets[net] = []
+                self.watched_values[net] = self.__get_net_value(net)
+            self.watched_nets[net].append(watch)
+        return watch.idx
 
     def delete_watchpoint(self, num):
-        for w in self.watchpoints:
+        for i, w in enumerate(self.watchpoints):
             if w.idx == num:
-                del w
+                del self.watchpoints[i]
+                for net in w.nets:
+                    watches = self.watched_nets[net]
+                    watches.remove(w)
+                    if not watches:
+                        del self.watched_nets[net]
+                        del self.watched_values[net]
                 return True
 
         return False
@@ -386,38 +1997,73 @@ class PythonSimulator(CircuitSimulator):
         return tuple(outs)
 
 
-def testvectors(circuit, input_ranges=None, mode='complete'):
-    ntest = len(circuit.interface.ports.items())
-
-    simulator = PythonSimulator(circuit)
-
-    args = []
-    for i, (name, port) in enumerate(circuit.interface.ports.items()):
+def input_formats(circuit):
+    """
+    Returns the number of bits of each input of `circuit`, None for a Bit
+    """
+    formats = []
+    for name, port in circuit.interface.ports.items():
         if port.isoutput():
             if isinstance(port, BitType):
-                args.append([BitVector(0),BitVector(1)])
+                formats.append(None)
             elif isinstance(port, ArrayType):
-                num_bits = type(port).N
-                if isinstance(port, SIntType):
-                    if input_ranges is None:
-                        start = -2**(num_bits - 1)
-                        end = 2**(num_bits - 1)  # We don't subtract one because range end is exclusive
-                        input_range = range(start, end)
-                    else:
-                        input_range = input_ranges[i]
-                    args.append([BitVector(x, num_bits=num_bits) for x in input_range])
-                else:
-                    if input_ranges is None:
-                        input_range = range(1<<num_bits)
-                    else:
-                        input_range = input_ranges[i]
-                    args.append([BitVector(x, num_bits=num_bits) for x in input_range])
-            else:
-                assert True, "can't test Tuples"
+                formats.append(type(port).N)
+    return formats
+
+def to_bitvectors(tests, formats):
+    for test in tests:
+        yield [BitVector(v) if num_bits is None else
+               BitVector(v, num_bits=num_bits)
+               for v, num_bits in zip(test, formats)]
+
+def iter_testvectors(circuit, input_ranges=None, mode='complete', lanes=None,
+                     seed=None, samples=None):
+    """
+    Yields the rows of `testvectors` one at a time
+    """
+    values = testvector_values(circuit, input_ranges, mode)
+    tests = iter_testvector_inputs(values, mode, seed, samples)
+    return simulate_testvectors(circuit, tests, lanes)
+
+def testvectors(circuit, input_ranges=None, mode='complete', lanes=None,
+                seed=None, samples=None, processes=None, shards=None,
+                path=None):
+    """
+    Simulates `circuit` for the input values selected by `mode`: 'complete'
+    (every combination), 'corners' (every combination of boundary values)
+    or 'random' (`samples` combinations drawn with the random seed `seed`).
+    With `lanes=N` the combinations are simulated N at a time in
+    bit-parallel mode.
+
+    With `processes=N` the combinations are split in `shards` (by default
+    4 per process) simulated by a pool of N processes, and `circuit` must be
+    a picklable reference to the circuit: a function returning it or a
+    `'module:name'` string. The rows are returned in order, or written to
+    the file `path` as they come in, in which case their number is returned.
+    """
+    if processes is not None:
+        return sharded_testvectors(circuit, input_ranges, mode, lanes, seed,
+                                   samples, processes, shards, path)
+
+    return list(iter_testvectors(circuit, input_ranges, mode, lanes, seed,
+                                 samples))
+
+def simulate_testvectors(circuit, tests, lanes=None):
+    """
+    Simulates `circuit` for each tuple of input integers in `tests`, and
+    yields the test vectors
+    """
+    ntest = len(circuit.interface.ports.items())
+    tests = to_bitvectors(tests, input_formats(circuit))
+
+    simulator = PythonSimulator(circuit, lanes=lanes)
 
-    tests = []
-    for test in product(*args):
-        test = list(test)
+    if lanes is not None:
+        for testv in batch_testvectors(circuit, simulator, tests, ntest):
+            yield testv
+        return
+
+    for test in tests:
         testv = ntest*[0]
         j = 0
         for i, (name, port) in enumerate(circuit.interface.ports.items()):
@@ -438,8 +2084,81 @@ def testvectors(circuit, input_ranges=None, mode='complete'):
                 val = int(val) if isinstance(val, bool) else seq2int(val)
                 testv[i] = val
 
+        yield testv
+
+def resolve_circuit(circuit):
+    """
+    Returns the circuit referenced by `circuit`, a function returning it or a
+    `'module:name'` string
+    """
+    if isinstance(circuit, str):
+        module, name = circuit.split(':')
+        return getattr(importlib.import_module(module), name)
+    if isinstance(circuit, type):
+        raise ValueError("A circuit cannot be sent to other processes, pass "
+                         "a function returning it or a 'module:name' string")
+    return circuit()
+
+def testvectors_shard(circuit, values, mode, lanes, seed, samples, start,
+                      stop):
+    tests = iter_testvector_inputs(values, mode, seed, samples, start, stop)
+    return list(simulate_testvectors(resolve_circuit(circuit), tests, lanes))
+
+def sharded_testvectors(circuit, input_ranges=None, mode='complete',
+                        lanes=None, seed=None, samples=None, processes=None,
+                        shards=None, path=None):
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if mode == 'random' and seed is None:
+        # Every worker must draw the same sequence
+        seed = random.randrange(1 << 32)
+    values = testvector_values(resolve_circuit(circuit), input_ranges, mode)
+    ntests = count_testvector_inputs(values, mode, samples)
+    bounds = testvector_shards(ntests, processes, shards)
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        results = executor.map(testvectors_shard, *zip(*[
+            (circuit, values, mode, lanes, seed, samples, start, stop)
+            for start, stop in bounds]))
+        if path is None:
+            return [testv for shard in results for testv in shard]
+
+        with open(path, 'w') as f:
+            for shard in results:
+                for testv in shard:
+                    f.write(' '.join(str(v) for v in testv) + '\n')
+        return ntests
+
+def batch_testvectors(circuit, simulator, tests, ntest):
+    lanes = simulator.lanes
+    tests = iter(tests)
+    while True:
+        batch = [list(test) for test in islice(tests, lanes)]
+        if not batch:
+            break
+        nbatch = len(batch)
+        # Pad the last batch, the results of the extra lanes are dropped
+        batch += (lanes - nbatch) * [batch[-1]]
+
+        testv = [ntest*[0] for _ in range(nbatch)]
+        j = 0
+        for i, (name, port) in enumerate(circuit.interface.ports.items()):
+            if port.isoutput():
+                for k in range(nbatch):
+                    testv[k][i] = batch[k][j].as_int()
+                simulator.set_value(getattr(circuit, name),
+                                    [test[j] for test in batch])
+                j += 1
 
-        tests.append(testv)
-
-    return tests
+        simulator.evaluate()
 
+        for i, (name, port) in enumerate(circuit.interface.ports.items()):
+            if port.isinput():
+                vals = simulator.get_value(getattr(circuit, name))
+                for k in range(nbatch):
+                    val = vals[k]
+                    val = int(val) if isinstance(val, bool) else seq2int(val)
+                    testv[k][i] = val
+
+        for row in testv:
+            yield row
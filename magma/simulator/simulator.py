@@ -27,7 +27,11 @@ class CircuitSimulator(ABC):
         pass
 
     @abstractmethod
-    def advance(self, halfcycles):
+    def advance(self, halfcycles, stop_at_watchpoints=True):
+        """
+        Simulates `halfcycles` half cycles, stopping early at the first one
+        triggering a watchpoint unless `stop_at_watchpoints` is False
+        """
         pass
 
     def advance_cycle(self, cycles=1):
@@ -56,3 +60,31 @@ class CircuitSimulator(ABC):
     def delete_watchpoint(self, num):
         pass
 
+    def add_waveform(self, writer):
+        """
+        Attaches a waveform writer (e.g. a `VCDWriter`), which is sampled
+        after every evaluation of the circuit
+        """
+        writer.attach(self)
+        self.waveforms.append(writer)
+        writer.sample(self.get_time())
+        return writer
+
+    def remove_waveform(self, writer):
+        if writer in self.waveforms:
+            self.waveforms.remove(writer)
+            return True
+        return False
+
+    def sample_waveforms(self):
+        if self.waveforms:
+            time = self.get_time()
+            for writer in self.waveforms:
+                writer.sample(time)
+
+    def get_time(self):
+        """
+        Returns the time of the waveform samples, in half cycles by default
+        """
+        return self.halfcycles
+
@@ -0,0 +1,218 @@
+from fnmatch import fnmatchcase
+from functools import partial
+import datetime
+from ..circuit import isdefinition
+from ..array import ArrayType
+from ..scope import Scope
+from ..transforms import MagmaTransformException
+
+__all__ = ['VCDWriter']
+
+
+def vcd_identifier(index):
+    """
+    Returns the short identifier code of the `index`th variable, VCD uses
+    strings of the printable ASCII characters '!' to '~'
+    """
+    code = ''
+    while True:
+        code += chr(33 + index % 94)
+        index //= 94
+        if index == 0:
+            return code
+
+
+def flatten_value(value):
+    if isinstance(value, list):
+        return sum((flatten_value(v) for v in value), [])
+    return [value]
+
+
+def iter_signals(defn, scope, path):
+    """
+    Yields (path, bit, scope) for the ports of `defn` and, recursively, for
+    the ports of every instance inside it
+    """
+    for name, port in defn.interface.ports.items():
+        yield path + [str(name)], port, scope
+
+    for inst in defn.instances:
+        if isdefinition(type(inst)):
+            inner_scope = Scope(parent=scope, instance=inst)
+            for signal in iter_signals(type(inst), inner_scope,
+                                       path + [inst.name]):
+                yield signal
+        else:
+            for name, port in inst.interface.ports.items():
+                yield path + [inst.name, str(name)], port, scope
+
+
+class VCDSignal:
+    def __init__(self, path, bit, scope, read, identifier):
+        self.path = path
+        self.bit = bit
+        self.scope = scope
+        # Returns the current value of the signal
+        self.read = read
+        self.identifier = identifier
+        self.width = len(bit.flatten()) if isinstance(bit, ArrayType) else 1
+        self.last = None
+
+    def format(self, value):
+        if value is None:
+            bits = self.width * ['x']
+        else:
+            bits = ['x' if v is None else ('1' if v else '0')
+                    for v in flatten_value(value)]
+        if self.width == 1:
+            return bits[0] + self.identifier
+        return 'b' + ''.join(reversed(bits)) + ' ' + self.identifier
+
+
+class VCDWriter:
+    """
+    Streams the value changes of a simulation to a VCD file.
+
+    `signals` is a list of glob patterns matched against the hierarchical
+    names of the ports of the circuit and of its instances, e.g. `'O'` or
+    `'counter.reg.*'`. By default only the ports of the top level circuit
+    are dumped. `scope` restricts the signals to the ones inside the instance
+    of `scope`, names are then relative to that instance.
+
+    The writer is attached with `simulator.add_waveform(writer)`, after which
+    the simulator calls `sample` after every evaluation. Only the signals
+    that changed since the previous sample are written, and writes are
+    buffered by `buffer_size` lines.
+    """
+    def __init__(self, filename, circuit, signals=None, scope=None,
+                 timescale='1ns', buffer_size=4096):
+        self.filename = filename
+        self.timescale = timescale
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.time = None
+        self.simulator = None
+
+        if scope is None or scope.inst is None:
+            defn = circuit
+            scope = Scope()
+            top = circuit.name
+        else:
+            defn = type(scope.inst)
+            top = scope.inst.name
+        self.top = top
+
+        if signals is None:
+            signals = [str(name) for name in defn.interface.ports]
+        if isinstance(signals, str):
+            signals = [signals]
+
+        self.candidates = []
+        for path, bit, bit_scope in iter_signals(defn, scope, []):
+            name = '.'.join(path)
+            if any(fnmatchcase(name, pattern) for pattern in signals):
+                self.candidates.append((path, bit, bit_scope))
+
+        self.signals = []
+        self.file = None
+
+    def attach(self, simulator):
+        """
+        Resolves the selected signals in `simulator` and writes the header of
+        the VCD file. Signals that do not exist in the simulated circuit are
+        skipped.
+        """
+        self.simulator = simulator
+        # Simulators providing `resolve` look the signals up once
+        resolve = getattr(simulator, 'resolve', None)
+        for path, bit, scope in self.candidates:
+            try:
+                if resolve is not None:
+                    read = resolve(bit, scope).get
+                else:
+                    simulator.get_value(bit, scope)
+                    read = partial(simulator.get_value, bit, scope)
+            except MagmaTransformException:
+                continue
+            self.signals.append(VCDSignal(path, bit, scope, read,
+                                          vcd_identifier(len(self.signals))))
+
+        self.file = open(self.filename, 'w')
+        self.write_header()
+
+    def write_header(self):
+        lines = []
+        lines.append('$date {} $end'.format(datetime.datetime.now().ctime()))
+        lines.append('$version magma $end')
+        lines.append('$timescale {} $end'.format(self.timescale))
+
+        lines.append('$scope module {} $end'.format(self.top))
+        cur = []
+        for signal in sorted(self.signals, key=lambda s: s.path):
+            scope = signal.path[:-1]
+            common = 0
+            while common < min(len(cur), len(scope)) and \
+                  cur[common] == scope[common]:
+                common += 1
+            for _ in range(len(cur) - common):
+                lines.append('$upscope $end')
+            for name in scope[common:]:
+                lines.append('$scope module {} $end'.format(name))
+            cur = scope
+
+            name = signal.path[-1]
+            if signal.width > 1:
+                name += ' [{}:0]'.format(signal.width - 1)
+            lines.append('$var wire {} {} {} $end'.format(
+                signal.width, signal.identifier, name))
+        for _ in range(len(cur)):
+            lines.append('$upscope $end')
+        lines.append('$upscope $end')
+        lines.append('$enddefinitions $end')
+        self.buffer.extend(lines)
+
+    def sample(self, time):
+        """
+        Writes the signals that changed since the last sample. Samples
+        earlier than the last written time (e.g. after a rewind) are ignored.
+        """
+        if self.time is not None and time < self.time:
+            return
+
+        changes = []
+        for signal in self.signals:
+            value = signal.read()
+            if value != signal.last or self.time is None:
+                signal.last = value
+                changes.append(signal.format(value))
+
+        if not changes:
+            return
+        if time != self.time:
+            self.buffer.append('#{}'.format(time))
+        if self.time is None:
+            changes = ['$dumpvars'] + changes + ['$end']
+        self.time = time
+        self.buffer.extend(changes)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write('\n'.join(self.buffer) + '\n')
+            self.buffer = []
+        self.file.flush()
+
+    def close(self):
+        if self.simulator is not None:
+            self.simulator.remove_waveform(self)
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -1,4 +1,4 @@
-from .ref import Ref, AnonRef
+from .ref import Ref, AnonRef, ANON_REF
 from .port import INOUT, INPUT, OUTPUT
 from .compatibility import IntegerTypes, StringTypes
 
@@ -7,12 +7,14 @@ __all__ += ['In', 'Out', 'InOut', 'Flip']
 
 
 class Type(object):
+    __slots__ = ['name']
+
     def __init__(self, **kwargs):
         # ref is int, str or tuple
         name = kwargs.get('name', None)
         if name is None or isinstance(name, str):
             #print('creating name ref',name)
-            name = AnonRef(name=name)
+            name = AnonRef(name=name) if name else ANON_REF
         #print('using',name)
         #assert isinstance(name, Ref)
         self.name = name
@@ -58,6 +60,11 @@ class Type(object):
 
 
 class Kind(type):
+    def __new__(mcs, name, bases, dct):
+        # The types created by kinds add no attributes to their instances
+        dct.setdefault('__slots__', ())
+        return type.__new__(mcs, name, bases, dct)
+
     def __init__(cls, name, bases, dct):
         type.__init__( cls, name, bases, dct)
 
@@ -1,11 +1,14 @@
 from magma import BitType, ArrayType, SIntType
 from magma.bit_vector import BitVector
+from .utils import testvector_values, iter_testvector_inputs, \
+    count_testvector_inputs, testvector_shards
+import random
 import sys
 if sys.version_info < (3, 3):
     from funcsigs import signature
 else:
     from inspect import signature
-from itertools import product
+from concurrent.futures import ProcessPoolExecutor
 import pytest
 
 # check that number of function arguments equals number of circuit inputs
@@ -20,43 +23,78 @@ def check(circuit, func):
             ncircargs += 1
     assert nfuncargs == ncircargs
 
-@pytest.mark.skip(reason="Not a test")
-def testvectors(circuit, func, input_ranges=None, mode='complete'):
-    check(circuit, func)
-
-    args = []
-    for i, (name, port) in enumerate(circuit.interface.ports.items()):
+def input_formats(circuit):
+    """
+    Returns the (num_bits, signed) of each input of `circuit`, num_bits is
+    None for a Bit
+    """
+    formats = []
+    for name, port in circuit.interface.ports.items():
         if port.isoutput():
             if isinstance(port, BitType):
-                args.append([BitVector(0),BitVector(1)])
+                formats.append((None, False))
             elif isinstance(port, ArrayType):
-                num_bits = type(port).N
-                if isinstance(port, SIntType):
-                    if input_ranges is None:
-                        start = -2**(num_bits - 1)
-                        end = 2**(num_bits - 1)  # We don't subtract one because range end is exclusive
-                        input_range = range(start, end)
-                    else:
-                        input_range = input_ranges[i]
-                    args.append([BitVector(x, num_bits=num_bits, signed=True) for x in input_range])
-                else:
-                    if input_ranges is None:
-                        input_range = range(1<<num_bits)
-                    else:
-                        input_range = input_ranges[i]
-                    args.append([BitVector(x, num_bits=num_bits) for x in input_range])
-            else:
-                assert True, "can't test Tuples"
-
-    nargs = len(args)
-    tests = []
-    for test in product(*args):
-        test = list(test)
+                formats.append((type(port).N, isinstance(port, SIntType)))
+    return formats
+
+def to_bitvector(value, num_bits, signed):
+    if num_bits is None:
+        return BitVector(value)
+    if signed:
+        return BitVector(value, num_bits=num_bits, signed=True)
+    return BitVector(value, num_bits=num_bits)
+
+def evaluate(func, formats, tests):
+    for test in tests:
+        test = [to_bitvector(v, *format) for v, format in zip(test, formats)]
         result = func(*test)
         if isinstance(result, tuple):
             test.extend(result)
         else:
             test.append(result)
-        tests.append(test)
+        yield test
+
+def evaluate_shard(func, formats, values, mode, seed, samples, start, stop):
+    tests = iter_testvector_inputs(values, mode, seed, samples, start, stop)
+    return list(evaluate(func, formats, tests))
 
-    return tests
+def iter_testvectors(circuit, func, input_ranges=None, mode='complete',
+                     seed=None, samples=None):
+    """
+    Yields the test vectors of `circuit` one at a time, see `testvectors`
+    """
+    check(circuit, func)
+    values = testvector_values(circuit, input_ranges, mode)
+    tests = iter_testvector_inputs(values, mode, seed, samples)
+    return evaluate(func, input_formats(circuit), tests)
+
+@pytest.mark.skip(reason="Not a test")
+def testvectors(circuit, func, input_ranges=None, mode='complete',
+                seed=None, samples=None, processes=None, shards=None):
+    """
+    Returns the inputs and the results of `func` for the input values
+    selected by `mode`: 'complete' (every combination), 'corners' (every
+    combination of boundary values) or 'random' (`samples` combinations
+    drawn with the random seed `seed`).
+
+    With `processes=N` the input combinations are split in `shards` (by
+    default 4 per process) evaluated by a pool of N processes, `func` must
+    then be picklable (e.g. a module level function).
+    """
+    if processes is None:
+        return list(iter_testvectors(circuit, func, input_ranges, mode,
+                                     seed, samples))
+
+    check(circuit, func)
+    if mode == 'random' and seed is None:
+        # Every worker must draw the same sequence
+        seed = random.randrange(1 << 32)
+    values = testvector_values(circuit, input_ranges, mode)
+    formats = input_formats(circuit)
+    ntests = count_testvector_inputs(values, mode, samples)
+    bounds = testvector_shards(ntests, processes, shards)
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        results = executor.map(evaluate_shard, *zip(*[
+            (func, formats, values, mode, seed, samples, start, stop)
+            for start, stop in bounds]))
+        return [test for shard in results for test in shard]
@@ -5,6 +5,8 @@ import filecmp
 import os
 import sys
 import difflib
+import random
+from magma import BitType, ArrayType, SIntType
 
 def check_files_equal(callee_file, file1_name, file2_name):
     """
@@ -27,3 +29,115 @@ def check_files_equal(callee_file, file1_name, file2_name):
                 for line in diff:
                     sys.stderr.write(line)
     return result
+
+
+def testvector_values(circuit, input_ranges=None, mode='complete'):
+    """
+    Returns the values tested for each input of `circuit`: every value of its
+    type (or `input_ranges[i]` for the i-th port) in 'complete' and 'random'
+    mode, or only the boundary values in 'corners' mode
+    """
+    values = []
+    for i, (name, port) in enumerate(circuit.interface.ports.items()):
+        if port.isoutput():
+            if isinstance(port, BitType):
+                input_range = range(2)
+            elif isinstance(port, ArrayType):
+                num_bits = type(port).N
+                if input_ranges is not None:
+                    input_range = input_ranges[i]
+                elif isinstance(port, SIntType):
+                    input_range = range(-2**(num_bits - 1), 2**(num_bits - 1))
+                else:
+                    input_range = range(1 << num_bits)
+            else:
+                assert True, "can't test Tuples"
+                continue
+            if mode == 'corners':
+                input_range = corners(input_range)
+            values.append(input_range)
+    return values
+
+
+def corners(values):
+    """
+    Returns the boundary values of the sequence `values`: its two smallest
+    and largest values, and -1, 0 and 1 if they are in it
+    """
+    if not isinstance(values, range):
+        values = sorted(values)
+    candidates = list(values[:2]) + list(values[-2:]) + \
+                 [v for v in (-1, 0, 1) if v in values]
+    return sorted(set(candidates))
+
+
+def iter_testvector_inputs(values, mode='complete', seed=None, samples=None,
+                           start=0, stop=None):
+    """
+    Yields a tuple with one integer per input, `values` are the values of
+    each input returned by `testvector_values`:
+
+    * 'complete': every combination of values
+    * 'corners': every combination of the boundary values of each input
+    * 'random': `samples` combinations drawn uniformly, the i-th one from a
+      generator seeded with `seed` and i
+
+    Only the tuples from index `start` to `stop` are generated, a shard of
+    the tests starts at its first tuple instead of skipping the ones before.
+    """
+    if mode not in ('complete', 'corners', 'random'):
+        raise ValueError("Unknown testvectors mode {}".format(mode))
+    if mode == 'random' and samples is None:
+        raise ValueError("mode='random' requires the number of samples")
+    ntests = count_testvector_inputs(values, mode, samples)
+    stop = ntests if stop is None else min(stop, ntests)
+
+    if mode == 'random':
+        if seed is None:
+            seed = random.randrange(1 << 32)
+        for i in range(start, stop):
+            rng = random.Random('{}:{}'.format(seed, i))
+            yield tuple(rng.choice(v) for v in values)
+        return
+
+    # The digits of `start` in the mixed radix of the numbers of values, the
+    # last input varies fastest like in itertools.product
+    digits = []
+    index = start
+    for v in reversed(values):
+        index, digit = divmod(index, len(v))
+        digits.append(digit)
+    digits.reverse()
+    for _ in range(start, stop):
+        yield tuple(v[d] for v, d in zip(values, digits))
+        k = len(digits) - 1
+        while k >= 0:
+            digits[k] += 1
+            if digits[k] < len(values[k]):
+                break
+            digits[k] = 0
+            k -= 1
+
+
+def count_testvector_inputs(values, mode='complete', samples=None):
+    """
+    Returns the number of tuples yielded by `iter_testvector_inputs`
+    """
+    if mode == 'random':
+        return samples
+    count = 1
+    for v in values:
+        count *= len(v)
+    return count
+
+
+def testvector_shards(ntests, processes, shards=None):
+    """
+    Splits `ntests` tests in `shards` contiguous (start, stop) ranges, 4 per
+    process by default
+    """
+    if shards is None:
+        shards = 4 * processes
+    shards = max(1, min(shards, ntests))
+    bounds = [ntests * k // shards for k in range(shards + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
@@ -1,4 +1,5 @@
-from .function import testvectors
+from .function import testvectors, iter_testvectors
+from itertools import chain
 import magma.config as config
 import inspect
 import os
@@ -7,10 +8,20 @@ import subprocess
 __all__ = ['harness', 'compile']
 
 def harness(circuit,tests):
-
-    assert len(circuit.interface.ports.keys()) == len(tests[0])
-
-    source = '''\
+    return ''.join(harness_source(circuit, tests))
+
+def harness_source(circuit, tests):
+    """
+    Yields the source of the verilator test harness in chunks, `tests` can be
+    any iterable of test vectors (e.g. `iter_testvectors`), it is consumed
+    once
+    """
+    tests = iter(tests)
+    first = next(tests)
+    ntest = len(circuit.interface.ports.keys())
+    assert ntest == len(first)
+
+    yield '''\
 #include "V{name}.h"
 #include "verilated.h"
 #include <cassert>
@@ -21,24 +32,24 @@ int main(int argc, char **argv, char **env) {{
     V{name}* top = new V{name};
 '''.format(name=circuit.__name__)
 
-    source += '''
-    unsigned int tests[{}][{}] = {{
-'''.format(len(tests), len(tests[0]))
+    yield '''
+    unsigned int tests[][{}] = {{
+'''.format(ntest)
 
-    for test in tests:
+    for test in chain([first], tests):
         testvector = ', '.join([t.as_binary_string() for t in test])
         #testvector += ', {}'.format(int(func(*test[:nargs])))
-        source += '''\
+        yield '''\
         {{ {} }}, 
 '''.format(testvector)
-    source += '''\
+    yield '''\
     };
 '''
 
-    source += '''
-    for(int i = 0; i < {}; i++) {{
+    source = '''
+    for(size_t i = 0; i < sizeof(tests) / sizeof(tests[0]); i++) {
         unsigned int* test = tests[i];
-'''.format(len(tests))
+'''
 
     i = 0
     for name, port in circuit.interface.ports.items():
@@ -69,7 +80,7 @@ int main(int argc, char **argv, char **env) {{
     exit(0);
 }'''
 
-    return source
+    yield source
 
 def compile(basename, circuit, tests, input_ranges=None):
     if config.get_compile_dir() == 'callee_file_dir':
@@ -80,11 +91,11 @@ def compile(basename, circuit, tests, input_ranges=None):
         filename = basename
 
     if callable(tests):
-        tests = testvectors(circuit, tests, input_ranges)
-    verilatorcpp = harness(circuit, tests)
+        tests = iter_testvectors(circuit, tests, input_ranges)
 
     with open(filename, "w") as f:
-        f.write(verilatorcpp)
+        for source in harness_source(circuit, tests):
+            f.write(source)
 
 def run_verilator_test(verilog_file_name, driver_name, top_module, verilator_flags="", build_dir=None):
     if isinstance(verilator_flags, list):
@@ -1,4 +1,5 @@
 from collections import namedtuple, OrderedDict
+import numpy as np
 from .circuit import *
 from .bit import *
 from .clock import ClockType, EnableType, ResetType, wiredefaultclock
@@ -8,23 +9,99 @@ from .conversions import array
 from .ref import DefnRef, InstRef, ArrayRef
 from .scope import *
 
-__all__ = ['TransformedCircuit', 'flatten', 'setup_clocks', 'get_uniq_circuits']
+__all__ = ['TransformedCircuit', 'Netlist', 'flatten', 'setup_clocks', 'get_uniq_circuits']
 
 class MagmaTransformException(Exception):
     pass
 
 
+# Sources of the bits of a definition, relative to the definition: the
+# output `key` of its `index`th primitive (in flattening order), its own input
+# port `key`, or an unwired bit (constants are kept as bits). Keys are
+# (port name, tuple of array indices).
+PrimitiveSource = namedtuple('PrimitiveSource', ['index', 'key'])
+PortSource = namedtuple('PortSource', ['key'])
+UnwiredSource = namedtuple('UnwiredSource', ['message'])
+
+class FlattenedScopes:
+    """
+    Resolves the bits of the instances of a flattened circuit from the
+    templates of their definitions, `template` is the template of the
+    original circuit
+    """
+    def __init__(self):
+        self.template = None
+        # Templates of the scopes looked up so far
+        self.scope_templates = {}
+
+    def get_scope_template(self, scope):
+        """
+        Returns (template, index of the first primitive, bindings of the
+        inputs) of the instance at `scope`
+        """
+        if scope.inst is None:
+            return self.template, 0, PortSource
+        try:
+            return self.scope_templates[scope]
+        except KeyError:
+            pass
+        template, base, bindings = self.get_scope_template(scope.parent)
+        instance = scope.inst
+        inputs = {key: relocate(source, base, bindings)
+                  for key, source in template.inputs[instance].items()}
+        result = (template.children[instance], base + template.offsets[instance],
+                  inputs.__getitem__)
+        self.scope_templates[scope] = result
+        return result
+
+    def locate_source(self, orig_bit, scope):
+        """
+        Returns the source driving the bit `orig_bit` of the instance at
+        `scope`, raises KeyError if the bit is not in that instance
+        """
+        template, base, bindings = self.get_scope_template(scope)
+        ref, key = port_key(orig_bit)
+        if isinstance(ref, DefnRef):
+            if orig_bit.isinput():
+                return relocate(template.outputs[key], base, bindings)
+            return bindings(key)
+        if isinstance(ref, InstRef):
+            instance = ref.inst
+            offset = base + template.offsets[instance]
+            if orig_bit.isinput():
+                return relocate(template.inputs[instance][key], base, bindings)
+            if instance not in template.children:
+                return PrimitiveSource(offset, key)
+            inner_bit = select_bit(type(instance).interface.ports, key)
+            return self.locate_source(inner_bit,
+                                      Scope(parent=scope, instance=instance))
+        raise KeyError(orig_bit)
+
 # Holds the new modified circuit as well as a map from old bits and scopes to
 # new bits
-class TransformedCircuit:
+class TransformedCircuit(FlattenedScopes):
     def __init__(self, orig_circuit, transform_name):
+        super().__init__()
         # Maps from original bits to bits in transformed circuit
         self.orig_to_new = {}
+        # Memoizes get_new_bit, keyed by (original bit, scope)
+        self.new_bit_cache = {}
+        # Maps from primitive instances in the transformed circuit to the
+        # QualifiedInstance they were copied from
+        self.primitive_map = {}
+        # The new primitives in flattening order, set by flatten
+        self.primitives = []
         self.circuit = DefineCircuit(orig_circuit.name + '_' + transform_name,
                                      *orig_circuit.interface.decl())
         EndCircuit()
 
     def get_new_bit(self, orig_bit, scope):
+        key = (orig_bit, scope)
+        try:
+            return self.new_bit_cache[key]
+        except KeyError:
+            pass
+
         assert isinstance(scope, Scope), "Second argument to get_new_bit should be an instance of Scope"
         if isinstance(orig_bit, ArrayType):
             arr = []
@@ -32,19 +109,29 @@ class TransformedCircuit:
                 arr.append(self.get_new_bit(o, scope))
 
             arr = array(arr)
-            if arr.iswhole(arr):
-                return arr[0].name.array
-
-            return arr
+            new_bit = arr[0].name.array if arr.iswhole(arr) else arr
         else:
             try:
-                return self.orig_to_new[QualifiedBit(bit=orig_bit, scope=scope)]
+                new_bit = self.orig_to_new[QualifiedBit(bit=orig_bit, scope=scope)]
             except KeyError:
+                new_bit = None
+            if new_bit is None and self.template is not None:
+                try:
+                    new_bit = self.locate(orig_bit, scope)
+                except KeyError:
+                    pass
+            if new_bit is None:
                 raise MagmaTransformException("Could not find bit in transform mapping. bit={}, scope={}".format(orig_bit, scope))
 
+        # Anonymous arrays (e.g. slices) are new objects on every access
+        if not orig_bit.anon():
+            self.new_bit_cache[key] = new_bit
+        return new_bit
+
     def set_new_bit(self, orig_bit, orig_scope, new_bit):
         assert isinstance(new_bit,
                 (BitType, ArrayType, ClockType, EnableType, ResetType))
+        self.new_bit_cache.clear()
 
         if isinstance(orig_bit, ArrayType):
             # Map the individual bits
@@ -53,159 +140,317 @@ class TransformedCircuit:
         else:
             self.orig_to_new[QualifiedBit(bit=orig_bit, scope=orig_scope)] = new_bit
 
-def get_primitives(outer_circuit, outer_scope):
-    primitives = []
-    mapping = {}
-
-    for instance in outer_circuit.instances:
-        inner_scope = Scope(parent=outer_scope, instance=instance)
-        inner_circuit = type(instance)
-
-        if isprimitive(inner_circuit):
-            primitives.append(QualifiedInstance(instance=instance, scope=outer_scope))
-        else:
-            for name, outerbit in instance.interface.ports.items():
-                innerbit = inner_circuit.interface.ports[name]
-                outerloc = QualifiedBit(bit=outerbit, scope=outer_scope)
-                innerloc = QualifiedBit(bit=innerbit, scope=inner_scope)
-
-                if isinstance(outerbit, ArrayType):
-                    for o, i in zip(outerbit, innerbit):
-                        oqual = QualifiedBit(bit=o, scope=outer_scope)
-                        iqual = QualifiedBit(bit=i, scope=inner_scope)
-                        if o.isinput():
-                            mapping[iqual] = oqual
-                        else:
-                            mapping[oqual] = iqual
-
-                if outerbit.isinput():
-                    mapping[innerloc] = outerloc
-                else:
-                    mapping[outerloc] = innerloc
-
-            instance_primitives, inst_map = get_primitives(inner_circuit, inner_scope)
-
-            for k, v in inst_map.items():
-                mapping[k] = v
-
-            primitives += instance_primitives
-
-    return (primitives, mapping)
-
-def get_new_source(source_qual, primitive_map, old_circuit, new_circuit):
-    old_source = source_qual.bit
-    scope = source_qual.scope
-
-    if old_source.const():
-        return old_source
-
-    bitref = old_source.name
-    idxs = []
-    while isinstance(bitref, ArrayRef):
-        idxs.append(bitref.index)
-        bitref = bitref.array.name
-
-    if isinstance(bitref, InstRef):
-        # Get the primitive outbit is attached to,
-        old_primitive = bitref.inst
-        if not isprimitive(type(old_primitive)):
-            raise MagmaTransformException("Failed to collapse bit to primitive. bit={} type={}".format(old_primitive, type(old_primitive)))
-        new_primitive = primitive_map[QualifiedInstance(instance=old_primitive, scope=scope)]
-        newsource = new_primitive.interface.ports[bitref.name]
-    elif isinstance(bitref, DefnRef):
-        defn = bitref.defn.name
-        assert defn == old_circuit.name, f"Collapsed bit to circuit other than outermost, {defn} {old_circuit.name}"
-        newsource = new_circuit.interface.ports[bitref.name]
-    elif isinstance(old_source, ArrayType):
-        # Must not be a whole array
-        assert bitref.anon()
-
-        new_source_array = []
-        for s in old_source:
-            partial_qual = QualifiedBit(bit=s, scope=scope)
-            ns = get_new_source(partial_qual, primitive_map, old_circuit, new_circuit)
-            new_source_array.append(ns)
-
-        return array(new_source_array)
+    def get_new_source(self, source):
+        if isinstance(source, PrimitiveSource):
+            return select_bit(self.primitives[source.index].interface.ports,
+                              source.key)
+        if isinstance(source, PortSource):
+            return select_bit(self.circuit.interface.ports, source.key)
+        if isinstance(source, UnwiredSource):
+            raise MagmaTransformException(source.message)
+        return source
+
+    def locate(self, orig_bit, scope):
+        """
+        Returns the bit of the flattened circuit corresponding to the bit
+        `orig_bit` of the instance at `scope`, raises KeyError if it is not in
+        that instance
+        """
+        if orig_bit.isinput():
+            # Inputs map to the copies of the ports rather than their sources
+            template, base, _ = self.get_scope_template(scope)
+            ref, key = port_key(orig_bit)
+            if isinstance(ref, DefnRef) and scope.inst is None:
+                return select_bit(self.circuit.interface.ports, key)
+            if isinstance(ref, InstRef) and ref.inst in template.offsets and \
+                    ref.inst not in template.children:
+                return self.get_new_source(PrimitiveSource(
+                    base + template.offsets[ref.inst], key))
+        return self.get_new_source(self.locate_source(orig_bit, scope))
+
+def iter_bits(bit, idxs=()):
+    if isinstance(bit, ArrayType):
+        for i, b in enumerate(bit):
+            for leaf in iter_bits(b, idxs + (i,)):
+                yield leaf
     else:
-        assert False, f"Failed to collapse bit {bitref}, {arrayref}"
-
-    if idxs:
-        for idx in reversed(idxs):
-            newsource = newsource[idx]
-
-    return newsource
+        yield idxs, bit
 
-def wire_new_bit(origbit, newbit, cur_scope, primitive_map, bit_map, old_circuit, flattened_circuit):
-    if isinstance(origbit, ArrayType):
-        assert isinstance(newbit, ArrayType)
-        for x, y in zip(origbit, newbit):
-            wire_new_bit(x, y, cur_scope, primitive_map, bit_map, old_circuit, flattened_circuit)
-        return
-    # Trace back from origbit to its source, tracking bits that will be "collapsed"
-    new_circuit = flattened_circuit.circuit
+def iter_port_bits(circuit):
+    for name, port in circuit.interface.ports.items():
+        for idxs, bit in iter_bits(port):
+            yield (name, idxs), bit
 
-    sourcebit = origbit.value()
-    if sourcebit is None:
-        if isinstance(origbit, ArrayType):
-            # TODO: Raise an exception for now, can we handle this case silently (ignore unwired ports)?
-            raise MagmaTransformException("Calling `.value()` on Array returned None. Array = {}, values = {}. Likely an unwired port.".format(origbit, [b.value() for b in origbit.ts]))
+def port_key(bit):
+    ref = bit.name
+    idxs = []
+    while isinstance(ref, ArrayRef):
+        idxs.append(ref.index)
+        ref = ref.array.name
+    return ref, (ref.name, tuple(reversed(idxs)))
+
+def select_bit(ports, key):
+    bit = ports[key[0]]
+    for idx in key[1]:
+        bit = bit[idx]
+    return bit
+
+def relocate(source, offset, bindings):
+    if isinstance(source, PrimitiveSource):
+        return PrimitiveSource(offset + source.index, source.key)
+    if isinstance(source, PortSource):
+        return bindings(source.key)
+    return source
+
+class DefinitionTemplate:
+    """
+    The flattened contents of a definition, computed once and shared by all
+    its instances: the primitives inside it (`size` of them, the ones of the
+    `k`th instance starting at `offsets[instance]`) and the sources of the
+    inputs of its instances and of its outputs.
+    """
+    def __init__(self, defn, templates):
+        self.name = defn.name
+        self.instances = []
+        self.offsets = {}
+        self.children = {}
+        self.size = 0
+        for instance in defn.instances:
+            self.offsets[instance] = self.size
+            if isprimitive(type(instance)):
+                child = None
+                self.size += 1
+            else:
+                child = get_template(type(instance), templates)
+                self.children[instance] = child
+                self.size += child.size
+            self.instances.append((instance, child))
+
+        self.inputs = {}
+        for instance, _ in self.instances:
+            self.inputs[instance] = {key: self.trace(defn, bit)
+                                     for key, bit in iter_port_bits(instance)
+                                     if bit.isinput()}
+        self.outputs = {key: self.trace(defn, bit)
+                        for key, bit in iter_port_bits(defn)
+                        if bit.isinput()}
+
+    def trace(self, defn, bit):
+        """
+        Returns the source of the input `bit` inside `defn`, following the
+        wires through the instances of other definitions
+        """
+        source = bit.value()
+        if source is None:
+            return UnwiredSource("Calling `.value()` on {} returned None. Likely an unwired port.".format(bit))
+        if source.const():
+            return source
+
+        ref, key = port_key(source)
+        if isinstance(ref, DefnRef):
+            if ref.defn.name != defn.name:
+                return UnwiredSource(f"Collapsed bit to circuit other than {defn.name}, {ref.defn.name}")
+            return PortSource(key)
+        if isinstance(ref, InstRef) and ref.inst in self.offsets:
+            instance = ref.inst
+            child = self.children.get(instance)
+            if child is None:
+                return PrimitiveSource(self.offsets[instance], key)
+            return relocate(child.outputs[key], self.offsets[instance],
+                lambda key: self.trace(defn, select_bit(instance.interface.ports, key)))
+        return UnwiredSource("Failed to collapse bit {}".format(source))
+
+def get_template(defn, templates):
+    try:
+        return templates[defn]
+    except KeyError:
+        template = templates[defn] = DefinitionTemplate(defn, templates)
+        return template
+
+def stamp_template(template, scope, base, bindings, visit):
+    """
+    Walks the primitives of `template` for the instance at `scope`, whose
+    first primitive is the `base`th one, `bindings` returns the sources of the
+    inputs of the instance. Calls `visit(instance, scope, inputs)` for every
+    primitive in flattening order, `inputs` is a list of (input key, source).
+    """
+    for instance, child in template.instances:
+        inputs = [(key, relocate(source, base, bindings))
+                  for key, source in template.inputs[instance].items()]
+        if child is None:
+            visit(instance, scope, inputs)
         else:
-            raise MagmaTransformException("Calling `.value()` on {} returned None. Likely an unwired port.".format(origbit))
-    source_qual = QualifiedBit(bit=sourcebit, scope=cur_scope)
-    orig_qual = QualifiedBit(bit=origbit, scope=cur_scope)
-    collapsed_out_bits = [source_qual]
-    collapsed_in_bits = [orig_qual]
-
-    while source_qual in bit_map:
-        intermediate_in = bit_map[source_qual]
-        sourcebit = intermediate_in.bit.value()
-        if sourcebit is None:
-            raise Exception("Sourcebit is None, {} is possibly unwired?".format(source_qual))
-
-        source_qual = QualifiedBit(bit=sourcebit, scope=intermediate_in.scope)
-        collapsed_out_bits.append(source_qual)
-        collapsed_in_bits.append(intermediate_in)
+            stamp_template(child, Scope(parent=scope, instance=instance),
+                           base + template.offsets[instance],
+                           dict(inputs).__getitem__, visit)
+
+class Netlist(FlattenedScopes):
+    """
+    A flattened circuit stored as integer tables instead of magma instances.
+
+    Nets are numbered from 0: the bits of the inputs of the circuit (in the
+    order of `port_inputs`), the output bits of every primitive in flattening
+    order, then GND and VCC (`constant_nets`). Primitive `k` is an instance of
+    `types[primitive_types[k]]`, it reads the nets
+    `input_nets[input_offsets[k]:input_offsets[k + 1]]` (in the order of
+    `type_inputs[t]`) and drives the nets `output_offsets[k]` to
+    `output_offsets[k + 1] - 1` (in the order of `type_outputs[t]`). The
+    primitives reading net `n` are
+    `fanout_primitives[fanout_offsets[n]:fanout_offsets[n + 1]]` and the
+    outputs of the circuit are driven by `port_nets` (in the order of
+    `port_outputs`).
+
+    `instances` and `scopes` map the primitives back to the original
+    instances, `get_net(bit, scope)` maps a bit of the original circuit to
+    its net.
+    """
+    def __init__(self, circuit):
+        super().__init__()
+        self.circuit = circuit
+        self.template = get_template(circuit, {})
+
+        self.port_inputs = [key for key, bit in iter_port_bits(circuit)
+                            if not bit.isinput()]
+        self.port_outputs = [key for key, bit in iter_port_bits(circuit)
+                             if bit.isinput()]
+        self.types = []
+        self.type_inputs = []
+        self.type_outputs = []
+        self.instances = []
+        self.scopes = []
+        type_ids = {}
+        primitive_types = []
+        fanin = []
+
+        def add_primitive(instance, scope, inputs):
+            defn = type(instance)
+            if defn not in type_ids:
+                type_ids[defn] = len(self.types)
+                self.types.append(defn)
+                self.type_inputs.append([key for key, _ in inputs])
+                self.type_outputs.append([key for key, bit in iter_port_bits(instance)
+                                          if not bit.isinput()])
+            primitive_types.append(type_ids[defn])
+            self.instances.append(instance)
+            self.scopes.append(scope)
+            fanin.append([source for _, source in inputs])
+
+        stamp_template(self.template, Scope(), 0, PortSource, add_primitive)
+
+        self.primitive_types = np.array(primitive_types, dtype=np.int32)
+        self.stateful = np.array([bool(getattr(defn, 'stateful', False))
+                                  for defn in self.types], dtype=bool)[self.primitive_types]
+        self.output_offsets = self.offsets(len(self.port_inputs),
+            [len(self.type_outputs[t]) for t in primitive_types])
+        self.constant_nets = (int(self.output_offsets[-1]),
+                              int(self.output_offsets[-1]) + 1)
+        self.num_nets = self.constant_nets[1] + 1
+
+        self.port_index = {key: i for i, key in enumerate(self.port_inputs)}
+        self.output_index = [{key: i for i, key in enumerate(keys)}
+                             for keys in self.type_outputs]
+        self.input_offsets = self.offsets(0, [len(sources) for sources in fanin])
+        self.input_nets = np.array([self.source_net(source)
+                                    for sources in fanin for source in sources],
+                                   dtype=np.int32)
+        self.port_nets = np.array([self.source_net(self.template.outputs[key])
+                                   for key in self.port_outputs], dtype=np.int32)
+
+        readers = np.repeat(np.arange(len(fanin), dtype=np.int32),
+                            np.diff(self.input_offsets))
+        self.fanout_primitives = readers[np.argsort(self.input_nets, kind='stable')]
+        self.fanout_offsets = self.offsets(0,
+            np.bincount(self.input_nets, minlength=self.num_nets))
+
+    @staticmethod
+    def offsets(start, counts):
+        offsets = np.empty(len(counts) + 1, dtype=np.int64)
+        offsets[0] = start
+        np.cumsum(counts, out=offsets[1:])
+        offsets[1:] += start
+        return offsets
+
+    def source_net(self, source):
+        if isinstance(source, PrimitiveSource):
+            k = source.index
+            t = self.primitive_types[k]
+            return self.output_offsets[k] + self.output_index[t][source.key]
+        if isinstance(source, PortSource):
+            return self.port_index[source.key]
+        if isinstance(source, UnwiredSource):
+            raise MagmaTransformException(source.message)
+        return self.constant_nets[1 if source is VCC else 0]
+
+    def get_net(self, bit, scope=None):
+        """
+        Returns the net of the bit `bit` of the instance at `scope` (a list of
+        nets if `bit` is an array)
+        """
+        if scope is None:
+            scope = Scope()
+        if isinstance(bit, ArrayType):
+            return [self.get_net(b, scope) for b in bit]
+        try:
+            return int(self.source_net(self.locate_source(bit, scope)))
+        except KeyError:
+            raise MagmaTransformException("Could not find bit in netlist. bit={}, scope={}".format(bit, scope))
+
+    def fanin(self, k):
+        return self.input_nets[self.input_offsets[k]:self.input_offsets[k + 1]]
+
+    def fanout(self, net):
+        return self.fanout_primitives[self.fanout_offsets[net]:self.fanout_offsets[net + 1]]
+
+    def net_name(self, net):
+        def key_name(key):
+            return str(key[0]) + ''.join('[{}]'.format(i) for i in key[1])
+
+        if net < len(self.port_inputs):
+            return self.circuit.name + '.' + key_name(self.port_inputs[net])
+        if net in self.constant_nets:
+            return 'VCC' if net == self.constant_nets[1] else 'GND'
+        k = int(np.searchsorted(self.output_offsets, net, side='right')) - 1
+        key = self.type_outputs[self.primitive_types[k]][net - self.output_offsets[k]]
+        return "{}/{}.{}".format(self.scopes[k].value().rstrip('/'),
+                                 self.instances[k].name, key_name(key))
+
+def flatten(circuit, netlist=False):
+    """
+    Returns a TransformedCircuit holding a copy of every primitive of
+    `circuit` wired directly to each other, or a `Netlist` if `netlist` is
+    True
+    """
+    if netlist:
+        return Netlist(circuit)
 
-    newsource = get_new_source(source_qual, primitive_map, old_circuit, new_circuit)
-    wire(newsource, newbit)
-
-    for collapsed in collapsed_in_bits:
-        flattened_circuit.set_new_bit(collapsed.bit, collapsed.scope, newbit)
-
-    for collapsed in collapsed_out_bits:
-        flattened_circuit.set_new_bit(collapsed.bit, collapsed.scope, newsource)
-
-def flatten(circuit):
     flattened_circuit = TransformedCircuit(circuit, 'flattened')
+    new_circuit = flattened_circuit.circuit
 
-    outer_scope = Scope()
-    orig_primitives, bit_map = get_primitives(circuit, outer_scope)
+    # Every definition is traced once, its instances only copy primitives
+    template = get_template(circuit, {})
+    flattened_circuit.template = template
+    sinks = []
 
-    primitive_map = {} # Maps from primitives in the old circuit to new circuits
-    new_primitives = []
-    for old in orig_primitives:
-        new = CopyInstance(old.instance)
-        new_primitives.append(new)
-        primitive_map[old] = new
+    def copy_primitive(instance, scope, inputs):
+        new = CopyInstance(instance)
+        flattened_circuit.primitives.append(new)
+        flattened_circuit.primitive_map[new] = \
+            QualifiedInstance(instance=instance, scope=scope)
+        sinks.extend((new, key, source) for key, source in inputs)
 
-    # Wire up all the new instances
-    for new_inst, qual_inst in zip(new_primitives, orig_primitives):
-        orig_inst = qual_inst.instance
+    stamp_template(template, Scope(), 0, PortSource, copy_primitive)
 
-        for name, origbit in orig_inst.interface.ports.items():
-            if origbit.isinput():
-                newbit = new_inst.interface.ports[name]
-                wire_new_bit(origbit, newbit, qual_inst.scope, primitive_map, bit_map, circuit, flattened_circuit)
+    # Wire up all the new instances
+    for new_inst, key, source in sinks:
+        newbit = select_bit(new_inst.interface.ports, key)
+        wire(flattened_circuit.get_new_source(source), newbit)
 
     # Finally, wire up the circuit outputs
-    new_circuit = flattened_circuit.circuit
-    for name, origbit in circuit.interface.ports.items():
-        if origbit.isinput(): # Circuit output
-            newbit = new_circuit.interface.ports[name]
-            wire_new_bit(origbit, newbit, Scope(), primitive_map, bit_map, circuit, flattened_circuit)
+    for key, source in template.outputs.items():
+        newbit = select_bit(new_circuit.interface.ports, key)
+        wire(flattened_circuit.get_new_source(source), newbit)
 
-    for primitive in new_primitives:
+    for primitive in flattened_circuit.primitives:
         new_circuit.place(primitive)
 
     return flattened_circuit
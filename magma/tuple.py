@@ -2,7 +2,9 @@ from collections import Sequence, Mapping, OrderedDict
 from .ref import AnonRef, TupleRef
 from .t import Type, Kind
 from .compatibility import IntegerTypes, StringTypes
-from .bit import BitOut, VCC, GND
+from .bit import BitOut, VCC, GND, _BitType
+from .array import buscompatible
+from .port import wirebus
 from .debug import debug_wire, get_callee_frame_info
 from .logging import error
 
@@ -86,8 +88,31 @@ class TupleType(Type):
         #    print('Wiring error: Tuple elements must have the same type')
         #    return
 
-        for k in range(len(i)):
-            i[k].wire(o[k], debug_info)
+        if not istuplebus(i, o):
+            for k in range(len(i)):
+                i[k].wire(o[k], debug_info)
+            return
+
+        i.connect(o, debug_info)
+
+    def connect(i, o, debug_info):
+        """
+        Wires the fields of the tuple `o` to the fields of the tuple `i`,
+        `istuplebus(i, o)` must hold
+        """
+        inputs = []
+        outputs = []
+        for it, ot in zip(i.ts, o.ts):
+            if isinstance(it, _BitType):
+                inputs.append(it.port)
+                outputs.append(ot.port)
+                it.debug_info = debug_info
+                ot.debug_info = debug_info
+            else:
+                # Arrays and tuples
+                it.connect(ot, debug_info)
+        # The bit fields are wired in one pass
+        wirebus(inputs, outputs)
 
     def driven(self):
         for t in self.ts:
@@ -155,6 +180,31 @@ class TupleType(Type):
     def flatten(self):
         return sum([t.flatten() for t in self.ts], [])
 
+def tuplecompatible(I, O):
+    """
+    Returns whether every field of a tuple of type `O` can be wired to the
+    corresponding field of a tuple of type `I`
+    """
+    if not issubclass(O, TupleType) or I.Ks != O.Ks:
+        return False
+    for IT, OT in zip(I.Ts, O.Ts):
+        if issubclass(IT, TupleType):
+            if not tuplecompatible(IT, OT):
+                return False
+        elif not buscompatible(IT, OT):
+            return False
+    return True
+
+
+def istuplebus(i, o):
+    """
+    Returns whether wiring `o` to `i` connects a named output tuple to a
+    named input tuple with compatible fields
+    """
+    return not i.anon() and not o.anon() and i.isinput() and o.isoutput() \
+           and tuplecompatible(type(i), type(o))
+
+
 class TupleKind(Kind):
     def __init__(cls, name, bases, dct):
         super(TupleKind, cls).__init__(name, bases, dct)
@@ -0,0 +1,40 @@
+import sys
+from magma import *
+from magma.config import set_debug_level, get_debug_level
+from magma.passes.debug_name import DebugNamePass
+
+
+def make_circuit():
+    Buf = DeclareCircuit('DebugBuf', "I", In(Bit), "O", Out(Bit))
+    main = DefineCircuit("debug_" + get_debug_level(), "I", In(Bit), "O", Out(Bit))
+    buf = Buf(); lineno = sys._getframe().f_lineno
+    wire(main.I, buf.I)
+    wire(buf.O, main.O)
+    EndCircuit()
+    return main, buf, lineno
+
+
+def test_debug_levels():
+    try:
+        set_debug_level('off')
+        main, buf, lineno = make_circuit()
+        assert (buf.filename, buf.lineno) == (None, None)
+        assert buf.stack is None
+        DebugNamePass(main).run()
+        assert buf.decl is None
+
+        set_debug_level('frame')
+        main, buf, lineno = make_circuit()
+        assert (buf.filename, buf.lineno) == (__file__, lineno)
+        assert main.filename == __file__
+        assert buf.stack is None
+
+        set_debug_level('full')
+        main, buf, lineno = make_circuit()
+        assert (buf.filename, buf.lineno) == (__file__, lineno)
+        assert buf.stack is not None
+        DebugNamePass(main).run()
+        assert buf.decl.varname == 'buf'
+        assert buf.stack is None
+    finally:
+        set_debug_level('full')
@@ -0,0 +1,30 @@
+import pickle
+from magma import *
+from magma.scope import Scope
+
+
+def test_scope_interned():
+    Inner = DefineCircuit('ScopeInner', 'I', In(Bit), 'O', Out(Bit))
+    wire(Inner.I, Inner.O)
+    EndCircuit()
+    Outer = DefineCircuit('ScopeOuter', 'I', In(Bit), 'O', Out(Bit))
+    inner = Inner()
+    wire(Outer.I, inner.I)
+    wire(inner.O, Outer.O)
+    EndCircuit()
+
+    assert Scope() is Scope()
+    scope = Scope(parent=Scope(), instance=inner)
+    assert scope is Scope(parent=Scope(), instance=inner)
+    assert scope is Scope(instance=inner)
+    assert scope.parent is Scope()
+    assert scope != Scope()
+    assert scope != inner
+    assert {scope: 1}[Scope(parent=Scope(), instance=inner)] == 1
+
+    assert Scope().value() == '/'
+    assert scope.value() == '/ScopeInner.' + inner.name
+    nested = Scope(parent=scope, instance=inner)
+    assert nested.value() == scope.value() + '/ScopeInner.' + inner.name
+
+    assert pickle.loads(pickle.dumps(Scope())) is Scope()
@@ -0,0 +1,83 @@
+import pytest
+from .test_primitives import *
+from magma.simulator import PythonSimulator
+from magma.scope import *
+
+
+def make_two_domains():
+    """
+    OA is I registered on CLKA, OB is OA registered on CLKB
+    """
+    args = ['I', In(Bit), 'OA', Out(Bit), 'OB', Out(Bit),
+            'CLKA', In(Clock), 'CLKB', In(Clock)]
+    TwoDomains = DefineCircuit('TestTwoClockDomains', *args)
+    ffa = PRIM_FF()
+    ffb = PRIM_FF()
+    wire(TwoDomains.CLKA, ffa.CLK)
+    wire(TwoDomains.CLKB, ffb.CLK)
+    wire(TwoDomains.I, ffa.D)
+    wire(ffa.Q, ffb.D)
+    wire(ffa.Q, TwoDomains.OA)
+    wire(ffb.Q, TwoDomains.OB)
+    EndCircuit()
+    return TwoDomains
+
+
+@pytest.mark.parametrize('mode', [{}, {'compiled': True},
+                                  {'event_driven': True}])
+def test_clocks(mode):
+    TwoDomains = make_two_domains()
+    sim = PythonSimulator(TwoDomains, clocks={TwoDomains.CLKA: 2,
+                                              TwoDomains.CLKB: 6},
+                          checkpoint_interval=2, profile=True, **mode)
+
+    sim.set_value(TwoDomains.I, True)
+    sim.advance(2)
+    assert sim.get_time() == 1
+    assert sim.get_value(TwoDomains.OA) == True
+    assert sim.get_value(TwoDomains.OB) == False
+
+    # The edges at time 2 and 3, CLKB falls at 3
+    state = sim.advance(2)
+    assert sim.get_time() == 3
+    assert state.clock == False
+    assert sim.get_value(TwoDomains.OB) == True
+
+    sim.set_value(TwoDomains.I, False)
+    sim.advance(2)
+    assert sim.get_time() == 5
+    assert sim.get_value(TwoDomains.OA) == False
+    assert sim.get_value(TwoDomains.OB) == True
+
+    if not mode:
+        # CLKA toggled at every step, CLKB at times 0 and 3 only
+        calls = {name.split('/')[-1]: calls
+                 for name, calls, _ in sim.profiler.totals('instance')}
+        assert calls['PRIM_FF.inst0'] == 6
+        assert calls['PRIM_FF.inst1'] == 2
+
+    sim.rewind(3)
+    assert sim.get_time() == 2
+    assert sim.get_value(TwoDomains.OA) == True
+    assert sim.get_value(TwoDomains.OB) == False
+    sim.advance(3)
+    assert sim.get_time() == 5
+    assert sim.get_value(TwoDomains.OA) == False
+    assert sim.get_value(TwoDomains.OB) == True
+
+
+def test_clocks_phase():
+    TwoDomains = make_two_domains()
+    sim = PythonSimulator(TwoDomains, TwoDomains.CLKB,
+                          clocks={TwoDomains.CLKA: 4,
+                                  TwoDomains.CLKB: (4, 1)})
+    times = []
+    for i in range(4):
+        sim.advance(1)
+        times.append((sim.get_time(), sim.get_value(TwoDomains.CLKA),
+                      sim.get_clock_value()))
+    assert times == [(0, True, False), (1, True, True),
+                     (2, False, True), (3, False, False)]
+
+    with pytest.raises(ValueError):
+        PythonSimulator(TwoDomains, clocks={TwoDomains.CLKA: 3})
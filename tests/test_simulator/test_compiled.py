@@ -0,0 +1,72 @@
+from .test_primitives import *
+from .test_packed import make_accumulator
+from magma.simulator import PythonSimulator
+from magma.scope import *
+
+
+def make_circuit():
+    args = ['I0', In(Bit), 'I1', In(Bit), 'O', Out(Bit), 'Q', Out(Bit)]
+    args += ClockInterface(False, False, False)
+
+    testcircuit = DefineCircuit('TestCompiled', *args)
+    andy = PRIM_AND()
+    ori = PRIM_OR()
+    n = PRIM_NOT()
+    ff = PRIM_FF()
+
+    wire(testcircuit.I0, andy.I0)
+    wire(testcircuit.I1, n.I)
+    wire(n.O, andy.I1)
+    wire(andy.O, ori.I0)
+    wire(ff.Q, ori.I1)
+    wire(ori.O, ff.D)
+    wire(ori.O, testcircuit.O)
+    wire(ff.Q, testcircuit.Q)
+    EndCircuit()
+    return testcircuit
+
+
+def test_compiled_matches_interpreted():
+    testcircuit = make_circuit()
+    interpreted = PythonSimulator(testcircuit, testcircuit.CLK)
+    compiled = PythonSimulator(testcircuit, testcircuit.CLK, compiled=True)
+    assert compiled.compiled_source.startswith("def evaluate():")
+
+    stimulus = [(False, False), (True, True), (True, False), (False, False),
+                (False, True)]
+    for I0, I1 in stimulus:
+        for sim in (interpreted, compiled):
+            sim.set_value(testcircuit.I0, I0)
+            sim.set_value(testcircuit.I1, I1)
+            sim.advance(2)
+        for port in (testcircuit.O, testcircuit.Q):
+            assert compiled.get_value(port) == interpreted.get_value(port)
+
+    assert compiled.get_value(testcircuit.Q) == True
+
+
+def test_compiled_inlines_primitives():
+    testcircuit = make_circuit()
+    compiled = PythonSimulator(testcircuit, testcircuit.CLK, compiled=True)
+    # Every primitive has a simulate_source method, none is called
+    assert 'simulate' not in compiled.compiled_source
+    assert 'values[' in compiled.compiled_source
+
+    profiled = PythonSimulator(testcircuit, testcircuit.CLK, compiled=True,
+                               profile=True)
+    assert 'simulate0(value_store, state0)' in profiled.compiled_source
+
+
+def test_compiled_inlines_arrays():
+    Accumulator = make_accumulator(8)
+    sim = PythonSimulator(Accumulator, Accumulator.CLK, compiled=True)
+    assert 'simulate' not in sim.compiled_source
+    total = 0
+    for value in (3, 100, 200, 7):
+        sim.set_value(Accumulator.I, int2seq(value, 8))
+        sim.advance(2)
+        total += value
+        assert seq2int(sim.get_value(Accumulator.O)) == total & 0xff
+        # The adder now adds the input to the new total
+        assert sim.get_value(Accumulator.COUT) == \
+            ((total & 0xff) + value > 0xff)
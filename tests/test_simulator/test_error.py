@@ -17,3 +17,26 @@ def test_instance():
         assert False, "Should raise a ValueError when passing an instance to the Python Simulator"
     except ValueError as e:
         pass
+
+
+def test_combinational_loop():
+    from .test_primitives import PRIM_NOT, PRIM_AND
+    from magma.simulator.python_simulator import PythonSimulatorException
+
+    Test = DefineCircuit('TestLoop', 'I', In(Bit), 'O', Out(Bit))
+    andy = PRIM_AND()
+    n = PRIM_NOT()
+    wire(Test.I, andy.I0)
+    wire(n.O, andy.I1)
+    wire(andy.O, n.I)
+    wire(andy.O, Test.O)
+    EndCircuit()
+
+    try:
+        PythonSimulator(Test)
+        assert False, "Should raise an exception for a combinational loop"
+    except PythonSimulatorException as e:
+        message = str(e)
+        assert message.startswith("Combinational loop detected: ")
+        assert "PRIM_AND.inst0" in message
+        assert "PRIM_NOT.inst1" in message
@@ -0,0 +1,55 @@
+from .test_primitives import *
+from magma.simulator import PythonSimulator
+from magma.scope import *
+
+
+def test_event_driven():
+    args = ['I0', In(Bit), 'I1', In(Bit), 'I2', In(Bit), 'O0', Out(Bit),
+            'O1', Out(Bit)]
+    args += ClockInterface(False, False, False)
+
+    testcircuit = DefineCircuit('TestEventDriven', *args)
+    andy = PRIM_AND()
+    n0 = PRIM_NOT()
+    n1 = PRIM_NOT()
+    ori = PRIM_OR()
+    ff = PRIM_FF()
+
+    # I0 & !I1 -> O0
+    wire(testcircuit.I0, andy.I0)
+    wire(testcircuit.I1, n0.I)
+    wire(n0.O, andy.I1)
+    wire(andy.O, testcircuit.O0)
+
+    # !I2 | Q -> O1, registered through ff
+    wire(testcircuit.I2, n1.I)
+    wire(n1.O, ori.I0)
+    wire(ff.Q, ori.I1)
+    wire(ori.O, ff.D)
+    wire(ori.O, testcircuit.O1)
+    EndCircuit()
+
+    sim = PythonSimulator(testcircuit, testcircuit.CLK, event_driven=True)
+    ref = PythonSimulator(testcircuit, testcircuit.CLK)
+
+    sim.evaluate()
+    assert sim.evaluated_primitives == 5
+
+    # Nothing changed, only the stateful primitive is simulated
+    sim.evaluate()
+    assert sim.evaluated_primitives == 1
+
+    sim.set_value(testcircuit.I1, True)
+    sim.evaluate()
+    assert sim.evaluated_primitives == 3
+
+    stimulus = [(True, False, True), (True, True, True), (False, False, False),
+                (False, False, True), (True, False, True)]
+    for values in stimulus:
+        for s in (sim, ref):
+            for port, value in zip((testcircuit.I0, testcircuit.I1,
+                                    testcircuit.I2), values):
+                s.set_value(port, value)
+            s.advance(2)
+        for port in (testcircuit.O0, testcircuit.O1):
+            assert sim.get_value(port) == ref.get_value(port)
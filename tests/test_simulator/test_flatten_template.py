@@ -0,0 +1,70 @@
+from .test_primitives import *
+from magma.simulator import PythonSimulator
+from magma.scope import *
+from magma.transforms import flatten
+
+
+def make_hierarchy(n):
+    # Buffer: two inverters, T passes the input through, U is unused
+    Buffer = DefineCircuit('TemplateBuffer', 'I', In(Bit), 'O', Out(Bit),
+                           'T', Out(Bit), 'U', Out(Bit))
+    inv0 = PRIM_NOT()
+    inv1 = PRIM_NOT()
+    wire(Buffer.I, inv0.I)
+    wire(inv0.O, inv1.I)
+    wire(inv1.O, Buffer.O)
+    wire(Buffer.I, Buffer.T)
+    wire(inv0.O, Buffer.U)
+    EndCircuit()
+
+    Pair = DefineCircuit('TemplatePair', 'I', In(Bit), 'O', Out(Bit),
+                         'T', Out(Bit))
+    b0 = Buffer()
+    b1 = Buffer()
+    wire(Pair.I, b0.I)
+    wire(b0.O, b1.I)
+    wire(b1.O, Pair.O)
+    wire(b0.T, Pair.T)
+    EndCircuit()
+
+    Top = DefineCircuit('TemplateTop{}'.format(n), 'I', In(Bit),
+                        'O', Out(Bit), 'T', Out(Bit))
+    pairs = [Pair() for _ in range(n)]
+    wire(Top.I, pairs[0].I)
+    for prev, pair in zip(pairs, pairs[1:]):
+        wire(prev.O, pair.I)
+    wire(pairs[-1].O, Top.O)
+    wire(pairs[0].T, Top.T)
+    EndCircuit()
+    return Top, Pair, Buffer
+
+
+def test_template_shared():
+    Top, Pair, Buffer = make_hierarchy(4)
+    txfm = flatten(Top)
+
+    children = set(id(t) for t in txfm.template.children.values())
+    assert len(children) == 1
+    pair_template = next(iter(txfm.template.children.values()))
+    assert pair_template.size == 4
+    assert txfm.template.size == 16
+    assert len(txfm.primitives) == 16
+    assert len(txfm.circuit.instances) == 16
+
+
+def test_template_simulate():
+    Top, Pair, Buffer = make_hierarchy(3)
+    sim = PythonSimulator(Top)
+    pair = Top.instances[2]
+    buf = Pair.instances[1]
+    scope = Scope(parent=Scope(parent=Scope(), instance=pair), instance=buf)
+
+    for value in [False, True]:
+        sim.set_value(Top.I, value)
+        sim.evaluate()
+        assert sim.get_value(Top.O) == value
+        assert sim.get_value(Top.T) == value
+        assert sim.get_value(Buffer.instances[0].O, scope) == (not value)
+        assert sim.get_value(Buffer.U, scope) == (not value)
+        assert sim.get_value(Buffer.T, scope) == value
+        assert sim.get_value(buf.O, Scope(parent=Scope(), instance=pair)) == value
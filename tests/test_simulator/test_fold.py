@@ -0,0 +1,44 @@
+import pytest
+from .test_primitives import *
+from magma.simulator import PythonSimulator
+from magma.scope import *
+
+
+def make_enabled_and():
+    """
+    O = I & ~GND & VCC, with the enable computed from constants
+    """
+    args = ['I', In(Bit), 'O', Out(Bit)]
+    EnabledAnd = DefineCircuit('TestFoldEnabledAnd', *args)
+    enable = PRIM_NOT()
+    wire(GND, enable.I)
+    enable_and = PRIM_AND()
+    wire(enable.O, enable_and.I0)
+    wire(VCC, enable_and.I1)
+    out = PRIM_AND()
+    wire(EnabledAnd.I, out.I0)
+    wire(enable_and.O, out.I1)
+    wire(out.O, EnabledAnd.O)
+    EndCircuit()
+    return EnabledAnd
+
+
+@pytest.mark.parametrize('mode', SIMULATOR_MODES + [{'lanes': 4}])
+def test_fold_constants(mode):
+    EnabledAnd = make_enabled_and()
+    sim = PythonSimulator(EnabledAnd, fold_constants=True, **mode)
+    assert sim.folded_primitives == 2
+    assert len(sim.execution_order.combinational) == 1
+
+    if 'lanes' in mode:
+        values = [True, False, True, False]
+        sim.set_value(EnabledAnd.I, values)
+        sim.evaluate()
+        assert sim.get_value(EnabledAnd.O) == values
+        return
+
+    for value in [True, False, True]:
+        sim.set_value(EnabledAnd.I, value)
+        sim.evaluate()
+        assert sim.get_value(EnabledAnd.O) == value
+    assert sim.get_value(EnabledAnd.instances[0].O, Scope()) == True
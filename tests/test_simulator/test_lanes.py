@@ -0,0 +1,63 @@
+from .test_primitives import *
+from magma.simulator import PythonSimulator
+from magma.simulator.python_simulator import testvectors as sim_testvectors
+from magma.scope import *
+
+
+def make_mux():
+    args = ['A', In(Bits(2)), 'B', In(Bits(2)), 'S', In(Bit), 'O', Out(Bits(2))]
+    Mux = DefineCircuit('TestLanesMux', *args)
+    n = PRIM_NOT()
+    wire(Mux.S, n.I)
+    for i in range(2):
+        a = PRIM_AND()
+        b = PRIM_AND()
+        o = PRIM_OR()
+        wire(Mux.A[i], a.I0)
+        wire(n.O, a.I1)
+        wire(Mux.B[i], b.I0)
+        wire(Mux.S, b.I1)
+        wire(a.O, o.I0)
+        wire(b.O, o.I1)
+        wire(o.O, Mux.O[i])
+    EndCircuit()
+    return Mux
+
+
+def test_lanes_testvectors():
+    Mux = make_mux()
+    expected = sim_testvectors(Mux)
+    assert len(expected) == 32
+    # 32 combinations do not fill the last batch of 12 lanes
+    assert sim_testvectors(Mux, lanes=12) == expected
+    assert sim_testvectors(Mux, lanes=64) == expected
+
+
+def test_lanes_sequential():
+    args = ['I', In(Bit), 'O', Out(Bit)] + ClockInterface(False, False, False)
+    Test = DefineCircuit('TestLanesFF', *args)
+    ff = PRIM_FF()
+    n = PRIM_NOT()
+    wire(Test.I, ff.D)
+    wire(ff.Q, n.I)
+    wire(n.O, Test.O)
+    EndCircuit()
+
+    streams = [[True, False, True], [False, False, True], [True, True, False]]
+    sim = PythonSimulator(Test, Test.CLK, lanes=len(streams))
+    for cycle in range(3):
+        sim.set_value(Test.I, [stream[cycle] for stream in streams])
+        sim.advance(2)
+        assert sim.get_value(Test.O) == [not stream[cycle] for stream in streams]
+
+
+def test_sharded_testvectors(tmpdir):
+    expected = sim_testvectors(make_mux())
+    assert sim_testvectors(make_mux, processes=2, shards=5) == expected
+    assert sim_testvectors(make_mux, processes=2, lanes=4) == expected
+
+    path = str(tmpdir.join('mux.tv'))
+    assert sim_testvectors(make_mux, processes=2, path=path) == 32
+    with open(path) as f:
+        rows = [[int(v) for v in line.split()] for line in f]
+    assert rows == expected
@@ -5,7 +5,7 @@ from magma import *
 from magma.scope import *
 from magma.passes.debug_name import DebugNamePass
 
-def test(capsys):
+def test(capsys, monkeypatch):
     def get_out(capsys):
         out, err = capsys.readouterr()
         assert(err == "")
@@ -109,3 +109,19 @@ def test(capsys):
 
     console.runcmd("p counter.reg.O")
     assert get_out(capsys) == "2"
+
+    # Printing a waveform rewinds and replays the simulation, the
+    # watchpoints do not stop the replay
+    plotted = []
+    monkeypatch.setattr('magma.simulator.mdb.waveform',
+                        lambda signals, labels: plotted.append(signals))
+    console.runcmd("next")
+    console.runcmd("next")
+    console.runcmd("watch self.O")
+    capsys.readouterr()
+    time = sim.get_time()
+    console.runcmd("waveform self.O")
+    assert plotted == [[[2], [3], [4]]]
+    assert sim.get_time() == time
+    console.runcmd("p self.O")
+    assert get_out(capsys) == "4"
@@ -0,0 +1,42 @@
+from .test_primitives import *
+from .test_flatten_template import make_hierarchy
+from magma.scope import *
+from magma.transforms import flatten, Netlist
+
+
+def test_netlist():
+    Top, Pair, Buffer = make_hierarchy(3)
+    netlist = flatten(Top, netlist=True)
+    assert isinstance(netlist, Netlist)
+
+    assert len(netlist.instances) == 12
+    assert netlist.types == [PRIM_NOT]
+    assert netlist.port_inputs == [('I', ())]
+    assert netlist.port_outputs == [('O', ()), ('T', ())]
+    # I, one output per inverter, GND and VCC
+    assert netlist.num_nets == 1 + 12 + 2
+    assert list(netlist.input_offsets) == list(range(13))
+    assert list(netlist.output_offsets) == list(range(1, 14))
+    assert not netlist.stateful.any()
+
+    # The inverters form a single chain driven by I
+    assert list(netlist.input_nets) == list(range(12))
+    for net in range(12):
+        assert list(netlist.fanout(net)) == [net]
+    assert len(netlist.fanout(12)) == 0
+    assert list(netlist.port_nets) == [12, 0]
+
+    pair = Top.instances[1]
+    buf = Pair.instances[0]
+    scope = Scope(parent=Scope(parent=Scope(), instance=pair), instance=buf)
+    assert netlist.get_net(Buffer.instances[0].O, scope) == 5
+    assert netlist.get_net(Buffer.U, scope) == 5
+    assert netlist.get_net(Buffer.I, scope) == 4
+    assert netlist.get_net(Top.I) == 0
+    assert netlist.get_net(Top.O) == 12
+    assert netlist.scopes[4] is scope
+    assert netlist.instances[4] is Buffer.instances[0]
+    assert netlist.net_name(0) == Top.name + '.I'
+    assert netlist.net_name(5) == '{}/{}.O'.format(scope.value(),
+                                                   Buffer.instances[0].name)
+    assert netlist.net_name(netlist.constant_nets[1]) == 'VCC'
@@ -0,0 +1,101 @@
+from .test_primitives import *
+from magma.simulator import PythonSimulator
+from magma.simulator.python_simulator import PackedValueStore
+from magma.scope import *
+
+
+def simulate_word_add(self, value_store, state_store):
+    n = len(self.O)
+    value = value_store.get_word(self.I0) + value_store.get_word(self.I1)
+    value_store.set_word(self.O, value & ((1 << n) - 1))
+    value_store.set_value(self.COUT, value >> n)
+
+
+def simulate_reg(self, value_store, state_store):
+    cur_clock = value_store.get_value(self.CLK)
+    if not state_store:
+        state_store['prev_clock'] = cur_clock
+        state_store['cur_val'] = 0
+    if not cur_clock and state_store['prev_clock']:
+        state_store['cur_val'] = value_store.get_word(self.I)
+    state_store['prev_clock'] = cur_clock
+    value_store.set_word(self.O, state_store['cur_val'])
+
+
+def word_source(bits):
+    return '({})'.format(' | '.join('({} << {})'.format(bit, k)
+                                    for k, bit in enumerate(bits)))
+
+
+def simulate_source_word_add(self, ports, state):
+    lines = ['word = {} + {}'.format(word_source(ports['I0']),
+                                     word_source(ports['I1']))]
+    lines += ['{} = bool(word >> {} & 1)'.format(bit, k)
+              for k, bit in enumerate(ports['O'])]
+    lines.append('{} = bool(word >> {})'.format(ports['COUT'], len(ports['O'])))
+    return lines
+
+
+def simulate_source_reg(self, ports, state):
+    lines = [
+        'if not {}:'.format(state),
+        '    {}.update(prev_clock={CLK}, cur_val=0)'.format(state, **ports),
+        'if not {CLK} and {}["prev_clock"]:'.format(state, **ports),
+        '    {}["cur_val"] = {}'.format(state, word_source(ports['I'])),
+        '{}["prev_clock"] = {CLK}'.format(state, **ports),
+    ]
+    lines += ['{} = bool({}["cur_val"] >> {} & 1)'.format(bit, state, k)
+              for k, bit in enumerate(ports['O'])]
+    return lines
+
+
+def make_accumulator(n):
+    T = Bits(n)
+    WordAdd = DeclareCircuit('WordAdd{}'.format(n), 'I0', In(T), 'I1', In(T),
+                             'O', Out(T), 'COUT', Out(Bit), stateful=False,
+                             primitive=True, simulate=simulate_word_add,
+                             simulate_source=simulate_source_word_add)
+    Reg = DeclareCircuit('WordReg{}'.format(n), 'I', In(T), 'O', Out(T),
+                         'CLK', In(Clock), stateful=True, primitive=True,
+                         simulate=simulate_reg,
+                         simulate_source=simulate_source_reg)
+
+    args = ['I', In(T), 'O', Out(T), 'COUT', Out(Bit)]
+    args += ClockInterface(False, False, False)
+    Accumulator = DefineCircuit('Accumulator{}'.format(n), *args)
+    add = WordAdd()
+    reg = Reg()
+    wire(Accumulator.I, add.I0)
+    wire(reg.O, add.I1)
+    wire(add.O, reg.I)
+    wire(reg.O, Accumulator.O)
+    wire(add.COUT, Accumulator.COUT)
+    wire(Accumulator.CLK, reg.CLK)
+    EndCircuit()
+    return Accumulator
+
+
+def test_packed_value_store():
+    store = PackedValueStore()
+    A = Out(Bits(8))(name='A')
+    store.set_value(A, [True, False, True] + 5 * [False])
+    assert store.get_word(A) == 5
+    store.set_value(A[1], True)
+    assert store.get_word(A) == 7
+    assert store.get_value(A[2]) == True
+    assert store.get_word(A[4:8]) == 0
+    store.set_word(A, 0xf0)
+    assert store.get_word(A[4:8]) == 0xf
+    assert store.get_value(A) == 4 * [False] + 4 * [True]
+
+
+def test_packed_accumulator():
+    Accumulator = make_accumulator(8)
+    for packed in (False, True):
+        sim = PythonSimulator(Accumulator, Accumulator.CLK, packed=packed)
+        total = 0
+        for value in (3, 100, 200, 7):
+            sim.set_value(Accumulator.I, int2seq(value, 8))
+            sim.advance(2)
+            total += value
+            assert seq2int(sim.get_value(Accumulator.O)) == total & 0xff
@@ -17,6 +17,20 @@ def simulate_prim_or(self, value_store, state_store):
     val = I0 or I1
     value_store.set_value(self.O, val)
 
+def simulate_batch_prim_not(self, value_store, state_store):
+    I = value_store.get_value(self.I)
+    value_store.set_value(self.O, ~I & value_store.mask)
+
+def simulate_batch_prim_and(self, value_store, state_store):
+    I0 = value_store.get_value(self.I0)
+    I1 = value_store.get_value(self.I1)
+    value_store.set_value(self.O, I0 & I1)
+
+def simulate_batch_prim_or(self, value_store, state_store):
+    I0 = value_store.get_value(self.I0)
+    I1 = value_store.get_value(self.I1)
+    value_store.set_value(self.O, I0 | I1)
+
 def simulate_prim_flip_flop(self, value_store, state_store):
     cur_clock = value_store.get_value(self.CLK)
 
@@ -38,8 +52,46 @@ def simulate_prim_flip_flop(self, value_store, state_store):
     state_store['cur_val'] = new_val
     value_store.set_value(self.Q, new_val)
 
+def simulate_source_prim_not(self, ports, state):
+    return ['{O} = not {I}'.format(**ports)]
+
+def simulate_source_prim_and(self, ports, state):
+    return ['{O} = {I0} and {I1}'.format(**ports)]
+
+def simulate_source_prim_or(self, ports, state):
+    return ['{O} = {I0} or {I1}'.format(**ports)]
+
+def simulate_source_prim_flip_flop(self, ports, state):
+    return [
+        'if not {}:'.format(state),
+        '    {}.update(prev_clock={CLK}, cur_val=False)'.format(state, **ports),
+        'if {}["prev_clock"] and not {CLK}:'.format(state, **ports),
+        '    {}["cur_val"] = {D}'.format(state, **ports),
+        '{}["prev_clock"] = {CLK}'.format(state, **ports),
+        '{Q} = {}["cur_val"]'.format(state, **ports),
+    ]
+
+
+PRIM_AND = DeclareCircuit('PRIM_AND', 'I0', In(Bit), 'I1', In(Bit), 'O', Out(Bit), stateful=False, primitive=True, simulate=simulate_prim_and, simulate_batch=simulate_batch_prim_and, simulate_source=simulate_source_prim_and)
+PRIM_OR = DeclareCircuit('PRIM_OR', 'I0', In(Bit), 'I1', In(Bit), 'O', Out(Bit), stateful=False, primitive=True, simulate=simulate_prim_or, simulate_batch=simulate_batch_prim_or, simulate_source=simulate_source_prim_or)
+PRIM_NOT = DeclareCircuit('PRIM_NOT', 'I', In(Bit), 'O', Out(Bit), stateful=False, primitive=True, simulate=simulate_prim_not, simulate_batch=simulate_batch_prim_not, simulate_source=simulate_source_prim_not)
+PRIM_FF = DeclareCircuit('PRIM_FF', 'CLK', In(Clock), 'D', In(Bit), 'Q', Out(Bit), stateful=True, primitive=True, simulate=simulate_prim_flip_flop, simulate_source=simulate_source_prim_flip_flop)
+
+
+# The value store modes of the PythonSimulator, for tests parametrized over
+# them with `@pytest.mark.parametrize('mode', SIMULATOR_MODES)`
+SIMULATOR_MODES = [{}, {'compiled': True}, {'packed': True},
+                   {'event_driven': True}]
+
 
-PRIM_AND = DeclareCircuit('PRIM_AND', 'I0', In(Bit), 'I1', In(Bit), 'O', Out(Bit), stateful=False, primitive=True, simulate=simulate_prim_and)
-PRIM_OR = DeclareCircuit('PRIM_OR', 'I0', In(Bit), 'I1', In(Bit), 'O', Out(Bit), stateful=False, primitive=True, simulate=simulate_prim_or)
-PRIM_NOT = DeclareCircuit('PRIM_NOT', 'I', In(Bit), 'O', Out(Bit), stateful=False, primitive=True, simulate=simulate_prim_not)
-PRIM_FF = DeclareCircuit('PRIM_FF', 'CLK', In(Clock), 'D', In(Bit), 'Q', Out(Bit), stateful=True, primitive=True, simulate=simulate_prim_flip_flop)
+def make_shift_register(n, name='ShiftRegister'):
+    args = ['I', In(Bit), 'O', Out(Bits(n))] + ClockInterface(False, False, False)
+    ShiftRegister = DefineCircuit('{}{}'.format(name, n), *args)
+    prev = ShiftRegister.I
+    for i in range(n):
+        ff = PRIM_FF()
+        wire(prev, ff.D)
+        wire(ff.Q, ShiftRegister.O[i])
+        prev = ff.Q
+    EndCircuit()
+    return ShiftRegister
@@ -0,0 +1,55 @@
+import json
+import pytest
+from .test_primitives import *
+from magma.simulator import PythonSimulator
+
+
+def make_inverted_shift_register(n):
+    args = ['I', In(Bit), 'O', Out(Bit)] + ClockInterface(False, False, False)
+    Stage = DefineCircuit('TestProfileStage', *args)
+    ff = PRIM_FF()
+    inv = PRIM_NOT()
+    wire(Stage.I, ff.D)
+    wire(ff.Q, inv.I)
+    wire(inv.O, Stage.O)
+    EndCircuit()
+
+    Chain = DefineCircuit('TestProfileChain{}'.format(n), *args)
+    prev = Chain.I
+    for i in range(n):
+        stage = Stage()
+        wire(prev, stage.I)
+        prev = stage.O
+    wire(prev, Chain.O)
+    EndCircuit()
+    return Chain
+
+
+@pytest.mark.parametrize('mode', [{}, {'compiled': True},
+                                  {'event_driven': True}, {'lanes': 2}])
+def test_profiler(mode):
+    Chain = make_inverted_shift_register(3)
+    sim = PythonSimulator(Chain, Chain.CLK, profile=True, **mode)
+    sim.profiler.reset()
+    sim.advance(4)
+
+    profiler = sim.profiler
+    assert profiler.evaluations == 4
+    assert profiler.evaluations_per_second() > 0
+
+    calls = {name: calls for name, calls, _ in profiler.totals('type')}
+    lanes = mode.get('lanes', 1)
+    assert calls['PRIM_FF'] == 3 * 4 * lanes
+    if not mode.get('event_driven'):
+        # PRIM_NOT simulates all the lanes at once with simulate_batch
+        assert calls['PRIM_NOT'] == 3 * 4
+
+    scopes = {name: calls for name, calls, _ in profiler.totals('scope')}
+    assert scopes['/'] == sum(calls.values())
+    assert len([s for s in scopes if s != '/']) == 3
+    assert len(profiler.totals('instance')) == 6
+
+    assert 'PRIM_FF' in profiler.table()
+    report = json.loads(profiler.to_json('scope'))
+    assert report['evaluations'] == 4
+    assert report['scope'][0]['name'] == '/'
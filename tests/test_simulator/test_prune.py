@@ -0,0 +1,55 @@
+import pytest
+from .test_primitives import *
+from magma.simulator import PythonSimulator
+from magma.simulator.python_simulator import PythonSimulatorException
+from magma.scope import *
+
+
+def make_traced_circuit(n):
+    """
+    O = ~I, with an n deep trace register of I on TRACE
+    """
+    args = ['I', In(Bit), 'O', Out(Bit), 'TRACE', Out(Bit)] + \
+           ClockInterface(False, False, False)
+    Traced = DefineCircuit('TestPruneTraced{}'.format(n), *args)
+    inv = PRIM_NOT()
+    wire(Traced.I, inv.I)
+    wire(inv.O, Traced.O)
+    prev = Traced.I
+    for i in range(n):
+        ff = PRIM_FF()
+        wire(prev, ff.D)
+        prev = ff.Q
+    wire(prev, Traced.TRACE)
+    EndCircuit()
+    return Traced
+
+
+@pytest.mark.parametrize('mode', SIMULATOR_MODES)
+def test_prune(mode):
+    Traced = make_traced_circuit(8)
+    sim = PythonSimulator(Traced, Traced.CLK, observe=[Traced.O], **mode)
+    assert sim.pruned_primitives == 8
+    assert len(sim.execution_order.combinational) == 1
+    assert len(sim.execution_order.stateful) == 0
+
+    for value in [True, False, True]:
+        sim.set_value(Traced.I, value)
+        sim.advance(2)
+        assert sim.get_value(Traced.O) == (not value)
+    assert sim.get_value(Traced.TRACE) is None
+
+    with pytest.raises(PythonSimulatorException):
+        sim.add_watchpoint(Traced.TRACE, Scope())
+    sim.add_watchpoint(Traced.O, Scope())
+
+
+def test_prune_internal_signal():
+    Traced = make_traced_circuit(8)
+    ff = Traced.instances[4]
+    sim = PythonSimulator(Traced, Traced.CLK, observe=[(ff.Q, Scope())])
+    assert sim.pruned_primitives == 5
+
+    sim.set_value(Traced.I, True)
+    sim.advance(8)
+    assert sim.get_value(ff.Q, Scope()) == True
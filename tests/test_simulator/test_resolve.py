@@ -0,0 +1,47 @@
+import pytest
+from .test_primitives import *
+from magma.simulator import PythonSimulator
+from magma.simulator.python_simulator import PythonSimulatorException
+from magma.scope import *
+
+
+@pytest.mark.parametrize('mode', SIMULATOR_MODES)
+def test_resolve(mode):
+    ShiftRegister = make_shift_register(3, 'TestResolveShift')
+    sim = PythonSimulator(ShiftRegister, ShiftRegister.CLK, **mode)
+
+    I = sim.resolve(ShiftRegister.I)
+    O = sim.resolve(ShiftRegister.O)
+    O1 = sim.resolve(ShiftRegister.O[1], Scope())
+    ff = ShiftRegister.instances[0]
+    Q = sim.resolve(ff.Q, Scope())
+
+    for value in [True, False, True, True]:
+        I.set(value)
+        sim.advance(2)
+        assert O.get() == sim.get_value(ShiftRegister.O)
+        assert O1.get() == sim.get_value(ShiftRegister.O[1])
+        assert Q.get() == sim.get_value(ff.Q, Scope()) == value
+    assert O.get() == [True, True, False]
+
+    with pytest.raises(PythonSimulatorException):
+        O.set([False, False, False])
+
+
+def test_get_new_bit_cache():
+    ShiftRegister = make_shift_register(2, 'TestResolveShift')
+    sim = PythonSimulator(ShiftRegister, ShiftRegister.CLK)
+    scope = Scope()
+    new_bit = sim.txfm.get_new_bit(ShiftRegister.O, scope)
+    assert sim.txfm.get_new_bit(ShiftRegister.O, scope) is new_bit
+    assert sim.txfm.get_new_bit(ShiftRegister.O, Scope()) is new_bit
+
+
+def test_get_new_bit_cache_anon():
+    ShiftRegister = make_shift_register(4, 'TestResolveShift')
+    sim = PythonSimulator(ShiftRegister, ShiftRegister.CLK)
+    sim.get_value(ShiftRegister.O)
+    size = len(sim.txfm.new_bit_cache)
+    for _ in range(100):
+        assert sim.get_value(ShiftRegister.O[1:3]) == [False, False]
+    assert len(sim.txfm.new_bit_cache) == size
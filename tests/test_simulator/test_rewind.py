@@ -0,0 +1,119 @@
+import pytest
+from .test_primitives import *
+from magma.simulator import PythonSimulator
+from magma.simulator.python_simulator import PythonSimulatorException
+from magma.scope import *
+
+
+@pytest.mark.parametrize('mode', SIMULATOR_MODES)
+def test_rewind(mode):
+    ShiftRegister = make_shift_register(4, 'TestRewindShift')
+    sim = PythonSimulator(ShiftRegister, ShiftRegister.CLK,
+                          checkpoint_interval=4, max_checkpoints=4, **mode)
+
+    history = []
+    for cycle in range(12):
+        sim.set_value(ShiftRegister.I, cycle % 3 == 0)
+        sim.advance(1)
+        history.append(sim.get_value(ShiftRegister.O))
+        sim.advance(1)
+        history.append(sim.get_value(ShiftRegister.O))
+
+    # Rewind to a point between checkpoints
+    state = sim.rewind(5)
+    assert state.clock == True
+    assert sim.get_value(ShiftRegister.O) == history[-6]
+    sim.rewind(2)
+    assert sim.get_value(ShiftRegister.O) == history[-8]
+
+    # Stepping forward again replays the same inputs
+    for i in range(7):
+        sim.advance(1)
+        assert sim.get_value(ShiftRegister.O) == history[-7 + i]
+
+    # Only max_checkpoints * checkpoint_interval half cycles are kept
+    try:
+        sim.rewind(20)
+        assert False, "Should not be able to rewind past the oldest checkpoint"
+    except PythonSimulatorException:
+        pass
+
+
+def make_gated_register():
+    args = ['A', In(Bit), 'B', In(Bit), 'O', Out(Bits(2))] + \
+           ClockInterface(False, False, False)
+    Gated = DefineCircuit('TestRewindGated', *args)
+    gate = PRIM_AND()
+    inv = PRIM_NOT()
+    ff0 = PRIM_FF()
+    wire(Gated.A, gate.I0)
+    wire(Gated.B, gate.I1)
+    wire(gate.O, inv.I)
+    wire(inv.O, ff0.D)
+    mix = PRIM_OR()
+    ff1 = PRIM_FF()
+    wire(ff0.Q, mix.I0)
+    wire(Gated.A, mix.I1)
+    wire(mix.O, ff1.D)
+    wire(ff0.Q, Gated.O[0])
+    wire(ff1.Q, Gated.O[1])
+    EndCircuit()
+    return Gated
+
+
+@pytest.mark.parametrize('evaluate', [False, True, 'twice'])
+@pytest.mark.parametrize('mode', SIMULATOR_MODES)
+def test_rewind_replays_logic(mode, evaluate):
+    Gated = make_gated_register()
+    sim = PythonSimulator(Gated, Gated.CLK, checkpoint_interval=8, **mode)
+
+    # Inputs change every half cycle, in front of the flip-flops
+    history = []
+    for halfcycle in range(40):
+        if evaluate == 'twice':
+            # Compacted in the input log
+            sim.set_value(Gated.A, halfcycle % 2 == 0)
+            sim.evaluate()
+            sim.set_value(Gated.B, halfcycle % 7 == 0)
+            sim.evaluate()
+        sim.set_value(Gated.A, halfcycle % 3 != 0)
+        sim.set_value(Gated.B, halfcycle % 5 < 2)
+        if evaluate:
+            sim.evaluate()
+        sim.advance(1)
+        history.append(sim.get_value(Gated.O))
+
+    for k in [1, 2, 3, 7, 8, 9, 15]:
+        sim.rewind(k)
+        assert sim.get_value(Gated.O) == history[-1 - k]
+        # Stepping forward again follows the same trajectory
+        for i in range(k):
+            sim.advance(1)
+            assert sim.get_value(Gated.O) == history[-k + i]
+
+
+def test_input_log_bounded():
+    Gated = make_gated_register()
+    sim = PythonSimulator(Gated, Gated.CLK)
+    for i in range(1000):
+        sim.set_value(Gated.A, i % 2 == 0)
+        sim.set_value(Gated.B, i % 3 == 0)
+        sim.evaluate()
+        sim.set_value(Gated.A, i % 5 == 0)
+    # The two inputs before the last evaluation, its marker and the input
+    # set after it
+    assert len(sim.input_log) == 4
+
+    # Without a clock nothing is logged
+    Inverter = DefineCircuit('TestRewindInverter', 'I', In(Bit), 'O', Out(Bit))
+    inv = PRIM_NOT()
+    wire(Inverter.I, inv.I)
+    wire(inv.O, Inverter.O)
+    EndCircuit()
+    sim = PythonSimulator(Inverter)
+    for i in range(1000):
+        sim.set_value(Inverter.I, i % 2 == 0)
+        sim.evaluate()
+    assert len(sim.input_log) == 0
+    with pytest.raises(PythonSimulatorException):
+        sim.rewind(1)
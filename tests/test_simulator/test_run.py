@@ -0,0 +1,79 @@
+import pytest
+import numpy as np
+from .test_primitives import *
+from magma.simulator import PythonSimulator
+from magma.simulator.python_simulator import PythonSimulatorException
+from magma.scope import *
+
+
+def expected(stimulus, n):
+    state = n * [0]
+    rows = []
+    for value in stimulus:
+        state = [value] + state[:-1]
+        rows.append([sum(v << i for i, v in enumerate(state))])
+    return rows
+
+
+def test_run_numpy():
+    ShiftRegister = make_shift_register(4, 'TestRunShift')
+    sim = PythonSimulator(ShiftRegister, ShiftRegister.CLK)
+    stimulus = np.array([[1], [0], [1], [1], [0], [0]])
+    samples = sim.run(stimulus)
+    assert samples.shape == (6, 1)
+    assert samples.tolist() == expected([1, 0, 1, 1, 0, 0], 4)
+
+    # Probing an internal signal, streamed to a callback
+    ff = ShiftRegister.instances[1]
+    seen = []
+    cycles = sim.run((v for v in [1, 1, 0]),
+                     probes=[ShiftRegister.I, (ff.Q, Scope())],
+                     callback=lambda cycle, values: seen.append(values))
+    assert cycles == 3
+    assert seen == [[1, 0], [1, 1], [0, 1]]
+
+
+def test_run_file(tmpdir):
+    ShiftRegister = make_shift_register(3, 'TestRunShift')
+    sim = PythonSimulator(ShiftRegister, ShiftRegister.CLK)
+    stimulus = tmpdir.join('stimulus.txt')
+    stimulus.write("# I\n1\n0\n\n1\n1\n")
+    samples = sim.run(str(stimulus), cycles=3)
+    assert samples.tolist() == expected([1, 0, 1], 3)
+
+
+def test_run_nested():
+    T = Array(2, Bits(3))
+    Nested = DefineCircuit('TestRunNested', 'I', In(T), 'O', Out(T))
+    wire(Nested.I, Nested.O)
+    EndCircuit()
+    sim = PythonSimulator(Nested)
+    samples = sim.run([[0b101011], [0b010110]])
+    assert samples.tolist() == [[0b101011], [0b010110]]
+    assert sim.get_value(Nested.O) == [[False, True, True], [False, True, False]]
+
+
+def test_run_unbounded():
+    ShiftRegister = make_shift_register(2, 'TestRunShift')
+    sim = PythonSimulator(ShiftRegister, ShiftRegister.CLK)
+    with pytest.raises(ValueError):
+        sim.run()
+    assert sim.run(cycles=2).shape == (2, 1)
+
+
+def test_run_malformed(tmpdir):
+    T = Bits(2)
+    Mux = DefineCircuit('TestRunMalformed', 'A', In(Bit), 'B', In(T),
+                        'O', Out(T))
+    wire(Mux.B, Mux.O)
+    EndCircuit()
+    sim = PythonSimulator(Mux)
+    with pytest.raises(PythonSimulatorException, match='Row 1'):
+        sim.run([[1, 2], [1], [0, 3]])
+    with pytest.raises(PythonSimulatorException, match='Row 0'):
+        sim.run(np.array([[1, 2, 3]]))
+
+    stimulus = tmpdir.join('stimulus.txt')
+    stimulus.write("# A B\n1 2\n0 1 3\n")
+    with pytest.raises(PythonSimulatorException, match='Line 3'):
+        sim.run(str(stimulus))
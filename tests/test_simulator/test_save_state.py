@@ -0,0 +1,74 @@
+import pickle
+import zlib
+import pytest
+from .test_primitives import *
+from magma.simulator import PythonSimulator
+from magma.simulator.python_simulator import PythonSimulatorException
+
+
+@pytest.mark.parametrize('mode', SIMULATOR_MODES)
+def test_save_state(tmpdir, mode):
+    ShiftRegister = make_shift_register(4, 'TestSaveStateShift')
+    path = str(tmpdir.join('warm.state'))
+
+    sim = PythonSimulator(ShiftRegister, ShiftRegister.CLK, **mode)
+    for value in [True, False, True]:
+        sim.set_value(ShiftRegister.I, value)
+        sim.advance(2)
+    sim.save_state(path)
+
+    expected = []
+    for value in [True, True, False]:
+        sim.set_value(ShiftRegister.I, value)
+        sim.advance(2)
+        expected.append(sim.get_value(ShiftRegister.O))
+
+    forked = PythonSimulator(ShiftRegister, ShiftRegister.CLK, **mode)
+    forked.load_state(path)
+    assert forked.halfcycles == 6
+    assert forked.get_value(ShiftRegister.O) == [True, False, True, False]
+    for value, outputs in zip([True, True, False], expected):
+        forked.set_value(ShiftRegister.I, value)
+        forked.advance(2)
+        assert forked.get_value(ShiftRegister.O) == outputs
+
+
+def test_load_state_other_circuit(tmpdir):
+    path = str(tmpdir.join('warm.state'))
+    ShiftRegister3 = make_shift_register(3, 'TestSaveStateShift')
+    PythonSimulator(ShiftRegister3, ShiftRegister3.CLK).save_state(path)
+
+    ShiftRegister5 = make_shift_register(5, 'TestSaveStateShift')
+    sim = PythonSimulator(ShiftRegister5, ShiftRegister5.CLK)
+    with pytest.raises(PythonSimulatorException):
+        sim.load_state(path)
+
+
+def test_load_state_lanes(tmpdir):
+    ShiftRegister = make_shift_register(3, 'TestSaveStateShift')
+    path = str(tmpdir.join('lanes.state'))
+    sim = PythonSimulator(ShiftRegister, ShiftRegister.CLK, lanes=4)
+    sim.set_value(ShiftRegister.I, [True, False, True, False])
+    sim.advance(2)
+    sim.save_state(path)
+
+    forked = PythonSimulator(ShiftRegister, ShiftRegister.CLK, lanes=4)
+    forked.load_state(path)
+    assert forked.get_value(ShiftRegister.O[0]) == [True, False, True, False]
+
+    scalar = PythonSimulator(ShiftRegister, ShiftRegister.CLK)
+    with pytest.raises(PythonSimulatorException):
+        scalar.load_state(path)
+    scalar.save_state(path)
+    with pytest.raises(PythonSimulatorException):
+        forked.load_state(path)
+
+
+def test_load_state_not_a_state(tmpdir):
+    ShiftRegister = make_shift_register(2, 'TestSaveStateShift')
+    sim = PythonSimulator(ShiftRegister, ShiftRegister.CLK)
+    path = tmpdir.join('pickled.state')
+    # Pickles are never loaded, they could run arbitrary code
+    path.write_binary(zlib.compress(pickle.dumps({'values': {}})))
+    with pytest.raises(PythonSimulatorException):
+        sim.load_state(str(path))
@@ -0,0 +1,52 @@
+import pytest
+from .test_lanes import make_mux
+from magma.simulator.python_simulator import iter_testvectors, \
+    testvectors as sim_testvectors
+from magma.testing import utils
+from magma.testing.utils import corners, iter_testvector_inputs
+
+
+def test_iter_testvectors():
+    Mux = make_mux()
+    rows = iter_testvectors(Mux)
+    assert next(rows) == [0, 0, 0, 0]
+    assert list(rows) == sim_testvectors(Mux)[1:]
+
+
+def test_corners():
+    assert corners(range(16)) == [0, 1, 14, 15]
+    assert corners(range(-8, 8)) == [-8, -7, -1, 0, 1, 6, 7]
+    assert corners([3, 1, 2]) == [1, 2, 3]
+
+    Mux = make_mux()
+    rows = sim_testvectors(Mux, mode='corners')
+    # Every value of a 2 bit input is a corner
+    assert rows == sim_testvectors(Mux)
+
+
+def test_random():
+    Mux = make_mux()
+    rows = sim_testvectors(Mux, mode='random', seed=1, samples=50)
+    assert len(rows) == 50
+    assert rows == sim_testvectors(Mux, mode='random', seed=1, samples=50,
+                                   lanes=8)
+    complete = sim_testvectors(Mux)
+    assert all(row in complete for row in rows)
+
+    with pytest.raises(ValueError):
+        sim_testvectors(Mux, mode='random')
+    with pytest.raises(ValueError):
+        sim_testvectors(Mux, mode='exhaustive')
+
+
+@pytest.mark.parametrize('mode', ['complete', 'corners', 'random'])
+def test_testvector_ranges(mode):
+    values = [range(3), range(-2, 2), [5, 7]]
+    tests = list(iter_testvector_inputs(values, mode, seed=3, samples=30))
+    if mode != 'random':
+        assert len(tests) == 24
+        assert tests[7] == (0, 1, 7)
+    # Each shard starts at its first test
+    shards = [list(iter_testvector_inputs(values, mode, 3, 30, start, stop))
+              for start, stop in utils.testvector_shards(len(tests), 2, 5)]
+    assert sum(shards, []) == tests
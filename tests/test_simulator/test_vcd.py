@@ -0,0 +1,105 @@
+from .test_primitives import *
+from magma.simulator import PythonSimulator
+from magma.simulator.vcd import VCDWriter
+from magma.scope import *
+
+
+def read_changes(filename):
+    with open(filename) as f:
+        lines = f.read().splitlines()
+    header = lines[:lines.index('$enddefinitions $end') + 1]
+    body = lines[len(header):]
+    return header, body
+
+
+def test_vcd(tmpdir):
+    ShiftRegister = make_shift_register(3, 'TestVCDShift')
+    sim = PythonSimulator(ShiftRegister, ShiftRegister.CLK)
+
+    filename = str(tmpdir.join('shift.vcd'))
+    with sim.add_waveform(VCDWriter(filename, ShiftRegister,
+                                    ['I', 'O', 'inst*.Q'])):
+        sim.set_value(ShiftRegister.I, True)
+        sim.advance(2)
+        sim.set_value(ShiftRegister.I, False)
+        sim.advance(4)
+    assert sim.waveforms == []
+
+    header, body = read_changes(filename)
+    variables = [line.split() for line in header if line.startswith('$var')]
+    assert [v[4] for v in variables] == ['I', 'O', 'Q', 'Q', 'Q']
+    assert variables[1][2] == '3'
+    assert sum(line.startswith('$scope module inst') for line in header) == 3
+
+    ident = {v[4]: v[3] for v in variables[:2]}
+    samples = {}
+    time = None
+    for line in body:
+        if line.startswith('#'):
+            time = int(line[1:])
+        elif line.startswith('b'):
+            value, code = line.split()
+            if code == ident['O']:
+                samples[time] = value[1:]
+    # Only changes are dumped
+    assert samples == {0: '000', 2: '001', 4: '010', 6: '100'}
+
+
+def test_vcd_rewind(tmpdir):
+    ShiftRegister = make_shift_register(2, 'TestVCDShift')
+    sim = PythonSimulator(ShiftRegister, ShiftRegister.CLK,
+                          checkpoint_interval=2)
+
+    filename = str(tmpdir.join('rewind.vcd'))
+    writer = sim.add_waveform(VCDWriter(filename, ShiftRegister, 'I',
+                                        buffer_size=1))
+    sim.set_value(ShiftRegister.I, True)
+    sim.advance(4)
+    sim.rewind(2)
+    sim.advance(1)
+    writer.close()
+
+    header, body = read_changes(filename)
+    times = [int(line[1:]) for line in body if line.startswith('#')]
+    assert times == sorted(times)
+
+
+def test_vcd_skips_unwired(tmpdir):
+    Sub = DefineCircuit('TestVCDSub', 'I', In(Bit), 'O', Out(Bit),
+                        'U', Out(Bit))
+    inv = PRIM_NOT()
+    wire(Sub.I, inv.I)
+    wire(inv.O, Sub.O)
+    EndCircuit()
+    Top = DefineCircuit('TestVCDTop', 'I', In(Bit), 'O', Out(Bit))
+    sub = Sub()
+    wire(Top.I, sub.I)
+    wire(sub.O, Top.O)
+    EndCircuit()
+    sim = PythonSimulator(Top)
+
+    filename = str(tmpdir.join('unwired.vcd'))
+    with sim.add_waveform(VCDWriter(filename, Top, ['O', 'inst0.I', 'inst0.O',
+                                                  'inst0.U'])):
+        sim.evaluate()
+
+    header, body = read_changes(filename)
+    variables = [line.split()[4] for line in header if line.startswith('$var')]
+    assert variables == ['O', 'I', 'O']
+
+
+def test_vcd_resolves_once(tmpdir):
+    ShiftRegister = make_shift_register(2, 'TestVCDShift')
+    sim = PythonSimulator(ShiftRegister, ShiftRegister.CLK)
+
+    filename = str(tmpdir.join('resolved.vcd'))
+    with sim.add_waveform(VCDWriter(filename, ShiftRegister)):
+        # Samples read the signal handles resolved when attaching
+        def get_value(bit, scope=None):
+            assert False, "get_value called while sampling"
+        sim.get_value = get_value
+        sim.set_value(ShiftRegister.I, True)
+        sim.advance(4)
+
+    header, body = read_changes(filename)
+    assert 'b11 "' in body
@@ -0,0 +1,63 @@
+import pytest
+from .test_primitives import *
+from magma.simulator import PythonSimulator
+from magma.simulator.python_simulator import WatchPoint
+from magma.scope import *
+
+
+def test_watchpoint(monkeypatch):
+    ShiftRegister = make_shift_register(3, 'TestWatchShift')
+    sim = PythonSimulator(ShiftRegister, ShiftRegister.CLK)
+    scope = Scope()
+
+    checked = []
+    was_triggered = WatchPoint.was_triggered
+    def count_checks(self):
+        checked.append(self.idx)
+        return was_triggered(self)
+    monkeypatch.setattr(WatchPoint, 'was_triggered', count_checks)
+
+    first = sim.add_watchpoint(ShiftRegister.O[0], scope)
+    last = sim.add_watchpoint(ShiftRegister.O[2], scope, True)
+
+    sim.set_value(ShiftRegister.I, True)
+    state = sim.cont()
+    assert [w.idx for w in state.triggered_points] == [first]
+    assert sim.get_value(ShiftRegister.O) == [True, False, False]
+    # Watchpoints on nets that did not change are never checked
+    assert last not in checked
+
+    assert sim.delete_watchpoint(first)
+    assert not sim.delete_watchpoint(first)
+    assert len(sim.watchpoints) == 1
+
+    state = sim.cont()
+    assert [w.idx for w in state.triggered_points] == [last]
+    assert sim.get_value(ShiftRegister.O) == [True, True, True]
+    assert first not in checked[checked.index(last):]
+
+
+@pytest.mark.parametrize('mode', SIMULATOR_MODES)
+def test_watchpoint_changed_nets(mode):
+    ShiftRegister = make_shift_register(8, 'TestWatchShift')
+    sim = PythonSimulator(ShiftRegister, ShiftRegister.CLK, **mode)
+    watches = [sim.add_watchpoint(ShiftRegister.O[k], Scope())
+               for k in range(8)]
+    sim.evaluate()
+
+    reads = []
+    get_net_value = sim._PythonSimulator__get_net_value
+    def count_reads(net):
+        reads.append(net)
+        return get_net_value(net)
+    sim._PythonSimulator__get_net_value = count_reads
+
+    sim.set_value(ShiftRegister.I, True)
+    for k in range(8):
+        del reads[:]
+        state = sim.advance(2)
+        assert [w.idx for w in state.triggered_points] == [watches[k]]
+        if mode.get('event_driven'):
+            # Only the net that changed is read
+            assert reads == [sim.txfm.get_new_bit(ShiftRegister.O[k],
+                                                  Scope()).value()]
@@ -0,0 +1,102 @@
+from magma import *
+
+
+def test_bus_wire():
+    T = Bits(8)
+    Buf = DeclareCircuit('BusBuf', 'I', In(T), 'O', Out(T))
+    main = DefineCircuit('bus', 'I', In(T), 'O', Out(T), 'P', Out(T))
+    a = Buf()
+    b = Buf()
+    c = Buf()
+    # Create the elements first, the bits are wired directly
+    for port in [main.I, a.I, a.O, b.I, c.I]:
+        port.flatten()
+    wire(main.I, a.I)
+    wire(a.O, b.I)
+    wire(a.O, c.I)
+    wire(b.O, main.O)
+    wire(c.O, main.P)
+    EndCircuit()
+
+    assert a.I.source[0] is main.I
+    assert b.I.value() is a.O and c.I.value() is a.O
+    for k in range(8):
+        assert a.I[k].value() is main.I[k]
+        assert b.I[k].value() is a.O[k]
+        assert c.I[k].value() is a.O[k]
+        assert a.O[k].port.wires.inputs == [b.I[k].port, c.I[k].port]
+    assert main.O[5].value() is b.O[5]
+
+
+def test_nested_bus_wire():
+    T = Array(3, Array(4, Bit))
+    Buf = DeclareCircuit('NestedBusBuf', 'I', In(T), 'O', Out(T))
+    main = DefineCircuit('nested_bus', 'I', In(T), 'O', Out(T))
+    buf = Buf()
+    main.I.ts
+    wire(main.I, buf.I)
+    wire(buf.O, main.O)
+    EndCircuit()
+
+    # Only the outer level is created, the rows are recorded
+    assert buf.I.elements is not None
+    assert buf.I[1].elements is None
+    assert buf.I[1].value() is main.I[1]
+    assert buf.I[1][2].value() is main.I[1][2]
+
+
+def test_bus_wire_anon():
+    T = Bits(4)
+    Buf = DeclareCircuit('AnonBusBuf', 'I', In(T), 'O', Out(T))
+    main = DefineCircuit('anon_bus', 'I', In(T), 'O', Out(T))
+    buf = Buf()
+    x = T()
+    wire(main.I, x)
+    wire(x, buf.I)
+    wire(buf.O, main.O)
+    EndCircuit()
+
+    assert x.source is None
+    assert buf.I.value() is main.I
+    assert buf.I[2].value() is main.I[2]
+
+
+def test_bus_multiple_outputs():
+    T = Bits(2)
+    Buf = DeclareCircuit('MultiBusBuf', 'I', In(T), 'O', Out(T))
+    main = DefineCircuit('multi_bus', 'I', In(T), 'O', Out(T))
+    a = Buf()
+    b = Buf()
+    c = Buf()
+    a.I.ts
+    b.O.ts
+    c.O.ts
+    wire(b.O, a.I)
+    wire(c.O, a.I)
+    EndCircuit()
+
+    # Both drivers end up on the nets, the first one is the value
+    assert a.I[0].port.wires.outputs == [b.O[0].port, c.O[0].port]
+    assert a.I[0].value() is b.O[0]
+    assert a.I.value() is b.O
+
+
+def test_tuple_bus_wire():
+    T = Tuple(a=Bit, b=Bits(4), c=Tuple(x=Bit, y=Bits(2)))
+    Buf = DeclareCircuit('TupleBusBuf', 'I', In(T), 'O', Out(T))
+    main = DefineCircuit('tuple_bus', 'I', In(T), 'O', Out(T))
+    a = Buf()
+    b = Buf()
+    wire(main.I, a.I)
+    wire(a.O, b.I)
+    wire(b.O, main.O)
+    EndCircuit()
+
+    assert b.I.a.value() is a.O.a
+    assert b.I.c.x.value() is a.O.c.x
+    # Array fields are recorded as whole connections
+    assert b.I.b.source[0] is a.O.b
+    assert b.I.b[3].value() is a.O.b[3]
+    assert b.I.c.y[1].value() is a.O.c.y[1]
+    assert main.O.c.y.value() is b.O.c.y
+    assert b.I.value() is a.O
@@ -0,0 +1,51 @@
+from magma import *
+from magma.simulator import PythonSimulator
+
+
+def make_bus(N=4, M=3):
+    T = Array(N, Array(M, Bit))
+    Buf = DeclareCircuit('LazyBuf', 'I', In(T), 'O', Out(T))
+    main = DefineCircuit('lazy_bus', 'I', In(T), 'O', Out(T))
+    buf = Buf()
+    wire(main.I, buf.I)
+    wire(buf.O, main.O)
+    EndCircuit()
+    return main, buf
+
+
+def test_whole_array_wire_is_lazy():
+    main, buf = make_bus()
+    for port in [main.I, main.O, buf.I, buf.O]:
+        assert port.elements is None
+    assert buf.I.value() is main.I
+    assert buf.I.trace() is main.I
+    assert main.O.value() is buf.O
+    assert buf.I.driven() and main.O.wired()
+    assert not buf.O.driven()
+    assert not buf.I.const()
+
+
+def test_materialize():
+    main, buf = make_bus()
+    # Indexing creates the elements and wires them
+    assert buf.I[2][1].value() is main.I[2][1]
+    assert buf.I.elements is not None
+    assert main.I.elements is not None
+    assert buf.I.source[0] is main.I and not main.I.sinks
+    assert buf.I.value() is main.I
+
+    assert main.O.elements is None
+    assert main.O[3].value() is buf.O[3]
+    assert main.O[3].elements is None
+    assert main.O[3][0].value() is buf.O[3][0]
+
+
+def test_lazy_simulate():
+    T = Array(2, Array(2, Bit))
+    main = DefineCircuit('lazy_simulate', 'I', In(T), 'O', Out(T))
+    wire(main.I, main.O)
+    EndCircuit()
+    sim = PythonSimulator(main)
+    sim.set_value(main.I, [[True, False], [False, True]])
+    sim.evaluate()
+    assert sim.get_value(main.O) == [[True, False], [False, True]]
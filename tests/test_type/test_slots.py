@@ -0,0 +1,16 @@
+from magma import *
+from magma.port import Wire
+
+
+def test_no_instance_dict():
+    A = In(Array(4, Array(2, Bit)))()
+    values = [Bit(), In(Bit)(), Out(Clock)(), In(Reset)(), Enable(), VCC,
+              In(Bits(4))(), UInt(8)(), SInt(8)(), A, A[1], A[1][0],
+              A.name, A[1].name, A[1][0].port, Wire()]
+    for value in values:
+        assert not hasattr(value, '__dict__'), type(value)
+
+
+def test_anon_name_shared():
+    assert Bit().name is Bit().name
+    assert Bit(name='x').name is not Bit(name='x').name
@@ -0,0 +1,81 @@
+from magma import *
+
+
+def test_fanout():
+    N = 500
+    Buf = DeclareCircuit('FanoutBuf', "I", In(Bit), "O", Out(Bit))
+
+    main = DefineCircuit("fanout", "I", In(Bit), "O", Out(Bits(N)))
+    bufs = [Buf() for _ in range(N)]
+    for buf in bufs:
+        wire(main.I, buf.I)
+    for i, buf in enumerate(bufs):
+        wire(buf.O, main.O[i])
+    EndCircuit()
+
+    assert all(buf.I.value() is main.I for buf in bufs)
+    assert all(buf.I.trace() is main.I for buf in bufs)
+    assert main.O[7].value() is bufs[7].O
+    assert bufs[7].O.trace() is main.O[7]
+    assert len(main.I.port.wires.inputs) == N
+
+
+def test_merge_nets():
+    Buf = DeclareCircuit('MergeBuf', "I", In(Bit), "O", Out(Bit))
+
+    main = DefineCircuit("merge", "I", In(Bit), "O", Out(Bit))
+    a = Buf()
+    b = Buf()
+    # Two nets joined through an anonymous bit
+    x = Bit()
+    wire(a.O, x)
+    wire(b.I, main.O)
+    assert not b.I.driven()
+    wire(x, b.I)
+    assert b.I.value() is a.O
+    assert main.O.value() is None
+    wire(main.I, a.I)
+    assert a.I.value() is main.I
+
+
+def test_merge_driven_nets(capsys):
+    Buf = DeclareCircuit('MergeDrivenBuf', "I", In(Bit), "O", Out(Bit))
+
+    main = DefineCircuit("merge_driven", "I", In(Bit), "O", Out(Bit))
+    a = Buf()
+    b = Buf()
+    c = Buf()
+    wire(a.O, c.I)
+    x = Bit()
+    wire(b.O, x)
+    wire(x, c.I)
+    out, err = capsys.readouterr()
+    assert "Error: connecting more than one output to an input" in err
+
+
+def test_wire_inputs():
+    Buf = DeclareCircuit('InputsBuf', "I", In(Bit), "O", Out(Bit))
+
+    main = DefineCircuit("inputs", "I", In(Bit), "O", Out(Bit))
+    bufs = [Buf() for _ in range(20)]
+    for buf in bufs:
+        wire(main.I, buf.I)
+    wire(main.I, bufs[3].I)
+    EndCircuit()
+
+    wires = main.I.port.wires
+    assert wires.inputs == [buf.I.port for buf in bufs]
+    assert wires.has_input(bufs[3].I.port)
+    assert not wires.has_input(main.O.port)
+
+
+def test_unwired_port_wires():
+    Buf = DeclareCircuit('UnwiredBuf', "I", In(Bit), "O", Out(Bit))
+
+    buf = Buf()
+    wires = buf.I.port.wires
+    assert wires.inputs == [] and wires.outputs == []
+    assert buf.I.port.wires is wires
+    x = Bit()
+    wire(x, buf.I)
+    assert buf.I.port.wires is x.port.wires